@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.importtime
+
+Start Up Benchmarks
+-------------------
+Measure the import time of cctconvert with 'python -X importtime' (Python
+3.7+) for a bare --version and for a single conversion:
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --save baseline.json
+    python -m benchmarks.importtime --compare baseline.json
+
+The total is the cumulative time of the modules imported directly by the
+interpreter, the best of --repeat runs. The published baseline is
+benchmarks/importtime-baseline.json. With --compare the exit code is 1 if
+a total got slower than the baseline by more than --threshold.
+tests/test_main.py checks that --version imports none of the heavy modules.
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+from collections import OrderedDict
+
+import click
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ----------------------------------------------------------------------------
+
+
+def importtime(args, cwd):
+    """
+    Run 'python -X importtime -m cctconvert args' and return an OrderedDict
+    of the top level imports to their cumulative time in microseconds.
+    """
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'cctconvert'] + args,
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True)
+    if proc.returncode != 0:
+        raise click.ClickException('cctconvert exited with {rc}:\n{err}'.format(   # noqa
+            rc=proc.returncode, err=proc.stderr))
+
+    imports = OrderedDict()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit() and not name.startswith('  '):
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+
+def scenarios(workdir):
+    """
+    Return the (name, args) of each command line measured, creating its input
+    files in workdir.
+    """
+    with open(os.path.join(workdir, 'cookiecutter.json'), mode='w') as cc:
+        json.dump({'project': 'name', 'license': ['MIT', 'BSD']}, cc)
+    return [
+        ('version', ['--version']),
+        ('convert', ['cookiecutter.json', '--output', 'cookiecutter-v2.json']),   # noqa
+    ]
+
+
+def measure(repeat, top):
+    """
+    Return an OrderedDict of scenario name to its best total and the top
+    slowest top level imports of that run.
+    """
+    results = OrderedDict()
+    workdir = tempfile.mkdtemp(prefix='cctconvert-importtime-')
+    try:
+        for name, args in scenarios(workdir):
+            best = None
+            for _ in range(repeat):
+                output = os.path.join(workdir, 'cookiecutter-v2.json')
+                if os.path.exists(output):
+                    os.remove(output)
+                imports = importtime(args, workdir)
+                if best is None or sum(imports.values()) < sum(best.values()):   # noqa
+                    best = imports
+            slowest = sorted(best.items(), key=lambda i: i[1], reverse=True)
+            results[name] = OrderedDict([
+                ('total', sum(best.values())),
+                ('slowest', OrderedDict(slowest[:top])),
+            ])
+    finally:
+        shutil.rmtree(workdir)
+    return results
+
+# ----------------------------------------------------------------------------
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('--repeat', '-r', type=click.IntRange(min=1), default=5, help='Runs of each command line, the best is kept.')   # noqa
+@click.option('--top', type=click.IntRange(min=0), default=8, help='Number of slowest imports listed.')   # noqa
+@click.option('--save', type=click.Path(dir_okay=False), help='Save the results to a JSON file.')   # noqa
+@click.option('--compare', type=click.Path(exists=True, dir_okay=False), help='Compare to a baseline saved with --save.')   # noqa
+@click.option('--threshold', type=float, default=0.25, show_default=True, help='Slowdown over the baseline counted as a regression.')   # noqa
+def main(repeat, top, save, compare, threshold):
+    """
+    Measure the start up import time of cctconvert.
+    """
+    if sys.version_info < (3, 7):
+        raise click.ClickException('-X importtime requires Python 3.7+')
+
+    baseline = {}
+    if compare:
+        with open(compare, encoding='utf8') as fp:
+            baseline = json.load(fp)['results']
+
+    results = measure(repeat, top)
+
+    regressions = []
+    for name, result in results.items():
+        line = '{n:<10} {t:>8.1f} ms'.format(n=name, t=result['total'] / 1000)
+        if name in baseline:
+            ratio = result['total'] / baseline[name]['total']
+            line += ' {r:>6.2f}x baseline'.format(r=ratio)
+            if ratio > 1 + threshold:
+                regressions.append(name)
+                line = click.style(line, fg='red')
+        click.echo(line)
+        for module, us in result['slowest'].items():
+            click.echo('    {m:<32} {t:>8.1f} ms'.format(m=module, t=us / 1000))   # noqa
+
+    if save:
+        with open(save, encoding='utf8', mode='w') as fp:
+            json.dump(OrderedDict([
+                ('python', sys.version.split()[0]),
+                ('results', results),
+            ]), fp, indent=4)
+
+    if regressions:
+        click.echo(click.style(
+            'Regressed: ' + ', '.join(regressions), fg='red'))
+        sys.exit(1)
+
+
+# ----------------------------------------------------------------------------
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.run
+
+Conversion Pipeline Benchmarks
+------------------------------
+Time each phase of a conversion on a synthetic version 1 template:
+
+    read        cc_read of the version 1 file
+    transform   convert_context, building the version 2 variables
+    revert      convert_context(to='v1'), turning them back into version 1
+    write       cc_write of the version 2 file
+    main        the cctconvert command end to end
+
+From the root of the project:
+
+    python -m benchmarks.run --shape large
+    python -m benchmarks.run --shape large --save baseline.json
+    python -m benchmarks.run --shape large --compare baseline.json
+
+With --compare the exit code is 1 if any phase got slower than the baseline
+by more than --threshold, so a run can gate an upgrade. Baselines are only
+comparable on the same machine.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import statistics
+
+from collections import OrderedDict
+
+import click
+from click.testing import CliRunner
+
+from cctconvert import cctconvert
+from cctconvert.core import IDENT, cc_read, cc_write, convert_context
+from cctconvert.jsonbackend import BACKEND_NAMES, DEFAULT_BACKEND
+
+from benchmarks.synthetic import (
+    SHAPES, DEFAULT_SHAPE, make_v1_context, write_v1_template,
+)
+
+# ----------------------------------------------------------------------------
+
+
+def measure(fn, repeat, setup=None):
+    """
+    Call fn() repeat times and return the duration of each call in seconds.
+    If given, setup() is called untimed before every call.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_phases(workdir, ctx, repeat, json_backend, stream):
+    """
+    Time every phase converting the version 1 context ctx, using files in
+    workdir. Returns an OrderedDict of phase name to durations.
+    """
+    infile = os.path.join(workdir, 'cookiecutter.json')
+    outfile = os.path.join(workdir, 'cookiecutter-v2.json')
+    write_v1_template(infile, ctx)
+
+    def remove_output():
+        if os.path.exists(outfile):
+            os.remove(outfile)
+
+    ctx_v1 = cc_read(infile, json_backend)
+    ctx_v2 = convert_context(ctx_v1, 'synthetic', ident=IDENT)
+    # cctconvert writes the compact variables
+    compact_v2 = convert_context(ctx_v1, 'synthetic', ident=IDENT, compact=True)   # noqa
+
+    args = [infile, '--output', outfile, '--json-backend', json_backend]
+    if stream:
+        args.append('--stream')
+    runner = CliRunner()
+
+    def invoke_main():
+        result = runner.invoke(cctconvert.main, args)
+        if result.exit_code != 0:
+            raise click.ClickException(
+                'cctconvert exited with {rc}:\n{out}'.format(
+                    rc=result.exit_code, out=result.output))
+
+    results = OrderedDict()
+    results['read'] = measure(lambda: cc_read(infile, json_backend), repeat)
+    results['transform'] = measure(
+        lambda: convert_context(ctx_v1, 'synthetic', ident=IDENT, compact=True),   # noqa
+        repeat)
+    results['revert'] = measure(
+        lambda: convert_context(ctx_v2, 'synthetic', to='v1'), repeat)
+    results['write'] = measure(
+        lambda: cc_write(compact_v2, outfile, json_backend), repeat, remove_output)   # noqa
+    results['main'] = measure(invoke_main, repeat, remove_output)
+    return results
+
+
+def report(results, size, baseline=None, threshold=0.0):
+    """
+    Emit a table of the results, compared to the baseline if any. Returns the
+    list of phases slower than the baseline by more than threshold.
+    """
+    click.echo('Input file: {kb:.1f} KiB'.format(kb=size / 1024))
+    click.echo('{p:<10} {b:>10} {m:>10}'.format(p='phase', b='best ms', m='median ms') +   # noqa
+               (' {c:>10}'.format(c='baseline') if baseline else ''))
+    regressions = []
+    for phase, times in results.items():
+        best = min(times)
+        line = '{p:<10} {b:>10.3f} {m:>10.3f}'.format(
+            p=phase, b=best * 1000, m=statistics.median(times) * 1000)
+        if baseline and phase in baseline:
+            ratio = best / baseline[phase]
+            line += ' {r:>9.2f}x'.format(r=ratio)
+            if ratio > 1 + threshold:
+                regressions.append(phase)
+                line = click.style(line, fg='red')
+        click.echo(line)
+    return regressions
+
+# ----------------------------------------------------------------------------
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option(
+    '--shape', type=click.Choice(list(SHAPES)), default=DEFAULT_SHAPE,
+    help='Named template shape, the options below override its fields.')
+@click.option('--keys', type=click.IntRange(min=0), help='Number of top level keys.')   # noqa
+@click.option('--choice-ratio', type=float, help='Ratio of non private keys holding a choice list.')   # noqa
+@click.option('--private', type=click.IntRange(min=0), help="Number of private '_' keys.")   # noqa
+@click.option('--choice-length', type=click.IntRange(min=0), help='Length of each choice list.')   # noqa
+@click.option('--depth', type=click.IntRange(min=0), help='Nesting depth of dict values.')   # noqa
+@click.option('--seed', type=int, default=0, help='Random seed of the generator.')   # noqa
+@click.option('--repeat', '-r', type=click.IntRange(min=1), default=5, help='Timed runs of each phase.')   # noqa
+@click.option('--json-backend', type=click.Choice(BACKEND_NAMES), default=DEFAULT_BACKEND, help='JSON backend to time.')   # noqa
+@click.option('--stream', is_flag=True, default=False, help='Time main with --stream.')   # noqa
+@click.option('--save', type=click.Path(dir_okay=False), help='Save the best time of each phase to a JSON file.')   # noqa
+@click.option('--compare', type=click.Path(exists=True, dir_okay=False), help='Compare to a baseline saved with --save.')   # noqa
+@click.option('--threshold', type=float, default=0.10, show_default=True, help='Slowdown over the baseline counted as a regression.')   # noqa
+def main(shape, keys, choice_ratio, private, choice_length, depth, seed, repeat, json_backend, stream, save, compare, threshold):   # noqa
+    """
+    Benchmark the conversion pipeline on a synthetic version 1 template.
+    """
+    fields = dict(SHAPES[shape])
+    overrides = dict(keys=keys, choice_ratio=choice_ratio, private=private,
+                     choice_length=choice_length, depth=depth)
+    fields.update((k, v) for k, v in overrides.items() if v is not None)
+    click.echo('Shape: ' + ', '.join(
+        '{k}={v}'.format(k=k, v=fields[k]) for k in sorted(fields)))
+
+    ctx = make_v1_context(seed=seed, **fields)
+    workdir = tempfile.mkdtemp(prefix='cctconvert-bench-')
+    try:
+        results = run_phases(workdir, ctx, repeat, json_backend, stream)
+        size = os.path.getsize(os.path.join(workdir, 'cookiecutter.json'))
+    finally:
+        shutil.rmtree(workdir)
+
+    baseline = None
+    if compare:
+        with open(compare, encoding='utf8') as fp:
+            baseline = json.load(fp)['best']
+
+    regressions = report(results, size, baseline, threshold)
+
+    if save:
+        with open(save, encoding='utf8', mode='w') as fp:
+            json.dump(OrderedDict([
+                ('shape', fields),
+                ('json_backend', json_backend),
+                ('best', OrderedDict((p, min(t)) for p, t in results.items())),   # noqa
+            ]), fp, indent=4)
+
+    if regressions:
+        click.echo(click.style(
+            'Regressed: ' + ', '.join(regressions), fg='red'))
+        sys.exit(1)
+
+
+# ----------------------------------------------------------------------------
+if __name__ == '__main__':  # pragma: no cover
+    main()
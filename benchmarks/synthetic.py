@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""
+benchmarks.synthetic
+
+Synthetic Version 1 Templates
+-----------------------------
+Generate version 1 cookiecutter contexts of a configurable shape so the
+conversion pipeline can be timed on templates of any size. The same shape and
+seed always generate the same context.
+"""
+import json
+import random
+
+from collections import OrderedDict
+
+# ----------------------------------------------------------------------------
+# Named shapes, any field may be overridden from the command line
+SHAPES = OrderedDict([
+    ('small', dict(keys=50, choice_ratio=0.2, private=5, choice_length=5, depth=0)),            # noqa
+    ('medium', dict(keys=1000, choice_ratio=0.3, private=50, choice_length=20, depth=1)),       # noqa
+    ('large', dict(keys=10000, choice_ratio=0.3, private=500, choice_length=100, depth=2)),     # noqa
+    ('choices', dict(keys=100, choice_ratio=1.0, private=0, choice_length=10000, depth=0)),     # noqa
+    ('nested', dict(keys=1000, choice_ratio=0.0, private=0, choice_length=0, depth=6)),         # noqa
+])
+
+DEFAULT_SHAPE = 'medium'
+
+WORDS = (
+    'project', 'package', 'module', 'author', 'email', 'license', 'version',
+    'python', 'docs', 'tests', 'travis', 'coverage', 'flake8', 'click',
+    'sphinx', 'github', 'slug', 'year', 'command', 'description',
+)
+
+# ----------------------------------------------------------------------------
+
+
+def make_value(rnd, depth):
+    """
+    Return a random scalar default value, or a dict nested depth levels deep.
+    """
+    if depth > 0:
+        return OrderedDict(
+            ('{w}_{i}'.format(w=rnd.choice(WORDS), i=i), make_value(rnd, depth - 1))   # noqa
+            for i in range(3))
+    kind = rnd.random()
+    if kind < 0.6:
+        return '{{{{ cookiecutter.{w} }}}} {w}'.format(w=rnd.choice(WORDS))
+    elif kind < 0.8:
+        return rnd.randint(0, 10000)
+    elif kind < 0.9:
+        return rnd.choice((True, False))
+    else:
+        return rnd.random()
+
+
+def make_v1_context(keys, choice_ratio, private, choice_length, depth, seed=0):   # noqa
+    """
+    Return a version 1 context of keys top level keys.
+
+    private of the keys are '_' prefixed, choice_ratio of the others hold a
+    choice list of choice_length values and the rest hold a scalar value, or
+    a dict nested depth levels deep.
+    """
+    rnd = random.Random(seed)
+    private = min(private, keys)
+    choices = int((keys - private) * choice_ratio)
+
+    ctx = OrderedDict()
+    for i in range(keys):
+        word = rnd.choice(WORDS)
+        if i < private:
+            ctx['_{w}_{i}'.format(w=word, i=i)] = make_value(rnd, depth)
+        elif i < private + choices:
+            ctx['{w}_{i}'.format(w=word, i=i)] = [
+                '{w}-{c}'.format(w=word, c=c) for c in range(choice_length)
+            ] or ['']
+        else:
+            ctx['{w}_{i}'.format(w=word, i=i)] = make_value(rnd, depth)
+    return ctx
+
+
+def write_v1_template(path, ctx):
+    """
+    Write the version 1 context ctx to the file named path.
+    """
+    with open(path, encoding='utf8', mode='w') as cc:
+        json.dump(ctx, cc, indent=4)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+cctconvert
+
+Convert a version 1 cookiecutter.json file into a version 2 file, and back.
+The transform itself is importable without the command line interface, see
+cctconvert.core.
+"""
+from cctconvert.core import (  # noqa: F401
+    VERSION,
+    ConversionError,
+    LoadError,
+    WriteError,
+    BackupExistsError,
+    OutputExistsError,
+    InputNotFoundError,
+    AlreadyVersion2Error,
+    InvalidVersion2Error,
+    AlreadyVersion1Error,
+    DependencyCycleError,
+    context_is_version_2,
+    v2_error,
+    convert_context,
+    dependency_graph,
+    dependency_order,
+    revert_context,
+    cc_read,
+    cc_loads,
+    cc_write,
+)
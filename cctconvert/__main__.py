@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.__main__
+
+The cctconvert Entry Point
+--------------------------
+The cctconvert command and 'python -m cctconvert' start here. A bare
+'--version' is answered without importing click or the conversion code, since
+the command is run from git hooks where start up time is what users notice.
+When $CCTCONVERT_SOCKET names the socket of a 'cctconvert --serve' daemon,
+the command line is forwarded to the daemon (unless it runs a daemon or
+watches templates), see cctconvert.daemon. Anything else is handed to the
+click command cctconvert.cctconvert.main.
+
+See benchmarks/importtime.py for the start up baseline.
+"""
+import os
+import sys
+
+SOCKET_ENVVAR = 'CCTCONVERT_SOCKET'
+
+# Prefix of the environment variables a daemon runs the command line with
+ENV_PREFIX = 'CCTCONVERT_'
+
+# Options of command lines that are never forwarded to the daemon
+LOCAL_OPTIONS = ('--serve', '--watch')
+
+
+def forward(path, argv):
+    """
+    Run the cctconvert command line argv in the daemon listening on the Unix
+    domain socket named path. Returns the daemon's response, a dict with the
+    exit code rc and the stdout and stderr text, or None if no daemon is
+    listening.
+    """
+    import json
+    import socket
+
+    request = {
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': {k: v for k, v in os.environ.items() if k.startswith(ENV_PREFIX)},   # noqa
+        'color': sys.stdout.isatty(),
+    }
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return None
+        sock.sendall(json.dumps(request).encode('utf8') + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        for chunk in iter(lambda: sock.recv(64 * 1024), b''):
+            chunks.append(chunk)
+    try:
+        return json.loads(b''.join(chunks).decode('utf8'))
+    except ValueError:
+        raise OSError('No response from the cctconvert daemon on {p}'.format(p=path))   # noqa
+
+
+def main():
+    argv = sys.argv[1:]
+
+    if argv == ['--version']:
+        from cctconvert.core import make_ident
+        print(make_ident())
+        sys.exit(0)
+
+    path = os.environ.get(SOCKET_ENVVAR)
+    if path and not any(arg.split('=')[0] in LOCAL_OPTIONS for arg in argv):
+        try:
+            response = forward(path, argv)
+        except OSError as e:
+            sys.stderr.write('Error: {e}\n'.format(e=e))
+            sys.exit(1)
+        if response is not None:
+            sys.stdout.write(response['stdout'])
+            sys.stderr.write(response['stderr'])
+            sys.exit(response['rc'])
+
+    from cctconvert.cctconvert import main as cctconvert_main
+    cctconvert_main(prog_name='cctconvert')
+
+
+# ----------------------------------------------------------------------------
+if __name__ == '__main__':  # pragma: no cover
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.aio
+
+Overlapped Batch Conversion
+---------------------------
+On a network file system converting a template is latency bound: reading it,
+checking for and renaming the backup, and writing the version 2 file each
+wait on the server while the CPU idles. An asyncio event loop keeps up to a
+limit of files in flight at once, so those waits overlap across files.
+
+Each file is still converted by the same function as a serial run, in a
+worker thread, with everything it emits captured per file; the results and
+the captured output come back in input order, exactly as a serial run
+produces them.
+
+Requires Python 3.5+.
+"""
+import io
+import sys
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+# ----------------------------------------------------------------------------
+
+
+class ThreadStdout(object):
+    """
+    A sys.stdout replacement sending what each thread writes to the buffer
+    that thread set as capture, or to stdout if it set none.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.local = threading.local()
+
+    def target(self):
+        return getattr(self.local, 'capture', None) or self.stdout
+
+    def write(self, s):
+        return self.target().write(s)
+
+    def flush(self):
+        return self.target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target(), name)
+
+
+def convert_overlapped(convert_one, args, limit, callback):
+    """
+    Call convert_one(arg) for every arg of args, up to limit at a time in
+    worker threads, capturing what each call emits on stdout.
+
+    callback(rc, output) is called with the result and the output of each
+    call in the order of args, as soon as that call and every call before it
+    have returned. If a call or callback raises, the calls not yet started
+    are cancelled and the exception is raised once those running returned.
+    """
+    stdout = ThreadStdout(sys.stdout)
+
+    def captured(arg):
+        stdout.local.capture = output = io.StringIO()
+        try:
+            rc = convert_one(arg)
+        finally:
+            stdout.local.capture = None
+        return rc, output.getvalue()
+
+    async def convert_all(loop, executor):
+        semaphore = asyncio.Semaphore(limit)
+
+        async def convert(arg):
+            async with semaphore:
+                return await loop.run_in_executor(executor, captured, arg)
+
+        tasks = [loop.create_task(convert(arg)) for arg in args]
+        try:
+            for task in tasks:
+                callback(*(await task))
+        finally:
+            # A call or the callback raised: do not start the calls pending
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    loop = asyncio.new_event_loop()
+    sys.stdout = stdout
+    try:
+        with ThreadPoolExecutor(max_workers=limit) as executor:
+            loop.run_until_complete(convert_all(loop, executor))
+    finally:
+        sys.stdout = stdout.stdout
+        loop.close()
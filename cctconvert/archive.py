@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.archive
+
+Archive Conversions
+-------------------
+'cctconvert bundle.zip' converts every cookiecutter.json inside a zip or tar
+archive of templates and writes a new archive with the converted templates
+in their place, the other members being copied as they are. The archive is
+never extracted to disk, one member is read at a time:
+
+    zip     the members are read from the central directory; the templates
+            are read and converted, every other member is copied compressed,
+            as its raw bytes, without decompressing and compressing it again
+    tar     the archive is read and written as one stream of members; a
+            compressed tar (.tar.gz, .tar.bz2, .tar.xz) is a single
+            compressed stream, so it is compressed again as it is written
+
+The new archive replaces the input (renamed to its backup) or is written to
+--output, atomically, see cctconvert.core.atomic_write. It is only written
+once every template in it converted, or was already converted.
+"""
+import io
+import os
+import copy
+import posixpath
+
+from cctconvert.core import (
+    ConversionError, InputNotFoundError, LoadError, atomic_write,
+)
+
+# ----------------------------------------------------------------------------
+# Archive file name suffixes, with the compression of the tar formats
+TAR_COMPRESSIONS = (
+    ('.tar', ''),
+    ('.tar.gz', 'gz'),
+    ('.tgz', 'gz'),
+    ('.tar.bz2', 'bz2'),
+    ('.tbz2', 'bz2'),
+    ('.tar.xz', 'xz'),
+    ('.txz', 'xz'),
+)
+
+ZIP_SUFFIX = '.zip'
+
+ARCHIVE_SUFFIXES = (ZIP_SUFFIX,) + tuple(s for s, _ in TAR_COMPRESSIONS)
+
+TEMPLATE_NAME = 'cookiecutter.json'
+
+# Bytes copied at a time
+CHUNK_SIZE = 1024 * 1024
+
+# Size of a zip local file header, before the file name and extra field
+ZIP_HEADER_SIZE = 30
+
+# General purpose flag bit of a zip member followed by a data descriptor
+ZIP_DATA_DESCRIPTOR = 0x08
+
+# General purpose flag bit of an encrypted zip member
+ZIP_ENCRYPTED = 0x01
+
+# Signature starting a data descriptor
+ZIP_DESCRIPTOR_SIGNATURE = 0x08074b50
+
+# ----------------------------------------------------------------------------
+
+
+class Unchanged(ConversionError):
+    """
+    No template in the archive was converted, all were already converted.
+    """
+
+
+def is_archive(file_name):
+    """
+    Return True if file_name names an existing zip or tar archive, by its
+    suffix.
+    """
+    return file_name.lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(file_name)   # noqa
+
+
+def is_template(member_name):
+    return posixpath.basename(member_name) == TEMPLATE_NAME
+
+
+def tar_compression(file_name):
+    name = file_name.lower()
+    for suffix, compression in TAR_COMPRESSIONS:
+        if name.endswith(suffix):
+            return compression
+    return None
+
+
+def member_label(archive_file_name, member_name):
+    """
+    The name a template is reported by: archive.zip:dir/cookiecutter.json
+    """
+    return '{a}:{m}'.format(a=archive_file_name, m=member_name)
+
+
+def decode(archive_file_name, member_name, data):
+    try:
+        return data.decode('utf8')
+    except UnicodeDecodeError as e:
+        raise LoadError("Exception: Unable to load cookiecutter file '{ccf}'".format(ccf=member_label(archive_file_name, member_name)), str(e)) from e  # noqa
+
+
+def convert_archive(archive_file_name, output_file_name, convert, fsync=False, backup=None, journal=None):   # noqa
+    """
+    Call convert(member_name, text) with the text of each template in the
+    archive named archive_file_name, in archive order, and write the archive
+    to output_file_name with each template replaced by the text convert
+    returns (or kept as it is if convert returns None). Nothing is written if
+    output_file_name is None (a dry run). fsync, backup and journal are
+    those of atomic_write. Returns the number of templates replaced.
+
+    A ConversionError raised by convert stops the conversion, nothing is
+    written. Raises InputNotFoundError if there is no template in the
+    archive, Unchanged if convert returned None for every template (nothing
+    is written either) and LoadError if the archive cannot be opened.
+    """
+    zipped = archive_file_name.lower().endswith(ZIP_SUFFIX)
+    try:
+        if zipped:
+            import zipfile
+            src = zipfile.ZipFile(archive_file_name)
+        else:
+            import tarfile
+            src = tarfile.open(archive_file_name, 'r|*')
+    except FileNotFoundError as e:
+        raise InputNotFoundError("Input archive '{a}' does not exit!!".format(a=archive_file_name)) from e  # noqa
+    except Exception as e:
+        raise LoadError("Exception: Unable to load archive '{a}'".format(a=archive_file_name), str(e)) from e  # noqa
+
+    def copy_members(fp):
+        if zipped:
+            found, replaced = _copy_zip(archive_file_name, src, fp, convert)
+        else:
+            found, replaced = _copy_tar(archive_file_name, src, fp, convert, tar_compression(archive_file_name))   # noqa
+        if not found:
+            raise InputNotFoundError("No '{t}' found in archive '{a}'!!".format(t=TEMPLATE_NAME, a=archive_file_name))  # noqa
+        if not replaced:
+            raise Unchanged("No template converted in archive '{a}'".format(a=archive_file_name))  # noqa
+        return replaced
+
+    with src:
+        if output_file_name is None:
+            return copy_members(None)
+        with atomic_write(output_file_name, fsync, backup, journal, binary=True) as fp:   # noqa
+            return copy_members(fp)
+
+
+def _copy_zip(archive_file_name, src, fp, convert):
+    """
+    Convert the templates of the zipfile.ZipFile src, writing the archive
+    to the binary file fp unless it is None. Returns the number of templates
+    (found, replaced).
+    """
+    import zipfile
+    found = replaced = 0
+    dst = None if fp is None else zipfile.ZipFile(fp, 'w')
+    try:
+        for info in src.infolist():
+            text = None
+            if is_template(info.filename) and not info.filename.endswith('/'):
+                found += 1
+                data = src.read(info)
+                text = convert(info.filename, decode(archive_file_name, info.filename, data))   # noqa
+            if text is not None:
+                replaced += 1
+            if dst is None:
+                continue
+            if text is None:
+                copy_zip_member(src, dst, info)
+            else:
+                dst.writestr(converted_zip_info(info), text.encode('utf8'))
+        if dst is not None:
+            dst.comment = src.comment
+    finally:
+        if dst is not None:
+            dst.close()
+    return found, replaced
+
+
+def converted_zip_info(info):
+    """
+    The ZipInfo of the converted template replacing the member info: the
+    same name, time, permissions and compression.
+    """
+    import zipfile
+    new = zipfile.ZipInfo(info.filename, info.date_time)
+    new.compress_type = info.compress_type
+    new.external_attr = info.external_attr
+    new.create_system = info.create_system
+    new.comment = info.comment
+    return new
+
+
+def copy_zip_member(src, dst, info):
+    """
+    Append the member info of the zipfile.ZipFile src to dst as it is
+    compressed (or encrypted), copying its raw bytes.
+
+    zipfile has no API for this: the member's local header is written anew,
+    without a data descriptor since its sizes and CRC are known, the raw
+    bytes follow, and the member is then added to dst's central directory as
+    ZipFile.write does.
+
+    An encrypted member followed by a data descriptor keeps it: traditional
+    zip encryption checks the password against a byte of the member's time
+    if it has one, of its CRC otherwise, so the encrypted bytes depend on it.
+    """
+    import struct
+    import zipfile
+    src.fp.seek(info.header_offset)
+    header = src.fp.read(ZIP_HEADER_SIZE)
+    name_size, extra_size = struct.unpack('<HH', header[26:30])
+    src.fp.seek(info.header_offset + ZIP_HEADER_SIZE + name_size + extra_size)   # noqa
+
+    descriptor = bool(info.flag_bits & ZIP_ENCRYPTED and
+                      info.flag_bits & ZIP_DATA_DESCRIPTOR)
+    zip64 = max(info.file_size, info.compress_size) > zipfile.ZIP64_LIMIT
+
+    new = copy.copy(info)
+    if not descriptor:
+        new.flag_bits &= ~ZIP_DATA_DESCRIPTOR
+    new.header_offset = dst.fp.tell()
+    dst.fp.write(new.FileHeader(zip64))
+    remaining = info.compress_size
+    while remaining:
+        chunk = src.fp.read(min(remaining, CHUNK_SIZE))
+        if not chunk:
+            raise EOFError("Truncated member '{m}'".format(m=info.filename))   # noqa
+        dst.fp.write(chunk)
+        remaining -= len(chunk)
+    if descriptor:
+        dst.fp.write(struct.pack('<LLQQ' if zip64 else '<LLLL',
+                                 ZIP_DESCRIPTOR_SIGNATURE, info.CRC,
+                                 info.compress_size, info.file_size))
+    dst.filelist.append(new)
+    dst.NameToInfo[new.filename] = new
+    dst.start_dir = dst.fp.tell()
+    dst._didModify = True
+
+
+def _copy_tar(archive_file_name, src, fp, convert, compression):
+    """
+    Convert the templates of the tarfile.TarFile src, opened as a stream,
+    writing the archive to the binary file fp as a stream unless it is None.
+    Returns the number of templates (found, replaced).
+    """
+    import tarfile
+    found = replaced = 0
+    dst = None if fp is None else tarfile.open(fileobj=fp, mode='w|' + compression)   # noqa
+    try:
+        for member in src:
+            if member.isfile() and is_template(member.name):
+                found += 1
+                data = src.extractfile(member).read()
+                text = convert(member.name, decode(archive_file_name, member.name, data))   # noqa
+                if text is not None:
+                    replaced += 1
+                    data = text.encode('utf8')
+                    member = copy.copy(member)
+                    member.size = len(data)
+                if dst is not None:
+                    dst.addfile(member, io.BytesIO(data))
+            elif dst is not None:
+                dst.addfile(member, src.extractfile(member) if member.isfile() else None)   # noqa
+    finally:
+        if dst is not None:
+            dst.close()
+    return found, replaced
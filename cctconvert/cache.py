@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.cache
+
+Conversion Cache
+----------------
+An on-disk cache of version 2 output files keyed by a hash of the version 1
+input bytes, the conversion options and the converter VERSION. When a key
+hits, the cached output is copied into place and the input is never parsed,
+transformed or serialised.
+
+The cache is bounded in size; the least recently used entries are evicted
+first. Cached outputs keep the _inception time stamp of the run that stored
+them. The number of variables of an output is stored beside it, in a
+.variables file, for --report to show when the entry hits.
+"""
+import os
+
+from cctconvert.core import (
+    VERSION, LoadError, InputNotFoundError, atomic_write,
+)
+
+DEFAULT_CACHE_DIR = '.cctconvert-cache'
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+ENTRY_EXT = '.json'
+
+VARIABLES_EXT = '.variables'
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Cache(object):
+    """
+    A size bounded LRU cache of version 2 output files in directory.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_size=DEFAULT_CACHE_SIZE):   # noqa
+        self.directory = directory
+        self.max_size = max_size
+        # Estimated size of the cache, None until the directory is scanned
+        self._size = None
+
+    def key(self, cookiecutter, *options):
+        """
+        Return the cache key of the cookiecutter file converted with options.
+
+        Raises the same errors as cc_read if the file cannot be read.
+        """
+        import hashlib
+        digest = hashlib.sha256()
+        digest.update(repr((VERSION,) + options).encode('utf8'))
+        try:
+            with open(cookiecutter, 'rb') as cc:
+                for chunk in iter(lambda: cc.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        except FileNotFoundError as e:
+            raise InputNotFoundError("Input cookiecutter file '{icf}' does not exit!!".format(icf=cookiecutter)) from e  # noqa
+        except Exception as e:
+            raise LoadError("Exception: Unable to load cookiecutter file '{ccf}'".format(ccf=cookiecutter), str(e)) from e  # noqa
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ENTRY_EXT)
+
+    @staticmethod
+    def variables_path(path):
+        """
+        The path of the number of variables stored beside the entry path.
+        """
+        return path[:-len(ENTRY_EXT)] + VARIABLES_EXT
+
+    def get(self, key):
+        """
+        Return the path of the cached output for key, or None on a miss.
+        """
+        path = self.path(key)
+        try:
+            # Mark the entry as recently used
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def restore(self, key, output_file_name, fsync=False, backup=None, journal=None):   # noqa
+        """
+        Copy the cached output for key to output_file_name, atomically, see
+        cctconvert.core.atomic_write for fsync, backup and journal.
+        """
+        import shutil
+        with atomic_write(output_file_name, fsync, backup, journal) as out:
+            with open(self.path(key), encoding='utf8') as cached:
+                shutil.copyfileobj(cached, out)
+
+    def variables(self, key):
+        """
+        Return the number of variables of the cached output for key, or None
+        if it was not stored with it.
+        """
+        try:
+            with open(self.variables_path(self.path(key)), encoding='utf8') as fp:   # noqa
+                return int(fp.read())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, output_file_name, variables=None):
+        """
+        Store a copy of output_file_name as the cached output for key, with
+        its number of variables unless None, then evict entries if the cache
+        grew too large.
+
+        Threads (--async-io) may store the same key at once, each through its
+        own temporary file. Return False if the output could not be stored,
+        which is not an error: the cache is only missing an entry.
+        """
+        import shutil
+        import threading
+        path = self.path(key)
+        tmp = '{p}.{pid}.{tid}.tmp'.format(
+            p=path, pid=os.getpid(), tid=threading.get_ident())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # The count first, an entry found is then found with it
+            if variables is not None:
+                with open(tmp, 'w', encoding='utf8') as fp:
+                    fp.write(str(variables))
+                os.replace(tmp, self.variables_path(path))
+            shutil.copyfile(output_file_name, tmp)
+            os.replace(tmp, path)
+            size = os.path.getsize(path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self.entries())
+        else:
+            self._size += size
+        if self._size > self.max_size:
+            self.evict()
+        return True
+
+    def entries(self):
+        """
+        Return a (path, size, last use) tuple for every cache entry.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            if name.endswith(ENTRY_EXT):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    # Removed by another process
+                    continue
+                entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in
+        max_size.
+        """
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+        for path, entry_size, _ in entries:
+            if size <= self.max_size:
+                break
+            self.remove(path)
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        """
+        Remove every cache entry.
+        """
+        for path, _, _ in self.entries():
+            self.remove(path)
+        self._size = 0
+
+    def remove(self, path):
+        """
+        Remove the entry path and the number of variables stored beside it.
+        """
+        for p in (path, self.variables_path(path)):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
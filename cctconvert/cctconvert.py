@@ -5,7 +5,8 @@ cctconvert
 
 A Cookiecutter Template Transformer Utility
 -------------------------------------------
-Convert a version 1 cookiecutter.json file into a version 2 file.
+Convert a version 1 cookiecutter.json file into a version 2 file, or with
+--to v1 a version 2 file back into a version 1 file.
 
 The only external dependency required is:
 
@@ -19,136 +20,554 @@ or if its been installed:
 
     cctconvert --help
 
+Modules only some code paths need (the process pool for batch jobs, the
+daemon) are imported where they are used to keep start up
+fast, see cctconvert.__main__ for the entry point.
 """
+import io
 import os
 import sys
-import json
-import pprint
-from datetime import datetime
+import glob
+import contextlib
 
 from collections import OrderedDict
 
 import click
 
+from cctconvert.archive import Unchanged, convert_archive, is_archive, member_label   # noqa
+from cctconvert.cache import Cache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE
+from cctconvert.journal import Journal, rollback
+from cctconvert.jsonbackend import get_backend, BACKEND_NAMES, DEFAULT_BACKEND   # noqa
+from cctconvert.profiling import Histogram, profiled
+from cctconvert.render import Renderer, DEFAULT_MAX_CHOICES
+from cctconvert.report import REPORT_FORMATS, DEFAULT_REPORT, file_size, open_report   # noqa
+from cctconvert.watch import DEFAULT_INTERVAL, make_watcher, watch
+from cctconvert.stream import (
+    reject_version_2_file, stream_convert, iter_convert, iter_context_json,
+)
+from cctconvert.core import (  # noqa: F401 (re-exported)
+    VERSION, IDENT, V1_BACKUP_EXT, RESULT_CODES, SET_OF_REQUIRED_FIELDS,
+    TARGETS, DEFAULT_TARGET, BACKUP_EXTS, ORDERS, DEFAULT_ORDER,
+    ConversionError, AlreadyVersion1Error, AlreadyVersion2Error,
+    InputNotFoundError, LoadError,
+    make_ident, default_name, context_is_version_2, convert_context,
+    cc_read, cc_loads, cc_write, resolve_output_filename,
+    check_output_filename,
+    sync_files, timed,
+)
+
 # ----------------------------------------------------------------------------
-# VERSION = '1.0.0'  # Initial release
-VERSION = '1.0.1'  # Added -no-incept option
+DEFAULT_COOKIECUTTER = 'cookiecutter.json'
+
+# --fsync modes, see convert_file
+FSYNC_MODES = ('always', 'batch', 'never')
 
-IDENT = 'cctconvert ' + VERSION
+DEFAULT_FSYNC = 'never'
 
-V1_BACKUP_EXT = '.v1.bkup'
+# Name of the output file written next to each template by --watch
+WATCH_OUTPUT = 'cookiecutter-{to}.json'
 
-SET_OF_REQUIRED_FIELDS = {
-    'name',
-    'cookiecutter_version',
-    'variables',
-}
+
+def error(msg):
+    """
+    Turn msg red. Thank you click.
+    """
+    click.echo(click.style(msg, fg='red'))
 
 
-def context_is_version_2(cookiecutter_context):
+def kvpair(key, val):
     """
-    Return True if the cookiecutter_context meets the current requirements for
-    a version 2 cookiecutter.json file format.
+    Color-ify a key/value pair.
     """
-    # This really is not sufficient since a v1 context could define each of
-    # these fields; perhaps a more thorough test would be to also check if the
-    # 'variables' field was defined as a list of OrderedDict items.
-    if (cookiecutter_context.keys() &
-            SET_OF_REQUIRED_FIELDS) == SET_OF_REQUIRED_FIELDS:
-        return True
+    k = click.style("{k}".format(k=key), fg='yellow')
+    v = click.style("{v}".format(v=val), fg='green')
+    click.echo('  ' + k + ' : ' + v)
+
+# ----------------------------------------------------------------------------
+
+
+def convert(cookiecutter, verbose, name, version, dryrun, output, clear, no_incept, report=None, histogram=None, **options):   # noqa
+    """
+    Converts cookiecutter (version 1) file to a version 2 file.
+
+    See main's args below for parameter definitions, any further options are
+    passed on to convert_file. Given a cctconvert.report report, the
+    conversion's record is written to it; given a
+    cctconvert.profiling.Histogram, the conversion's timings are added to it.
+    """
+    ident = make_ident()
+
+    click.echo(ident)
+    if version:
+        return 0
+
+    if clear:
+        click.clear()
+
+    stats = None if report is None and histogram is None else {}
+    rc = convert_file(cookiecutter, verbose, name, dryrun, output, no_incept, ident, stats=stats, **options)   # noqa
+    if report is not None:
+        report.write(cookiecutter, rc, stats)
+    if histogram is not None:
+        histogram.add(stats['timings'])
+    if rc == 0 and not dryrun and options.get('fsync') == 'batch':
+        sync_files([output or cookiecutter])
+    return rc
+
+
+def convert_file(cookiecutter, verbose, name, dryrun, output, no_incept, ident, stream=False, cache=None, json_backend=None, fsync=DEFAULT_FSYNC, to=DEFAULT_TARGET, order=DEFAULT_ORDER, max_choices=DEFAULT_MAX_CHOICES, diff=False, replace=False, journal=None, stats=None):   # noqa
+    """
+    Convert the single cookiecutter (version 1) file named cookiecutter and
+    return one of the RESULT_CODES.
+
+    The ident string is recorded in the _inception field of the version 2
+    template unless no_incept is True. With stream the file is converted one
+    variable at a time, see cctconvert.stream. Given a cctconvert.cache.Cache
+    the output is reused from, or stored in, that cache. json_backend names
+    the cctconvert.jsonbackend used to parse and serialise the templates.
+
+    The output is written atomically and flushed to disk if fsync is
+    'always'; with 'batch' the caller flushes every output in one go at the
+    end of the run, see sync_files.
+
+    With to='v1' the version 2 file named cookiecutter is converted back to
+    version 1 instead (not streamed), see cctconvert.core.revert_context.
+    order is the order of the version 2 variables, see
+    cctconvert.core.convert_context.
+
+    The verbose (and dryrun) output shows at most max_choices items of each
+    list, see cctconvert.render. With dryrun and diff, the diff between the
+    file the output would replace and the output is shown instead, see
+    cctconvert.diff. With output and replace, an existing output file is
+    replaced rather than reported. Given a cctconvert.journal.Journal, the
+    files written are recorded in it, see cctconvert.core.atomic_write.
+
+    A zip or tar archive is converted into a new archive, every template in
+    it being converted, see cctconvert.archive; neither the cache, stream,
+    verbose nor diff apply to archives.
+
+    Given a stats dict, it is filled in with the figures of the conversion
+    reported by --report: the number of variables written, the input and
+    output sizes and the seconds spent in each phase, see cctconvert.report.
+    """
+    timings = None
+    if stats is not None:
+        stats['input_bytes'] = file_size(cookiecutter)
+        timings = stats['timings'] = OrderedDict()
+
+    with timed(timings, 'total'):
+        rc = _convert_or_restore(cookiecutter, verbose, name, dryrun, output, no_incept, ident, stream, cache, json_backend, fsync == 'always', to, order, max_choices, dryrun and diff, replace, journal, stats)   # noqa
+
+    if stats is not None and rc == 0 and not dryrun:
+        stats['output_bytes'] = file_size(output or cookiecutter)
+    return rc
+
+
+def _convert_or_restore(cookiecutter, verbose, name, dryrun, output, no_incept, ident, stream, cache, json_backend, sync, to, order, max_choices, diff, replace, journal, stats):   # noqa
+    """
+    The body of convert_file: restore the output from the cache, or convert
+    the file and cache the output.
+    """
+    timings = None if stats is None else stats['timings']
+    try:
+        if is_archive(cookiecutter):
+            return _convert_archive(cookiecutter, name, dryrun, output, no_incept, ident, json_backend, sync, to, order, replace, journal, stats)   # noqa
+
+        key = None
+        if cache is not None and not (dryrun or verbose):
+            if name is None:
+                name = default_name(cookiecutter)
+            with timed(timings, 'cache'):
+                key = cache.key(cookiecutter, name, no_incept, to, order)
+                cached = cache.get(key)
+            if cached is not None:
+                with timed(timings, 'resolve'):
+                    outfile, backup = _resolve_output(cookiecutter, output, to, ' (cached)', replace, journal)   # noqa
+                with timed(timings, 'write'):
+                    cache.restore(key, outfile, sync, backup, journal)
+                if stats is not None:
+                    stats['variables'] = cache.variables(key)
+                return 0
+            if stats is None:
+                # Count the variables to store with the output
+                stats = {'timings': None}
+
+        if diff:
+            rc = _diff_file(cookiecutter, name, output, no_incept, ident, stream, json_backend, to, order, stats)   # noqa
+        elif stream and to == 'v2':
+            rc = _stream_file(cookiecutter, verbose, name, dryrun, output, no_incept, ident, json_backend, sync, max_choices, replace, journal, stats)   # noqa
+        else:
+            rc = _convert_file(cookiecutter, verbose, name, dryrun, output, no_incept, ident, json_backend, sync, to, order, max_choices, replace, journal, stats)   # noqa
+
+        if rc == 0 and key is not None:
+            cache.put(key, output or cookiecutter, stats.get('variables'))
+        return rc
+    except ConversionError as e:
+        error(e.message)
+        if e.detail:
+            click.echo(e.detail)
+        return e.exit_code
+
+
+def _convert_file(cookiecutter, verbose, name, dryrun, output, no_incept, ident, json_backend, fsync, to, order, max_choices, replace, journal, stats):   # noqa
+    """
+    Convert the file loading it whole, errors are raised as a
+    ConversionError.
+    """
+    timings = None if stats is None else stats['timings']
+    # ------------------------------------------------------------------------
+    if dryrun:
+        verbose = True
+
+    if verbose:
+        width, _ = click.get_terminal_size()
+        fence = '-' * (width - 5)
+
+    if name is None:
+        # Not specified on command line via --name TEXT option
+        # Derive a name from the input file name
+        name = default_name(cookiecutter)
+
+    try:
+        # The fast JSON backends may load nested objects as dicts; verbose
+        # output shows the context as written, so does not sniff version 2
+        # files either
+        with timed(timings, 'read'):
+            ctx = cc_read(cookiecutter, None if verbose else json_backend,
+                          sniff=not verbose and to == 'v2')
+        ctx_out = convert_context(ctx, name, not no_incept, ident, to, order, timings, compact=True)   # noqa
+    except (AlreadyVersion1Error, AlreadyVersion2Error) as e:
+        error("Cookiecutter file '{ccf}' is already a version {n} template!!".format(ccf=cookiecutter, n=to[1:]))  # noqa
+        if verbose:
+            out = Renderer(max_choices)
+            out.context(ctx)
+            out.flush()
+        return e.exit_code
+
+    if verbose:
+        with timed(timings, 'verbose'):
+            out = Renderer(max_choices)
+            out.line("Cookiecutter input '{ccf}' context:".format(ccf=cookiecutter))  # noqa
+            out.context(ctx)
+            out.line(fence)
+            out.line("Cookiecutter version {n} context:".format(n=to[1:]))
+            out.context(ctx_out)
+            out.line(fence)
+            out.flush()
+    elif not ctx:
+        # Empty input file
+        click.echo('{}')
+
+    if stats is not None:
+        stats['variables'] = len(ctx_out['variables'] if to == 'v2' else ctx_out)   # noqa
+
+    if not dryrun:
+        with timed(timings, 'resolve'):
+            outfile, backup = _resolve_output(cookiecutter, output, to, '', replace, journal)   # noqa
+        with timed(timings, 'write'):
+            cc_write(ctx_out, outfile, json_backend, fsync, backup, journal)   # noqa
     else:
-        return False
+        click.echo("Dry-run: No {to} output file produced.".format(to=to))
+
+    return 0
 
 
-def cc_read(cookiecutter_template_file):
+def _stream_file(cookiecutter, verbose, name, dryrun, output, no_incept, ident, json_backend, fsync, max_choices, replace, journal, stats):   # noqa
     """
-    Load the JSON file named cookiecutter_template_file into a Python context
-    object and return it.
+    Convert the file one variable at a time.
+
+    With verbose each input key/value pair and each version 2 variable is
+    emitted as it is converted, the whole contexts are never built.
     """
+    timings = None if stats is None else stats['timings']
+    if dryrun:
+        verbose = True
+
+    if name is None:
+        name = default_name(cookiecutter)
+
+    out = Renderer(max_choices)
+
+    def echo_variable(k, v, variable):
+        out.kvpair(k, v)
+        out.variable(variable)
+
+    # Reject a version 2 (or unreadable) file before touching the file system
     try:
-        with open(cookiecutter_template_file, 'r', encoding='utf8') as cc:
-            ctx = json.load(cc, object_pairs_hook=OrderedDict)
-    except Exception as e:
-        error("Exception: Unable to load cookiecutter file '{ccf}'".format(ccf=cookiecutter_template_file))  # noqa
-        click.echo(str(e))
-        sys.exit(-1)
+        with timed(timings, 'detect'):
+            reject_version_2_file(cookiecutter, json_backend)
+    except AlreadyVersion2Error as e:
+        error("Cookiecutter file '{ccf}' is already a version 2 template!!".format(ccf=cookiecutter))  # noqa
+        return e.exit_code
 
-    return ctx
+    if verbose:
+        click.echo("Cookiecutter input '{ccf}' context streamed to version 2:".format(ccf=cookiecutter))  # noqa
 
+    outfile = backup = None
+    if not dryrun:
+        with timed(timings, 'resolve'):
+            outfile, backup = _resolve_output(cookiecutter, output, 'v2', '', replace, journal)   # noqa
+
+    # Reading, transforming and writing are interleaved, all timed as write
+    with timed(timings, 'write'):
+        try:
+            count = stream_convert(
+                cookiecutter, outfile, name, not no_incept, ident,
+                echo_variable if verbose else None, check=False,
+                json_backend=json_backend, fsync=fsync, backup=backup,
+                journal=journal)
+        finally:
+            out.flush()
+    if stats is not None:
+        stats['variables'] = count
 
-def cc_write(context, output_file_name):
+    if dryrun:
+        click.echo("Dry-run: No v2 output file produced.")
+
+    return 0
+
+
+def _diff_file(cookiecutter, name, output, no_incept, ident, stream, json_backend, to, order, stats):   # noqa
     """
-    Given a Python object context and an output filename,
-    write out a JSON file.
+    Show the diff between the file the output would replace and the output,
+    nothing is written. The output of a file already converted (with its
+    backup next to it) is that of its backup, and keeps its _inception
+    ident so that only changes to the template show.
     """
-    click.echo("Writing out version 2 cookiecutter template to file '{v2f}'".format(v2f=output_file_name))  # noqa
+    # difflib and hashlib are only imported by --diff
+    from cctconvert.diff import existing_ident, would_change
+    timings = None if stats is None else stats['timings']
+    if name is None:
+        name = default_name(cookiecutter)
+
+    target = source = cookiecutter
+    if output is not None:
+        target = output
+    elif os.path.isfile(cookiecutter + BACKUP_EXTS[to]):
+        source = cookiecutter + BACKUP_EXTS[to]
+    if to == 'v2' and not no_incept:
+        ident = existing_ident(target) or ident
+
     try:
-        with open(output_file_name, encoding='utf8', mode='w') as cc:
-            json.dump(context, cc, indent=4)
+        if stream and to == 'v2':
+            with timed(timings, 'detect'):
+                reject_version_2_file(source, json_backend)
+            count = [0]
 
-    except Exception as e:
-        error("Exception: Unable to write cookiecutter file '{ccf}'".format(ccf=output_file_name))  # noqa
-        click.echo(str(e))
-        sys.exit(-2)
+            def make_chunks():
+                return iter_convert(source, name, not no_incept, ident, json_backend=json_backend, count=count)   # noqa
+        else:
+            with timed(timings, 'read'):
+                ctx = cc_read(source, json_backend, sniff=to == 'v2')
+            ctx_out = convert_context(ctx, name, not no_incept, ident, to, order, timings, compact=True)   # noqa
+            count = [len(ctx_out['variables'] if to == 'v2' else ctx_out)]
+
+            def make_chunks():
+                return iter_context_json(ctx_out, json_backend)
+    except (AlreadyVersion1Error, AlreadyVersion2Error) as e:
+        error("Cookiecutter file '{ccf}' is already a version {n} template!!".format(ccf=source, n=to[1:]))  # noqa
+        return e.exit_code
+
+    with timed(timings, 'diff'):
+        lines = would_change(target, make_chunks)
+    if stats is not None:
+        stats['variables'] = count[0]
+        stats['changed'] = lines is not None
+
+    if lines is None:
+        click.echo("No changes to '{f}'.".format(f=target))
+    else:
+        click.echo('\n'.join(lines))
+    click.echo("Dry-run: No {to} output file produced.".format(to=to))
+    return 0
 
 
-def error(msg):
+def _convert_archive(cookiecutter, name, dryrun, output, no_incept, ident, json_backend, fsync, to, order, replace, journal, stats):   # noqa
     """
-    Turn msg red. Thank you click.
+    Convert every template in the zip or tar archive named cookiecutter into
+    a new archive, see cctconvert.archive, emitting the status line of each
+    template. The archive is not written unless every template converted or
+    was already converted, nor if none converted.
     """
-    click.echo(click.style(msg, fg='red'))
+    timings = None if stats is None else stats['timings']
+    results = []
+    if stats is not None:
+        stats['variables'] = 0
+
+    def convert_member(member, text):
+        label = member_label(cookiecutter, member)
+        try:
+            ctx_out = convert_text(text, label, name or default_name(member), no_incept, ident, json_backend, to, order, timings)   # noqa
+        except (AlreadyVersion1Error, AlreadyVersion2Error) as e:
+            results.append((label, e.exit_code))
+            return None
+        except ConversionError as e:
+            results.append((label, e.exit_code))
+            raise
+        results.append((label, 0))
+        if stats is not None:
+            stats['variables'] += len(ctx_out['variables'] if to == 'v2' else ctx_out)   # noqa
+        return ''.join(iter_context_json(ctx_out, json_backend))
+
+    outfile = backup = None
+    if not dryrun:
+        with timed(timings, 'resolve'):
+            outfile, backup = _resolve_output(cookiecutter, output, to, '', replace, journal)   # noqa
 
+    # Reading, transforming and writing are interleaved, all timed as write
+    unchanged = False
+    try:
+        with timed(timings, 'write'):
+            convert_archive(cookiecutter, outfile, convert_member, fsync, backup, journal)   # noqa
+    except Unchanged:
+        unchanged = True
+    finally:
+        for label, rc in results:
+            status(label, rc)
+
+    if unchanged:
+        error("Every template in archive '{a}' is already a version {n} template!!".format(a=cookiecutter, n=to[1:]))  # noqa
+        return results[0][1]
+    if dryrun:
+        click.echo("Dry-run: No {to} output file produced.".format(to=to))
+    return 0
 
-def kvpair(key, val):
+
+def convert_text(text, cookiecutter, name, no_incept, ident, json_backend, to, order, timings=None):   # noqa
     """
-    Color-ify a key/value pair.
+    Convert the JSON text of the cookiecutter file named cookiecutter,
+    already read, and return the converted context. Errors are raised as a
+    ConversionError.
     """
-    k = click.style("{k}".format(k=key), fg='yellow')
-    v = click.style("{v}".format(v=val), fg='green')
-    click.echo('  ' + k + ' : ' + v)
+    with timed(timings, 'read'):
+        ctx = cc_loads(text, cookiecutter, json_backend, sniff=to == 'v2')
+    return convert_context(ctx, name, not no_incept, ident, to, order, timings, compact=True)   # noqa
 
 
-def resolve_output_filename(input_file_name, output_file_name):
+def _resolve_output(cookiecutter, output, to, how='', replace=False, journal=None):   # noqa
     """
-    If output_file_name is not specified, then rename the input file to a
-    version 1 backup file name, and use the input file name for the new
-    output file name. If any file name already exists, exit with an error.
+    check_output_filename, emitting what is to be done to the file system.
+    The input is only renamed to the backup once the output is written.
+    With a journal the file names are not checked, they are claimed as the
+    output is written.
     """
-    if output_file_name is None:
-        # No --output FILE on the command line
-        # Handle rename of input_file_name
-        new_input_file_name = input_file_name + V1_BACKUP_EXT
-        if os.path.exists(new_input_file_name):
-            msg = "ERROR: Input file '{ifn}' cannot be renamed to '{nifn}' because that file already exists!!"  # noqa
-            error(msg.format(ifn=input_file_name, nifn=new_input_file_name))
-            sys.exit(-3)
+    outfile, backup = check_output_filename(
+        input_file_name=cookiecutter,
+        output_file_name=output,
+        backup_ext=BACKUP_EXTS[to],
+        replace=replace,
+        check=journal is None)
+    if backup is not None:
+        click.echo("Renaming input file to '{nifn}'...".format(nifn=backup))  # noqa
+
+    click.echo("Writing out version {n} cookiecutter template to file '{v2f}'{how}".format(n=to[1:], v2f=outfile, how=how))  # noqa
+    return outfile, backup
+
+# ----------------------------------------------------------------------------
+
+
+def rollback_journal(journal_file):
+    """
+    Undo the conversions recorded in the journal named journal_file, see
+    cctconvert.journal.rollback, and return the exit code.
+    """
+    try:
+        done = rollback(journal_file)
+    except OSError as e:
+        error('ERROR: Unable to roll back the journal {j!r}: {e}'.format(j=journal_file, e=e))   # noqa
+        return 1
+    for action, file_name, backup in done:
+        if action == 'restored':
+            click.echo("Restored '{f}' from '{b}'".format(f=file_name, b=backup))   # noqa
         else:
-            click.echo("Renaming input file to '{nifn}'...".format(nifn=new_input_file_name))  # noqa
-            os.rename(input_file_name, new_input_file_name)
-            # Now input filename is available for use
-            output_file_name = input_file_name
+            click.echo("Removed '{f}'".format(f=file_name))
+    click.echo('Rolled back {n} file(s).'.format(n=len(done)))
+    return 0
 
-    if os.path.exists(output_file_name):
-        msg = "ERROR: Output file '{ofn}' already exists!!"
-        error(msg.format(ofn=output_file_name))
-        click.echo("Change the output filename via option --output-file or delete it")   # noqa
-        sys.exit(-4)
 
-    return output_file_name
+def watch_templates(root, verbose, name, output, clear, no_incept, polling=False, interval=DEFAULT_INTERVAL, stop=None, **options):   # noqa
+    """
+    Convert every template under the directory root, then each template
+    again as it changes, until the threading.Event stop is set or the user
+    interrupts. Each template is converted to the file named output (see
+    WATCH_OUTPUT) in its directory, which is replaced every time.
 
-# ----------------------------------------------------------------------------
+    See cctconvert.watch for polling and interval, any further options are
+    passed on to convert_file.
+    """
+    if output is None:
+        output = WATCH_OUTPUT.format(to=options.get('to', DEFAULT_TARGET))
+    watcher = make_watcher(root, DEFAULT_COOKIECUTTER, polling)
+
+    def convert_template(cookiecutter):
+        outfile = os.path.join(os.path.dirname(cookiecutter), output)
+        rc = convert(cookiecutter, verbose, name, False, False, outfile, clear, no_incept, replace=True, **options)   # noqa
+        status(cookiecutter, rc)
 
+    try:
+        for cookiecutter in find_templates([root]):
+            convert_template(cookiecutter)
+        click.echo("Watching '{r}' for changes ({w}), press Ctrl+C to stop...".format(r=root, w=watcher.name))   # noqa
+        watch(watcher, convert_template, interval, stop=stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
 
-def convert(cookiecutter, verbose, name, version, dryrun, output, clear, no_incept):   # noqa
+
+def is_batch_pattern(cookiecutter):
     """
-    Converts cookiecutter (version 1) file to a version 2 file.
+    Return True if the cookiecutter argument names a directory or is a glob
+    pattern, either of which may expand to many cookiecutter files.
+    """
+    return os.path.isdir(cookiecutter) or glob.has_magic(cookiecutter)
 
-    See main's args below for parameter definitions.
+
+def find_templates(cookiecutters):
+    """
+    Expand the cookiecutter arguments into a list of cookiecutter files.
+
+    A directory is searched recursively for files named 'cookiecutter.json'
+    (hidden directories are skipped), a glob pattern is expanded ('**' matches
+    any number of directories), and anything else is taken literally so that
+    a missing file is reported by the conversion. Duplicates are dropped and
+    the order of the arguments is preserved.
     """
-    ident = '{me} {tickdock}'.format(
-        me=IDENT,
-        tickdock=datetime.now().strftime('%c')
-    )
+    found = []
+    for cookiecutter in cookiecutters:
+        if os.path.isdir(cookiecutter):
+            for root, dirs, files in os.walk(cookiecutter):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                if DEFAULT_COOKIECUTTER in files:
+                    found.append(os.path.join(root, DEFAULT_COOKIECUTTER))
+        elif glob.has_magic(cookiecutter):
+            found.extend(sorted(glob.glob(cookiecutter, recursive=True)))
+        else:
+            found.append(cookiecutter)
+
+    seen = set()
+    return [f for f in found if not (f in seen or seen.add(f))]
+
+
+def convert_many(cookiecutters, version, clear, jobs=1, async_io=None, report=None, histogram=None, **options):   # noqa
+    """
+    Convert every cookiecutter (version 1) file found by find_templates in
+    this one process, then emit a summary table. The options are passed on
+    to convert_file.
+
+    With jobs greater than one the files are spread across a pool of that
+    many worker processes. With async_io up to that many files are converted
+    at once by an asyncio event loop, overlapping their file I/O, see
+    cctconvert.aio. Either way per-file output and results are still emitted
+    in input order, as are the records written to the cctconvert.report
+    report if given. Given a cctconvert.profiling.Histogram, the timings of
+    every file are added to it.
+
+    Returns 0 if every file converted, otherwise the first non-zero result
+    code in input order.
+    """
+    ident = make_ident()
 
     click.echo(ident)
     if version:
@@ -157,80 +576,172 @@ def convert(cookiecutter, verbose, name, version, dryrun, output, clear, no_ince
     if clear:
         click.clear()
 
-    width, _ = click.get_terminal_size()
-    fence = '-' * (width - 5)
+    cookiecutters = find_templates(cookiecutters)
+    options.update(output=None, ident=ident)
+    collect = report is not None or histogram is not None
+    args = [(cookiecutter, options, collect) for cookiecutter in cookiecutters]   # noqa
+
+    rcs = []
+
+    def done(result, output):
+        rc, stats = result
+        click.echo(output, nl=False)
+        cookiecutter = cookiecutters[len(rcs)]
+        status(cookiecutter, rc)
+        if report is not None:
+            report.write(cookiecutter, rc, stats)
+        if histogram is not None:
+            histogram.add(stats['timings'])
+        rcs.append(rc)
+
+    if async_io and len(args) > 1:
+        from cctconvert.aio import convert_overlapped
+        convert_overlapped(convert_one, args, min(async_io, len(args)), done)   # noqa
+    elif jobs > 1 and len(args) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        jobs = min(jobs, len(args))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunksize = max(1, len(args) // (jobs * 4))
+            for result, output in pool.map(convert_one_captured, args, chunksize=chunksize):   # noqa
+                done(result, output)
+    else:
+        for arg in args:
+            done(convert_one(arg), '')
 
-    # ------------------------------------------------------------------------
-    if dryrun:
-        verbose = True
+    results = list(zip(cookiecutters, rcs))
+    if options.get('fsync') == 'batch' and not options.get('dryrun'):
+        sync_files([ccf for ccf, rc in results if rc == 0])
+    summary(results)
 
-    if not os.path.exists(cookiecutter):
-        error("Input cookiecutter file '{icf}' does not exit!!".format(icf=cookiecutter))  # noqa
-        return -5
+    for rc in rcs:
+        if rc != 0:
+            return rc
+    return 0
 
-    ctx = cc_read(cookiecutter)
 
-    if context_is_version_2(ctx):
-        error("Cookiecutter file '{ccf}' is already a version 2 template!!".format(ccf=cookiecutter))  # noqa
-        if verbose:
-            click.echo(pprint.pformat(ctx, indent=4, width=width - 5))
-        return -6
+def convert_one(args):
+    """
+    Batch step: run convert_file on the (cookiecutter, options, collect)
+    args tuple and return the (result code, stats) pair, stats being the
+    figures for the report if collect is True (see convert_file), otherwise
+    None.
+    """
+    cookiecutter, options, collect = args
+    click.echo("Converting '{ccf}'...".format(ccf=cookiecutter))
+    stats = {} if collect else None
+    return convert_file(cookiecutter, stats=stats, **options), stats
 
-    if name is None:
-        # Not specified on command line via --name TEXT option
-        # Derive a name from the input file name
-        name = os.path.splitext(os.path.basename(cookiecutter))[0]
-        name = name + '-transformed'
-
-    if no_incept:
-        ctx_v2 = OrderedDict([
-            ('name', name),
-            ('cookiecutter_version', '2.0.0'),
-            ('variables', []),
-        ])
-    else:
-        ctx_v2 = OrderedDict([
-            ('name', name),
-            ('cookiecutter_version', '2.0.0'),
-            ('_inception', 'Transformed by ' + ident),
-            ('variables', []),
-        ])
 
-    if verbose:
-        click.echo("Cookiecutter input '{ccf}' context:".format(ccf=cookiecutter))  # noqa
-    v = None
-    for k in ctx.keys():
-        v = ctx[k]
-        if verbose:
-            kvpair(k, v)
-        if isinstance(v, list):
-            ctx_v2['variables'].append(OrderedDict([('name', k), ('default', v[0]), ('choices', v)]))  # noqa
-        elif k.startswith('_'):
-            # private variable, do not prompt user
-            ctx_v2['variables'].append(OrderedDict([('name', k), ('default', v), ('prompt_user', False)]))  # noqa
-        else:
-            ctx_v2['variables'].append(OrderedDict([('name', k), ('default', v)]))  # noqa
-    if v is None:
-        # Empty input file
-        click.echo('{}')
+def convert_one_captured(args):
+    """
+    Process pool worker: run convert_one capturing everything it emits, and
+    return the ((result code, stats), output) pair so the parent can emit
+    the output in input order.
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        result = convert_one(args)
+    return result, output.getvalue()
 
-    if verbose:
-        click.echo(fence)
-        click.echo("Cookiecutter version 2 context:")
-        click.echo(pprint.pformat(ctx_v2, indent=4, width=width - 5))
-        click.echo(fence)
 
-    if not dryrun:
-        outfile = resolve_output_filename(
-            input_file_name=cookiecutter,
-            output_file_name=output)
+def convert_blobs(cookiecutters, version, clear, report=None, histogram=None, name=None, no_incept=False, json_backend=None, to=DEFAULT_TARGET, order=DEFAULT_ORDER):   # noqa
+    """
+    Convert the cookiecutter files named cookiecutters as they are in the
+    git HEAD commit, their blobs being read from the object database (see
+    cctconvert.git.read_blobs), then emit a summary table. Nothing is
+    written, the status line of each file tells whether it converts. The
+    report and histogram are those of convert_many.
+
+    Returns 0 if every file converted, otherwise the first non-zero result
+    code in input order.
+    """
+    from cctconvert.git import read_blobs
+    ident = make_ident()
 
-        cc_write(ctx_v2, outfile)
-    else:
-        click.echo("Dry-run: No v2 output file produced.")
+    click.echo(ident)
+    if version:
+        return 0
 
+    if clear:
+        click.clear()
+
+    results = []
+    for cookiecutter, data in read_blobs(cookiecutters):
+        stats = None
+        if report is not None or histogram is not None:
+            stats = {'input_bytes': None if data is None else len(data)}
+        rc = _convert_blob(cookiecutter, data, name, no_incept, ident, json_backend, to, order, stats)   # noqa
+        status(cookiecutter, rc)
+        if report is not None:
+            report.write(cookiecutter, rc, stats)
+        if histogram is not None:
+            histogram.add(stats['timings'])
+        results.append((cookiecutter, rc))
+
+    summary(results)
+    click.echo("Dry-run: No {to} output file produced.".format(to=to))
+    for _, rc in results:
+        if rc != 0:
+            return rc
+    return 0
+
+
+def _convert_blob(cookiecutter, data, name, no_incept, ident, json_backend, to, order, stats):   # noqa
+    """
+    Convert the bytes data of the cookiecutter file named cookiecutter (None
+    if it has no blob) and return one of the RESULT_CODES.
+    """
+    timings = None
+    if stats is not None:
+        timings = stats['timings'] = OrderedDict()
+    with timed(timings, 'total'):
+        try:
+            if data is None:
+                raise InputNotFoundError("Input cookiecutter file '{icf}' does not exit!!".format(icf=cookiecutter))  # noqa
+            try:
+                text = data.decode('utf8')
+            except UnicodeDecodeError as e:
+                raise LoadError("Exception: Unable to load cookiecutter file '{ccf}'".format(ccf=cookiecutter), str(e)) from e  # noqa
+            ctx_out = convert_text(text, cookiecutter, name or default_name(cookiecutter), no_incept, ident, json_backend, to, order, timings)   # noqa
+        except (AlreadyVersion1Error, AlreadyVersion2Error) as e:
+            return e.exit_code
+        except ConversionError as e:
+            error(e.message)
+            if e.detail:
+                click.echo(e.detail)
+            return e.exit_code
+    if stats is not None:
+        stats['variables'] = len(ctx_out['variables'] if to == 'v2' else ctx_out)   # noqa
     return 0
 
+
+def status(cookiecutter, rc):
+    """
+    Emit the per-file status line of a batch conversion.
+    """
+    msg = '[{rc:>2}] {desc:<21} {ccf}'.format(
+        rc=rc, desc=RESULT_CODES.get(rc, 'unknown error'), ccf=cookiecutter)
+    if rc == 0:
+        click.echo(click.style(msg, fg='green'))
+    else:
+        error(msg)
+
+
+def summary(results):
+    """
+    Emit a table counting the batch results by result code.
+    """
+    counts = OrderedDict((rc, 0) for rc in RESULT_CODES)
+    for _, rc in results:
+        counts[rc] = counts.get(rc, 0) + 1
+
+    click.echo('Summary:')
+    for rc, count in counts.items():
+        if count:
+            kvpair('{rc:>2} {desc:<21}'.format(
+                rc=rc, desc=RESULT_CODES.get(rc, 'unknown error')), count)
+    kvpair('   {desc:<21}'.format(desc='total'), len(results))
+
 # ----------------------------------------------------------------------------
 
 
@@ -238,7 +749,7 @@ def convert(cookiecutter, verbose, name, version, dryrun, output, clear, no_ince
 @click.argument(
     'cookiecutter',
     # type=click.Path(exists=True),
-    default='cookiecutter.json')
+    nargs=-1)
 @click.option(
     '--verbose', '-v', is_flag=True, default=False,
     help='Emit input context and emit output context during the transform')
@@ -251,6 +762,9 @@ def convert(cookiecutter, verbose, name, version, dryrun, output, clear, no_ince
 @click.option(
     '--dryrun', '-d', is_flag=True, default=False,
     help='Do not change the file system, but display input context & generated output context')  # noqa
+@click.option(
+    '--diff', is_flag=True, default=False,
+    help='With --dryrun, show the unified diff between the file the version 2 template would replace (or, once converted, the template converted again from its backup) and the template, rather than the contexts.')   # noqa
 @click.option(
     '--output', '-o', default=None, metavar='FILE',
     help='File name of the version 2 template file being generated.')
@@ -260,11 +774,95 @@ def convert(cookiecutter, verbose, name, version, dryrun, output, clear, no_ince
 @click.option(
     '--no-incept', '-i', is_flag=True, default=False,
     help='Suppress writing the private _inception field to the version 2 template header')   # noqa
-def main(cookiecutter, verbose, name, version, dryrun, output, clear, no_incept):   # noqa
+@click.option(
+    '--jobs', '-j', type=click.IntRange(min=1), default=None, metavar='N',
+    help='Number of worker processes used in batch mode. Defaults to the number of CPUs.')   # noqa
+@click.option(
+    '--async-io', type=click.IntRange(min=1), default=None, metavar='N',
+    help='Convert up to N files at once in batch mode, overlapping their file I/O in one process (for network file systems). Cannot be used with --jobs.')   # noqa
+@click.option(
+    '--stream', '-s', is_flag=True, default=False,
+    help='Convert one variable at a time so memory use is bounded by the largest variable rather than the whole file')   # noqa
+@click.option(
+    '--cache-dir', default=None, metavar='DIR', envvar='CCTCONVERT_CACHE_DIR',
+    help='Reuse version 2 output cached in DIR (e.g. {d}) for unchanged input files. Defaults to $CCTCONVERT_CACHE_DIR.'.format(d=DEFAULT_CACHE_DIR))   # noqa
+@click.option(
+    '--cache-size', type=click.IntRange(min=0), default=DEFAULT_CACHE_SIZE, metavar='BYTES',   # noqa
+    help='Size of the cache, least recently used entries are evicted beyond it.')   # noqa
+@click.option(
+    '--no-cache', is_flag=True, default=False,
+    help='Do not use the cache, even if a cache directory is set.')
+@click.option(
+    '--clear-cache', is_flag=True, default=False,
+    help='Empty the cache directory before converting, or only empty it if no COOKIECUTTER is given.')   # noqa
+@click.option(
+    '--json-backend', type=click.Choice(BACKEND_NAMES), default=DEFAULT_BACKEND,   # noqa
+    envvar='CCTCONVERT_JSON_BACKEND',
+    help='JSON library used to read and write templates, auto picks the fastest one installed. The output is identical whatever the library.')   # noqa
+@click.option(
+    '--fsync', type=click.Choice(FSYNC_MODES), default=DEFAULT_FSYNC,
+    help='Flush each output file to disk as it is written (always), all of them at once at the end of the run (batch), or leave it to the system (never). Output files are always replaced atomically.')   # noqa
+@click.option(
+    '--serve', is_flag=True, default=False,
+    help='Run as a daemon serving conversions on the --socket Unix domain socket.')   # noqa
+@click.option(
+    '--socket', 'socket_path', default=None, metavar='PATH', envvar='CCTCONVERT_SOCKET',   # noqa
+    help='Socket the --serve daemon listens on. Defaults to $CCTCONVERT_SOCKET, which also makes cctconvert forward conversions to the daemon.')   # noqa
+@click.option(
+    '--to', type=click.Choice(TARGETS), default=DEFAULT_TARGET,
+    help='Version of the template written. With v1 a version 2 COOKIECUTTER file is converted back to version 1, backed up with a .v2.bkup extension; --name and --no-incept are then unused.')   # noqa
+@click.option(
+    '--order', type=click.Choice(ORDERS), default=DEFAULT_ORDER,
+    help='Order of the version 2 variables: that of the version 1 keys, or with dependencies every variable after the variables its default refers to in Jinja expressions (cycles are errors).')   # noqa
+@click.option(
+    '--report', type=click.Choice(REPORT_FORMATS), default=DEFAULT_REPORT,
+    help='With jsonl also write one JSON record per file (result, sizes, timings) to --report-file.')   # noqa
+@click.option(
+    '--report-file', default='-', metavar='FILE',
+    help='File the --report records are written to. Defaults to stdout, the other output then goes to stderr.')   # noqa
+@click.option(
+    '--journal', 'journal_file', default=None, metavar='FILE',
+    help='Record the backups and outputs written in the journal FILE, claiming every file name as it is written rather than checking it beforehand, so that concurrent runs cannot overwrite each other\'s files. See --rollback.')   # noqa
+@click.option(
+    '--rollback', is_flag=True, default=False,
+    help='Undo the conversions recorded in the --journal FILE in one pass, restoring every backup and removing every --output file, then remove the journal.')   # noqa
+@click.option(
+    '--since', default=None, metavar='REV',
+    help='Only convert the templates added or modified since the git revision REV, the COOKIECUTTER arguments being git pathspecs (by default, every template under the current directory).')   # noqa
+@click.option(
+    '--from-git', is_flag=True, default=False,
+    help='Read the templates from the git HEAD commit rather than the working tree (a bare clone will do); requires --dryrun. Without --since every template in HEAD is converted.')   # noqa
+@click.option(
+    '--watch', 'watch_root', default=None, metavar='ROOT',
+    type=click.Path(exists=True, file_okay=False),
+    help='Convert every cookiecutter.json under ROOT, then convert each again whenever it changes, to the --output file next to it (cookiecutter-v2.json by default).')   # noqa
+@click.option(
+    '--poll', is_flag=True, default=False,
+    help='With --watch, poll for changes rather than use file system events (always the case unless the watchdog package is installed).')   # noqa
+@click.option(
+    '--poll-interval', type=float, default=DEFAULT_INTERVAL, metavar='SECONDS',   # noqa
+    help='Seconds between two polls of --watch --poll.')
+@click.option(
+    '--max-choices', type=click.IntRange(min=0), default=DEFAULT_MAX_CHOICES, metavar='N',   # noqa
+    help='Number of items of each list (e.g. choices) shown by --verbose and --dryrun, 0 for all.')   # noqa
+@click.option(
+    '--profile', is_flag=True, default=False,
+    help='Emit a table of the time spent in each phase of the conversions, and their histogram.')   # noqa
+@click.option(
+    '--profile-dump', default=None, metavar='FILE',
+    help='Run under cProfile and dump the pstats to FILE (worker processes are not profiled, see --jobs).')   # noqa
+def main(cookiecutter, verbose, name, version, dryrun, diff, output, clear, no_incept, jobs, async_io, stream, cache_dir, cache_size, no_cache, clear_cache, json_backend, fsync, serve, socket_path, to, order, report, report_file, journal_file, rollback, since, from_git, watch_root, poll, poll_interval, max_choices, profile, profile_dump):   # noqa
     """\b
     Transform a version 1 COOKIECUTTER file into a version 2 file.
     Default COOKIECUTTER file is 'cookiecutter.json' in current directory.
 
+    Batch mode: given several COOKIECUTTER files, directories or glob
+    patterns, every file is converted in one run. A directory is searched
+    recursively for 'cookiecutter.json' files. Each file is backed up and
+    replaced as described below, and a summary table is emitted at the end.
+    The files are converted by --jobs worker processes, or --async-io
+    files at a time by one process.
+
     This transform/conversion will NEVER delete a file.
 
     The default behavior will attempt to backup the input version 1
@@ -278,8 +876,140 @@ def main(cookiecutter, verbose, name, version, dryrun, output, clear, no_incept)
     If a file is found to already exits, either during the renaming of the
     input file, or the writing of the output file, an abort of the transform
     will occur and the user will be responsible for correcting the error.
+
+    Reverse mode: --to v1 converts version 2 COOKIECUTTER files back into
+    version 1 files, for Cookiecutter 1.x.
+
+    Git mode: --since REV converts only the templates changed since the git
+    revision REV; --from-git reads them from the HEAD commit.
+
+    Archive mode: a COOKIECUTTER zip or tar archive is converted into a new
+    archive, every 'cookiecutter.json' in it being converted, without
+    extracting it.
+
+    Daemon mode: --serve keeps cctconvert running on the --socket PATH.
+    While $CCTCONVERT_SOCKET names that socket, cctconvert runs every
+    conversion in the daemon, skipping the start up cost.
     """
-    sys.exit(convert(cookiecutter, verbose, name, version, dryrun, output, clear, no_incept))    # noqa
+    if serve:
+        if not socket_path:
+            raise click.UsageError('--serve requires --socket')
+        from cctconvert.daemon import serve as serve_forever
+        try:
+            serve_forever(socket_path, lambda: click.echo(
+                "cctconvert daemon listening on '{p}'".format(p=socket_path)))   # noqa
+        except OSError as e:
+            error('ERROR: {e}'.format(e=e))
+            sys.exit(1)
+        sys.exit(0)
+
+    if rollback:
+        if not journal_file:
+            raise click.UsageError('--rollback requires --journal')
+        sys.exit(rollback_journal(journal_file))
+    journal = Journal(journal_file) if journal_file else None
+
+    if watch_root is not None:
+        if cookiecutter:
+            raise click.UsageError('--watch cannot be used with COOKIECUTTER files')   # noqa
+        if dryrun or jobs is not None or async_io is not None or journal:
+            raise click.UsageError('--watch cannot be used with --dryrun, --jobs, --async-io or --journal')   # noqa
+        if output is not None and os.path.basename(output) == DEFAULT_COOKIECUTTER:   # noqa
+            raise click.UsageError('--output cannot be {c} with --watch'.format(c=DEFAULT_COOKIECUTTER))   # noqa
+    if poll_interval <= 0:
+        raise click.BadParameter('must be positive', param_hint='--poll-interval')   # noqa
+
+    git_templates = None
+    if since is not None or from_git:
+        # subprocess is only imported by --since and --from-git
+        from cctconvert.git import GitError, changed_templates
+        if watch_root is not None:
+            raise click.UsageError('--watch cannot be used with --since or --from-git')   # noqa
+        if from_git and not dryrun:
+            raise click.UsageError('--from-git requires --dryrun')
+        if output is not None:
+            raise click.UsageError('--output cannot be used with --since or --from-git')   # noqa
+        try:
+            git_templates = changed_templates(since, cookiecutter, from_git)
+        except GitError as e:
+            error('ERROR: git: {e}'.format(e=e))
+            sys.exit(1)
+        if not git_templates and not version:
+            click.echo(make_ident())
+            click.echo('No templates changed{since}.'.format(
+                since='' if since is None else " since '{r}'".format(r=since)))   # noqa
+            sys.exit(0)
+        cookiecutter = tuple(git_templates)
+
+    # --clear-cache without templates to convert only clears the cache
+    clear_only = not cookiecutter and watch_root is None
+    if not cookiecutter:
+        cookiecutter = (DEFAULT_COOKIECUTTER,)
+
+    if diff and not dryrun:
+        raise click.UsageError('--diff requires --dryrun')
+    if to == 'v1' and stream:
+        raise click.UsageError('--stream cannot be used with --to v1')
+    if order != DEFAULT_ORDER and (stream or to == 'v1'):
+        raise click.UsageError('--order {o} cannot be used with --stream or --to v1'.format(o=order))   # noqa
+
+    cache = None
+    if clear_cache:
+        if not cache_dir:
+            raise click.UsageError('--clear-cache requires --cache-dir')
+        Cache(cache_dir).clear()
+        if clear_only:
+            click.echo("Cleared the cache '{d}'.".format(d=cache_dir))
+            sys.exit(0)
+    if cache_dir and not no_cache:
+        cache = Cache(cache_dir, cache_size)
+
+    try:
+        json_backend = get_backend(json_backend).name
+    except ImportError:
+        raise click.BadParameter(
+            '{jb} is not installed'.format(jb=json_backend),
+            param_hint='--json-backend')
+
+    if watch_root is not None:
+        if version:
+            click.echo(make_ident())
+            sys.exit(0)
+        rc = watch_templates(watch_root, verbose, name, output, clear, no_incept, poll, poll_interval, stream=stream, cache=cache, json_backend=json_backend, fsync=fsync, to=to, order=order, max_choices=max_choices)   # noqa
+        sys.exit(rc)
+
+    single = git_templates is None and len(cookiecutter) == 1 and not is_batch_pattern(cookiecutter[0])   # noqa
+    if not single:
+        if output is not None:
+            raise click.UsageError('--output cannot be used with multiple COOKIECUTTER files')   # noqa
+
+        if async_io is not None:
+            if jobs is not None:
+                raise click.UsageError('--async-io cannot be used with --jobs')   # noqa
+            jobs = 1
+        elif jobs is None:
+            jobs = os.cpu_count() or 1
+
+    histogram = Histogram() if profile else None
+
+    with open_report(report, report_file) as report, profiled(profile_dump):
+        if from_git:
+            from cctconvert.git import GitError
+            try:
+                rc = convert_blobs(cookiecutter, version, clear, report, histogram, name, no_incept, json_backend, to, order)   # noqa
+            except GitError as e:
+                error('ERROR: git: {e}'.format(e=e))
+                rc = 1
+        elif single:
+            rc = convert(cookiecutter[0], verbose, name, version, dryrun, output, clear, no_incept, report, histogram, stream=stream, cache=cache, json_backend=json_backend, fsync=fsync, to=to, order=order, max_choices=max_choices, diff=diff, journal=journal)    # noqa
+        else:
+            rc = convert_many(cookiecutter, version, clear, jobs, async_io, report, histogram, verbose=verbose, name=name, dryrun=dryrun, no_incept=no_incept, stream=stream, cache=cache, json_backend=json_backend, fsync=fsync, to=to, order=order, max_choices=max_choices, diff=diff, journal=journal)    # noqa
+
+        if histogram is not None and histogram.samples:
+            click.echo('Profile:')
+            for line in histogram.lines():
+                click.echo(line)
+    sys.exit(rc)
 
 
 # ----------------------------------------------------------------------------
@@ -0,0 +1,964 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.core
+
+The Cookiecutter Template Transform
+-----------------------------------
+The version 1 to version 2 transform, and its reverse, without any terminal
+I/O, usable in-process by other Python code:
+
+    from cctconvert import cc_read, convert_context, ConversionError
+
+    try:
+        ctx_v2 = convert_context(cc_read('cookiecutter.json'), 'my-template')
+    except ConversionError as e:
+        print(e.exit_code, e.message)
+
+convert_context(ctx, name, to='v1') turns a version 2 context back into a
+version 1 context instead, see revert_context.
+
+The version 2 context is an OrderedDict, its variables OrderedDicts too.
+With compact=True they are Variable records instead, a fraction of the
+memory, which cc_write writes exactly the same.
+
+Failures are reported by raising a ConversionError subclass whose exit_code
+is the exit code cctconvert returns for it.
+
+Importing this module is cheap: the JSON backends and datetime are only
+imported by the functions using them, so that 'cctconvert --version' starts
+fast.
+"""
+import io
+import os
+import time
+import functools
+import contextlib
+
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# ----------------------------------------------------------------------------
+# VERSION = '1.0.0'  # Initial release
+# VERSION = '1.0.1'  # Added -no-incept option
+VERSION = '1.1.0'  # Typed version 2 variables, see V2_TYPES
+
+IDENT = 'cctconvert ' + VERSION
+
+INCEPTION_PREFIX = 'Transformed by '
+
+V1_BACKUP_EXT = '.v1.bkup'
+
+V2_BACKUP_EXT = '.v2.bkup'
+
+# Versions a context can be converted to, see convert_context
+TARGETS = ('v1', 'v2')
+
+DEFAULT_TARGET = 'v2'
+
+# Orders of the version 2 variables, see convert_context
+ORDERS = ('keys', 'dependencies')
+
+DEFAULT_ORDER = 'keys'
+
+# The input file is backed up with the extension of its own version
+BACKUP_EXTS = {
+    'v1': V2_BACKUP_EXT,
+    'v2': V1_BACKUP_EXT,
+}
+
+# Exit codes returned by a conversion, see RC table in tests/test_convert.py
+RESULT_CODES = OrderedDict([
+    (0, 'converted'),
+    (-1, 'unable to load'),
+    (-2, 'unable to write'),
+    (-3, 'backup already exists'),
+    (-4, 'output already exists'),
+    (-5, 'does not exist'),
+    (-6, 'already version 2'),
+    (-7, 'invalid version 2'),
+    (-8, 'already version 1'),
+    (-9, 'dependency cycle'),
+])
+
+SET_OF_REQUIRED_FIELDS = {
+    'name',
+    'cookiecutter_version',
+    'variables',
+}
+
+# The (field, type, type description) of the required version 2 fields
+V2_REQUIRED_FIELDS = (
+    ('name', str, 'a string'),
+    ('cookiecutter_version', str, 'a string'),
+    ('variables', list, 'a list'),
+)
+
+# Optional fields of a version 2 variable that must be booleans
+V2_BOOLEAN_FIELDS = ('prompt_user', 'hide_input')
+
+# The kind of a version 1 value by its Python type, see classify; bool before
+# int, a bool being an int too
+VALUE_KINDS = OrderedDict([
+    (str, 'string'),
+    (bool, 'bool'),
+    (int, 'int'),
+    (float, 'float'),
+    (list, 'list'),
+    (dict, 'dict'),
+    (OrderedDict, 'dict'),
+    (type(None), 'null'),
+])
+
+# The version 2 'type' field of each kind of version 1 value. Strings, the
+# version 2 default type, choices and nulls have none; a list only has one
+# when it is not a choice list, see make_variable
+V2_TYPES = {
+    'bool': 'boolean',
+    'int': 'int',
+    'float': 'float',
+    'list': 'json',
+    'dict': 'json',
+}
+
+# The phases of a conversion timed by timed, in the order they run
+PHASES = (
+    'cache',      # hashing the input and looking it up in the cache
+    'read',       # cc_read, including the input existence check
+    'detect',     # detecting a version 2 (or version 1, with --to v1) input
+    'transform',  # building the variables
+    'validate',   # checking the version 2 context
+    'verbose',    # pretty-printing the contexts
+    'diff',       # comparing the output to the file it replaces, --diff
+    'resolve',    # checking the output and backup file names
+    'write',      # cc_write
+    'total',      # the whole conversion of a file
+)
+
+# Callables hook(phase, seconds) called as each timed phase ends, see
+# cctconvert.profiling
+PHASE_HOOKS = []
+
+# A Jinja expression or statement, and a reference to a variable in one
+JINJA_BLOCK = r'\{\{.*?\}\}|\{%.*?%\}'
+
+JINJA_REFERENCE = r'''\bcookiecutter\s*(?:\.\s*(\w+)|\[\s*['"]([^'"]+)['"]\s*\])'''   # noqa
+
+# ----------------------------------------------------------------------------
+
+
+class ConversionError(Exception):
+    """
+    Base class of the errors raised by a conversion.
+
+    message is the error itself, detail (if any) is additional information
+    such as the text of the underlying exception.
+    """
+    exit_code = None
+
+    def __init__(self, message, detail=None):
+        super().__init__(message)
+        self.message = message
+        self.detail = detail
+
+
+class LoadError(ConversionError):
+    """
+    The cookiecutter file could not be loaded.
+    """
+    exit_code = -1
+
+
+class WriteError(ConversionError):
+    """
+    The version 2 cookiecutter file could not be written.
+    """
+    exit_code = -2
+
+
+class BackupExistsError(ConversionError):
+    """
+    The input file cannot be backed up, the backup file already exists.
+    """
+    exit_code = -3
+
+
+class OutputExistsError(ConversionError):
+    """
+    The output file already exists.
+    """
+    exit_code = -4
+
+
+class InputNotFoundError(ConversionError):
+    """
+    The input cookiecutter file does not exist.
+    """
+    exit_code = -5
+
+
+class AlreadyVersion2Error(ConversionError):
+    """
+    The input cookiecutter context is already a version 2 context.
+    """
+    exit_code = -6
+
+
+class InvalidVersion2Error(ConversionError):
+    """
+    A cookiecutter context has the version 2 fields but is not a valid
+    version 2 context. The detail says what is wrong.
+    """
+    exit_code = -7
+
+
+class AlreadyVersion1Error(ConversionError):
+    """
+    The cookiecutter context to convert to version 1 is already a version 1
+    context.
+    """
+    exit_code = -8
+
+
+class DependencyCycleError(ConversionError):
+    """
+    The variables cannot be ordered by their dependencies, some refer to
+    each other in a cycle. The detail names the variables of the cycle.
+    """
+    exit_code = -9
+
+# ----------------------------------------------------------------------------
+
+
+def make_ident():
+    """
+    Return the identity string emitted at start up and recorded in the
+    _inception field of a version 2 template.
+    """
+    from datetime import datetime
+    return '{me} {tickdock}'.format(
+        me=IDENT,
+        tickdock=datetime.now().strftime('%c')
+    )
+
+
+def default_name(cookiecutter):
+    """
+    Derive a version 2 template name from the cookiecutter file name.
+    """
+    name = os.path.splitext(os.path.basename(cookiecutter))[0]
+    return name + '-transformed'
+
+
+def context_is_version_2(cookiecutter_context):
+    """
+    Return True if the cookiecutter_context meets the current requirements for
+    a version 2 cookiecutter.json file format, see v2_error.
+    """
+    return v2_error(cookiecutter_context) is None
+
+
+def has_version_2_fields(cookiecutter_context):
+    """
+    Return True if the cookiecutter_context defines every field required by
+    the version 2 format, which no version 1 template should.
+    """
+    return (isinstance(cookiecutter_context, dict) and
+            (cookiecutter_context.keys() &
+             SET_OF_REQUIRED_FIELDS) == SET_OF_REQUIRED_FIELDS)
+
+
+def v2_error(cookiecutter_context):
+    """
+    Return why cookiecutter_context is not a valid version 2 context, or None
+    if it is one.
+
+    The context is checked in a single pass over its variables, allocating
+    nothing unless an error is found.
+    """
+    if not isinstance(cookiecutter_context, dict):
+        return 'The context is not a JSON object'
+    for field, kind, description in V2_REQUIRED_FIELDS:
+        if field not in cookiecutter_context:
+            return "Field '{f}' is missing".format(f=field)
+        if not isinstance(cookiecutter_context[field], kind):
+            return "Field '{f}' is not {d}".format(f=field, d=description)
+    for index, variable in enumerate(cookiecutter_context['variables']):
+        error = variable_error(variable)
+        if error is not None:
+            return 'Variable {i}: {e}'.format(i=index, e=error)
+    return None
+
+
+def variable_error(variable):
+    """
+    Return why variable is not a valid version 2 variable, or None if it is
+    one.
+    """
+    if not isinstance(variable, (dict, Variable)):
+        return 'not a JSON object'
+    if not isinstance(variable.get('name'), str):
+        return "field 'name' is missing or not a string"
+    if 'default' not in variable:
+        return "field 'default' is missing"
+    for field in V2_BOOLEAN_FIELDS:
+        if field in variable and not isinstance(variable[field], bool):
+            return "field '{f}' is not a boolean".format(f=field)
+    if 'type' in variable and not isinstance(variable['type'], str):
+        return "field 'type' is not a string"
+    if 'choices' in variable:
+        choices = variable['choices']
+        if not isinstance(choices, list):
+            return "field 'choices' is not a list"
+        if variable['default'] not in choices:
+            return "the default is not one of the choices"
+    return None
+
+
+def reject_version_2(ctx):
+    """
+    Raise AlreadyVersion2Error if the context ctx is a valid version 2
+    context, otherwise InvalidVersion2Error.
+    """
+    error = v2_error(ctx)
+    if error is None:
+        raise AlreadyVersion2Error(
+            'Cookiecutter context is already a version 2 context')
+    raise InvalidVersion2Error(
+        'Cookiecutter context is an invalid version 2 context', error)
+
+
+def convert_context(ctx, name, incept=True, ident=None, to=DEFAULT_TARGET, order=DEFAULT_ORDER, timings=None, compact=False):   # noqa
+    """
+    Transform the version 1 cookiecutter context ctx into a version 2 context
+    named name and return it.
+
+    Unless incept is False, the version 2 header records an _inception field
+    naming ident (make_ident() by default).
+
+    Raises LoadError if ctx is not a JSON object, AlreadyVersion2Error if
+    ctx is already a version 2 context, and InvalidVersion2Error if ctx has
+    the version 2 fields but is not a valid version 2 context, or if the
+    version 2 context built is not valid.
+
+    The variables are in the order of the keys of ctx; with
+    order='dependencies' every variable comes after the variables it refers
+    to, see dependency_order, which may raise DependencyCycleError.
+
+    With to='v1' the version 2 context ctx is transformed back into a
+    version 1 context instead, name, incept and ident are unused, see
+    revert_context.
+
+    Given a timings dict, the seconds spent transforming and validating are
+    added to it, see timed.
+
+    The variables are OrderedDicts, or with compact Variable records (see
+    Variable), which only cc_write and cctconvert.stream serialise.
+    """
+    if to == 'v1':
+        return revert_context(ctx, timings)
+
+    with timed(timings, 'detect'):
+        reject_not_object(ctx)
+        if has_version_2_fields(ctx):
+            reject_version_2(ctx)
+
+    with timed(timings, 'transform'):
+        ctx_v2 = make_header(name, incept, ident)
+        if order == 'dependencies':
+            items = [(k, ctx[k]) for k in dependency_order(ctx)]
+        else:
+            items = ctx.items()
+        if compact:
+            ctx_v2['variables'] = [make_variable(k, v) for k, v in items]
+        else:
+            ctx_v2['variables'] = [make_variable(k, v)._asdict() for k, v in items]   # noqa
+
+    with timed(timings, 'validate'):
+        error = v2_error(ctx_v2)
+    if error is not None:
+        raise InvalidVersion2Error(
+            'Converted cookiecutter context is not a valid version 2 context', error)   # noqa
+
+    return ctx_v2
+
+
+def reject_not_object(ctx):
+    """
+    Raise LoadError unless the context ctx is a JSON object, that is a dict
+    (a JSON file may hold an array or a number just as well).
+    """
+    if not isinstance(ctx, dict):
+        raise LoadError('Cookiecutter context is not a JSON object',
+                        'Found {t} instead'.format(t=type(ctx).__name__))
+
+
+def make_header(name, incept=True, ident=None):
+    """
+    Return the header of a version 2 context, with an empty variables list.
+    """
+    if not incept:
+        return OrderedDict([
+            ('name', name),
+            ('cookiecutter_version', '2.0.0'),
+            ('variables', []),
+        ])
+    else:
+        return OrderedDict([
+            ('name', name),
+            ('cookiecutter_version', '2.0.0'),
+            ('_inception', INCEPTION_PREFIX + (ident or make_ident())),
+            ('variables', []),
+        ])
+
+
+def make_variable(k, v, kind=None):
+    """
+    Return the version 2 variable for the version 1 key k and value v, whose
+    kind (see classify) is worked out unless given.
+
+    A list is a choice list defaulting to its first item, unless it is empty
+    or private (e.g. _copy_without_render): it is then a value of type json,
+    like a dict.
+    """
+    if kind is None:
+        kind = classify(v)
+    private = k.startswith('_')
+    if kind == 'list' and v and not private:
+        return Variable(k, v[0], choices=v)
+
+    # A private variable is not prompted for
+    return Variable(k, v, type=V2_TYPES.get(kind),
+                    prompt_user=False if private else None)
+
+
+class Variable(Mapping):
+    """
+    A version 2 variable, as made by make_variable: a read-only mapping of
+    its fields, in the order they are written (name, default, then choices,
+    type or prompt_user if set).
+
+    The fields are held in slots rather than in a dict, and the choices are
+    the version 1 list itself, so that the hundreds of thousands of
+    variables of a large context take a fraction of the memory of as many
+    OrderedDicts, see convert_context(compact=True). cc_write writes a
+    variable field by field (see cctconvert.stream.variable_json); the JSON
+    backends build its mapping (see _asdict) as they write it.
+    """
+    __slots__ = ('name', 'default', 'choices', 'type', 'prompt_user')
+
+    # The fields set unless None
+    OPTIONAL_FIELDS = ('choices', 'type', 'prompt_user')
+
+    def __init__(self, name, default, choices=None, type=None, prompt_user=None):   # noqa
+        self.name = name
+        self.default = default
+        self.choices = choices
+        self.type = type
+        self.prompt_user = prompt_user
+
+    def __getitem__(self, field):
+        if field == 'name':
+            return self.name
+        if field == 'default':
+            return self.default
+        if field in self.OPTIONAL_FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                return value
+        raise KeyError(field)
+
+    def __contains__(self, field):
+        if field in self.OPTIONAL_FIELDS:
+            return getattr(self, field) is not None
+        return field == 'name' or field == 'default'
+
+    def __iter__(self):
+        yield 'name'
+        yield 'default'
+        for field in self.OPTIONAL_FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return '{c}({f})'.format(c=self.__class__.__name__, f=', '.join(
+            '{k}={v!r}'.format(k=k, v=v) for k, v in self.items()))
+
+    def _asdict(self):
+        """
+        Return the OrderedDict of the fields, as written.
+        """
+        fields = OrderedDict([('name', self.name), ('default', self.default)])   # noqa
+        if self.choices is not None:
+            fields['choices'] = self.choices
+        if self.type is not None:
+            fields['type'] = self.type
+        if self.prompt_user is not None:
+            fields['prompt_user'] = self.prompt_user
+        return fields
+
+
+def classify(v):
+    """
+    Return the kind of the version 1 value v: 'string', 'templated' (a string
+    holding Jinja), 'bool', 'int', 'float', 'list', 'dict' or 'null'.
+    """
+    kind = VALUE_KINDS.get(type(v))
+    if kind is None:
+        # A subclass, from some JSON backend
+        kind = next(k for t, k in VALUE_KINDS.items() if isinstance(v, t))
+    if kind == 'string' and ('{{' in v or '{%' in v):
+        kind = 'templated'
+    return kind
+
+
+def dependency_graph(ctx):
+    """
+    Return an OrderedDict mapping every key of the version 1 context ctx to
+    the tuple of the keys of ctx its value refers to in Jinja expressions,
+    in one pass over ctx. References to anything else, such as
+    cookiecutter._template, are left out.
+    """
+    graph = OrderedDict()
+    for k, v in ctx.items():
+        graph[k] = tuple(name for name in value_references(v) if name in ctx)
+    return graph
+
+
+def dependency_order(ctx):
+    """
+    Return the keys of the version 1 context ctx ordered so that every key
+    comes after the keys it refers to (see dependency_graph), the keys
+    otherwise keeping their order: a key only moves up to just before the
+    first key that needs it.
+
+    The graph is walked depth first, without recursion, visiting every key
+    and reference once, so this takes linear time however long the chains
+    of references.
+
+    Raises DependencyCycleError if keys refer to each other in a cycle.
+    """
+    graph = dependency_graph(ctx)
+    visiting, done = 1, 2
+    state = {}
+    order = []
+    for root in graph:
+        if root in state:
+            continue
+        state[root] = visiting
+        stack = [(root, iter(graph[root]))]
+        while stack:
+            k, references = stack[-1]
+            for reference in references:
+                if reference not in state:
+                    state[reference] = visiting
+                    stack.append((reference, iter(graph[reference])))
+                    break
+                if state[reference] == visiting:
+                    path = [key for key, _ in stack]
+                    cycle = path[path.index(reference):] + [reference]
+                    raise DependencyCycleError(
+                        'Cookiecutter variables cannot be ordered by their dependencies',   # noqa
+                        'Cycle: ' + ' -> '.join(cycle))
+            else:
+                stack.pop()
+                state[k] = done
+                order.append(k)
+    return order
+
+
+def value_references(v):
+    """
+    Return the tuple of the variable names the version 1 value v refers to
+    in Jinja expressions, in order of first reference. Lists and dicts are
+    searched through, dict keys included.
+    """
+    if isinstance(v, str):
+        return template_references(v) if '{' in v else ()
+    if isinstance(v, dict):
+        items = [x for kv in v.items() for x in kv]
+    elif isinstance(v, list):
+        items = v
+    else:
+        return ()
+    names = OrderedDict()
+    for item in items:
+        for name in value_references(item):
+            names[name] = None
+    return tuple(names)
+
+
+@functools.lru_cache(maxsize=4096)
+def template_references(text):
+    """
+    Return the tuple of the variable names the Jinja template text refers
+    to, in order of first reference.
+
+    Templates repeat the same expressions over and over, so the analysis of
+    each text is cached.
+    """
+    block, reference = jinja_patterns()
+    names = OrderedDict()
+    for expression in block.findall(text):
+        for attribute, item in reference.findall(expression):
+            names[attribute or item] = None
+    return tuple(names)
+
+
+@functools.lru_cache(maxsize=None)
+def jinja_patterns():
+    """
+    Return the compiled (JINJA_BLOCK, JINJA_REFERENCE) patterns.
+    """
+    import re
+    return re.compile(JINJA_BLOCK, re.DOTALL), re.compile(JINJA_REFERENCE)
+
+
+def revert_context(ctx, timings=None):
+    """
+    Transform the version 2 cookiecutter context ctx back into a version 1
+    context and return it, one key per variable in the order of the
+    variables.
+
+    This is convert_context run backwards: both check the version 2 context
+    with v2_error, and make_item is the inverse of make_variable, so the
+    version 1 context of a converted template is the original one. Version 2
+    fields that version 1 cannot express (the header, hide_input, ...) are
+    dropped.
+
+    Raises LoadError if ctx is not a JSON object, AlreadyVersion1Error if
+    ctx does not have the version 2 fields, and InvalidVersion2Error if it
+    is not a valid version 2 context or two of its variables map to the same
+    version 1 key. See timed for timings.
+    """
+    with timed(timings, 'detect'):
+        reject_not_object(ctx)
+        if not has_version_2_fields(ctx):
+            raise AlreadyVersion1Error(
+                'Cookiecutter context is already a version 1 context')
+    with timed(timings, 'validate'):
+        error = v2_error(ctx)
+    if error is not None:
+        raise InvalidVersion2Error(
+            'Cookiecutter context is an invalid version 2 context', error)
+
+    variables = ctx['variables']
+    with timed(timings, 'transform'):
+        ctx_v1 = OrderedDict(make_item(variable) for variable in variables)
+
+    if len(ctx_v1) != len(variables):
+        seen = set()
+        for index, variable in enumerate(variables):
+            k, _ = make_item(variable)
+            if k in seen:
+                raise InvalidVersion2Error(
+                    'Cookiecutter context cannot be converted to a version 1 context',   # noqa
+                    "Variable {i}: key '{k}' is already used".format(i=index, k=k))   # noqa
+            seen.add(k)
+
+    return ctx_v1
+
+
+def make_item(variable):
+    """
+    Return the version 1 (key, value) pair of the version 2 variable.
+
+    A variable with choices becomes the list of its choices, its default
+    first, and a variable not prompted for becomes a private '_' key.
+    """
+    k = variable['name']
+    v = variable['default']
+    if 'choices' in variable:
+        choices = variable['choices']
+        if choices[0] == v:
+            v = choices
+        else:
+            i = choices.index(v)
+            v = [v] + choices[:i] + choices[i + 1:]
+    if variable.get('prompt_user') is False and not k.startswith('_'):
+        k = '_' + k
+    return k, v
+
+
+def timed(timings, phase):
+    """
+    Return a context manager adding the seconds spent in its block to
+    timings[phase], unless timings is None, and passing them to every hook
+    of PHASE_HOOKS.
+
+    With no timings and no hooks, it is a shared context manager doing
+    nothing, so untimed conversions pay next to nothing.
+    """
+    if timings is None and not PHASE_HOOKS:
+        return NOT_TIMED
+    return _Timer(timings, phase)
+
+
+class _NotTimed(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NOT_TIMED = _NotTimed()
+
+
+class _Timer(object):
+    __slots__ = ('timings', 'phase', 'start')
+
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        if self.timings is not None:
+            self.timings[self.phase] = self.timings.get(self.phase, 0.0) + seconds   # noqa
+        for hook in PHASE_HOOKS:
+            hook(self.phase, seconds)
+        return False
+
+# ----------------------------------------------------------------------------
+
+
+def cc_read(cookiecutter_template_file, json_backend=None, sniff=False):
+    """
+    Load the JSON file named cookiecutter_template_file into a Python context
+    object and return it.
+
+    json_backend names the cctconvert.jsonbackend used to parse the file.
+
+    With sniff, a file whose leading bytes hold a version 2 header (see
+    cctconvert.stream.looks_like_version_2) is parsed the quickest way, into
+    plain dicts, and rejected by reject_version_2 if it has the version 2
+    fields, without building the ordered context.
+    """
+    from cctconvert.jsonbackend import get_backend
+    backend = get_backend(json_backend)
+    try:
+        with open(cookiecutter_template_file, 'r', encoding='utf8') as cc:
+            if not sniff:
+                return backend.load(cc)
+            text = cc.read()
+    except FileNotFoundError as e:
+        raise InputNotFoundError("Input cookiecutter file '{icf}' does not exit!!".format(icf=cookiecutter_template_file)) from e  # noqa
+    except Exception as e:
+        raise LoadError("Exception: Unable to load cookiecutter file '{ccf}'".format(ccf=cookiecutter_template_file), str(e)) from e  # noqa
+
+    return cc_loads(text, cookiecutter_template_file, json_backend, sniff)
+
+
+def cc_loads(text, cookiecutter_template_file, json_backend=None, sniff=False):   # noqa
+    """
+    cc_read for the JSON text of the cookiecutter file named
+    cookiecutter_template_file, already read (e.g. from an archive, see
+    cctconvert.archive).
+    """
+    from cctconvert.jsonbackend import get_backend
+    backend = get_backend(json_backend)
+    try:
+        if sniff:
+            from cctconvert.stream import looks_like_version_2
+            if looks_like_version_2(text):
+                import json
+                ctx = json.loads(text)
+                if has_version_2_fields(ctx):
+                    reject_version_2(ctx)
+        return backend.load(io.StringIO(text))
+
+    except ConversionError:
+        raise
+    except Exception as e:
+        raise LoadError("Exception: Unable to load cookiecutter file '{ccf}'".format(ccf=cookiecutter_template_file), str(e)) from e  # noqa
+
+
+def cc_write(context, output_file_name, json_backend=None, fsync=False, backup=None, journal=None):   # noqa
+    """
+    Given a Python object context and an output filename,
+    write out a JSON file.
+
+    json_backend names the cctconvert.jsonbackend used to serialise context.
+    A version 2 context is written one variable at a time, see
+    cctconvert.stream.iter_context_json. The file is written atomically, see
+    atomic_write for fsync, backup and journal.
+    """
+    from cctconvert.stream import iter_context_json
+    with atomic_write(output_file_name, fsync, backup, journal) as cc:
+        cc.writelines(iter_context_json(context, json_backend))
+
+
+@contextlib.contextmanager
+def atomic_write(output_file_name, fsync=False, backup=None, journal=None, binary=False):   # noqa
+    """
+    Context manager yielding a text file (with binary, a binary file) that
+    replaces output_file_name once it is completely written, so a
+    conversion that fails or is killed never leaves a truncated output file
+    behind.
+
+    The text is written to a temporary file next to output_file_name which
+    is then renamed into place. If backup is given, the existing
+    output_file_name (the version 1 input) is first renamed to backup, as
+    late as possible. With fsync the file and the directory are flushed to
+    disk before returning.
+
+    Given a cctconvert.journal.Journal, the write is recorded in it and the
+    backup (or without one, output_file_name) is claimed by creating it
+    exclusively rather than being checked beforehand (see
+    check_output_filename), raising BackupExistsError (OutputExistsError) if
+    it exists.
+
+    Raises WriteError if the file cannot be written, the temporary file is
+    then removed and nothing else is changed.
+    """
+    import threading
+    tmp = '{p}.{pid}.{tid}.tmp'.format(
+        p=output_file_name, pid=os.getpid(), tid=threading.get_ident())
+    if journal is not None:
+        journal.plan(output_file_name, backup)
+    try:
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        except FileExistsError:
+            # Left over by a killed run of the same process and thread ids
+            os.remove(tmp)
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        claimed = None
+        renamed = False
+        try:
+            with (open(fd, mode='wb') if binary else open(fd, encoding='utf8', mode='w')) as cc:   # noqa
+                yield cc
+                cc.flush()
+                if fsync:
+                    os.fsync(cc.fileno())
+            if journal is not None:
+                name = backup or output_file_name
+                claim(name, output_file_name)
+                claimed = name
+                journal.claim(output_file_name, claimed)
+            if backup is not None:
+                # Over the empty file claimed, if any
+                (os.rename if claimed is None else os.replace)(output_file_name, backup)   # noqa
+                renamed = True
+            os.replace(tmp, output_file_name)
+        except BaseException:
+            if renamed:
+                # Put the input back where it was
+                os.rename(backup, output_file_name)
+            elif claimed is not None:
+                os.remove(claimed)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        if journal is not None:
+            journal.commit(output_file_name)
+        if fsync:
+            sync_directory(os.path.dirname(output_file_name))
+
+    except ConversionError:
+        raise
+    except Exception as e:
+        raise WriteError("Exception: Unable to write cookiecutter file '{ccf}'".format(ccf=output_file_name), str(e)) from e  # noqa
+
+
+def sync_directory(directory):
+    """
+    Flush the entries of directory (renames) to disk, where supported.
+    """
+    if os.name == 'posix':
+        fd = os.open(directory or os.curdir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def sync_files(file_names):
+    """
+    Flush the files named file_names, the files a run wrote, to disk, then
+    each distinct directory holding them (their renames) once. Nothing else
+    is flushed, unlike os.sync which waits for every file system of the
+    host.
+    """
+    directories = OrderedDict()
+    for file_name in file_names:
+        with open(file_name, 'rb+') as fp:
+            os.fsync(fp.fileno())
+        directories[os.path.dirname(os.path.abspath(file_name))] = None
+    for directory in directories:
+        sync_directory(directory)
+
+
+def check_output_filename(input_file_name, output_file_name, backup_ext=V1_BACKUP_EXT, replace=False, check=True):   # noqa
+    """
+    Return the (output file name, backup file name) pair of a conversion.
+
+    If output_file_name is not specified, the output file replaces the
+    input file, which is to be renamed to a backup file name ending in
+    backup_ext, otherwise the backup file name is None. Unless check is
+    False (the names are then claimed as they are written, see
+    atomic_write), if any file name already exists, raise an error, unless
+    replace is True and that is the output file. Nothing is renamed, see
+    resolve_output_filename.
+    """
+    backup_file_name = None
+    if output_file_name is None:
+        # No --output FILE on the command line
+        backup_file_name = input_file_name + backup_ext
+        if check and os.path.exists(backup_file_name):
+            raise exists_error(input_file_name, backup_file_name)
+        return input_file_name, backup_file_name
+
+    if check and not replace and os.path.exists(output_file_name):
+        raise exists_error(output_file_name)
+
+    return output_file_name, backup_file_name
+
+
+def exists_error(file_name, backup_file_name=None):
+    """
+    Return the error raised when the output file named file_name, or the
+    backup file name of the input file named file_name, already exists.
+    """
+    if backup_file_name is not None:
+        msg = "ERROR: Input file '{ifn}' cannot be renamed to '{nifn}' because that file already exists!!"  # noqa
+        return BackupExistsError(msg.format(ifn=file_name, nifn=backup_file_name))  # noqa
+    msg = "ERROR: Output file '{ofn}' already exists!!"
+    return OutputExistsError(
+        msg.format(ofn=file_name),
+        "Change the output filename via option --output-file or delete it")
+
+
+def claim(file_name, output_file_name):
+    """
+    Create the empty file named file_name, the backup of output_file_name
+    unless they are the same, raising its exists_error if it exists.
+    """
+    try:
+        os.close(os.open(file_name, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))   # noqa
+    except FileExistsError:
+        if file_name == output_file_name:
+            raise exists_error(output_file_name)
+        raise exists_error(output_file_name, file_name)
+
+
+def resolve_output_filename(input_file_name, output_file_name):
+    """
+    If output_file_name is not specified, then rename the input file to a
+    version 1 backup file name, and use the input file name for the new
+    output file name. If any file name already exists, raise an error.
+    """
+    output_file_name, backup_file_name = check_output_filename(
+        input_file_name, output_file_name)
+    if backup_file_name is not None:
+        os.rename(input_file_name, backup_file_name)
+
+    return output_file_name
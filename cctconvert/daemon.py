@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.daemon
+
+Conversion Daemon
+-----------------
+'cctconvert --serve --socket PATH' keeps a warm interpreter listening on the
+Unix domain socket PATH. When the CCTCONVERT_SOCKET environment variable
+names that socket, the cctconvert command forwards its arguments to the
+daemon rather than importing click and converting in process (see
+cctconvert.__main__); if no daemon answers it converts in process as usual.
+
+Every request is served by a forked child that changes to the client's
+working directory, takes the client's CCTCONVERT_* environment variables and
+runs the cctconvert command line exactly as the client would have, so
+concurrent clients share no state. The protocol is one JSON request line:
+
+    {"argv": [...], "cwd": "...", "env": {...}, "color": false}
+
+answered by one JSON response, {"rc": 0, "stdout": "...", "stderr": "..."},
+before the connection is closed. The client is forward() in
+cctconvert.__main__.
+"""
+import io
+import os
+import sys
+import json
+import signal
+import socket
+import contextlib
+import socketserver
+
+from cctconvert.__main__ import ENV_PREFIX
+
+# ----------------------------------------------------------------------------
+
+
+def run_request(request):
+    """
+    Run the cctconvert command line of the request in this process and
+    return the response. Only call this in a process of its own, it changes
+    the working directory and environment.
+    """
+    from cctconvert.cctconvert import main
+
+    os.chdir(request['cwd'])
+    for k in [k for k in os.environ if k.startswith(ENV_PREFIX)]:
+        del os.environ[k]
+    os.environ.update(request['env'])
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):   # noqa
+        try:
+            main.main(args=request['argv'], prog_name='cctconvert',
+                      color=request['color'] or None)
+            rc = 0
+        except SystemExit as e:
+            rc = e.code
+    if rc is None:
+        rc = 0
+    elif not isinstance(rc, int):
+        # sys.exit(msg) prints msg and exits with 1
+        stderr.write('{msg}\n'.format(msg=rc))
+        rc = 1
+
+    return {
+        'rc': rc,
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+    }
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Serve one request, in a forked child of the daemon.
+    """
+
+    def handle(self):
+        # The daemon's SIGTERM handler is not the child's business
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        request = json.loads(self.rfile.readline().decode('utf8'))
+        response = run_request(request)
+        self.wfile.write(json.dumps(response).encode('utf8'))
+
+
+class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+def is_listening(path):
+    """
+    Return True if a daemon is listening on the socket named path.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def serve(path, ready=None):
+    """
+    Serve conversion requests on the Unix domain socket named path until
+    interrupted or terminated. If given, ready() is called once listening.
+
+    Raises OSError if another daemon is listening on path.
+    """
+    # Warm up the modules the conversions import lazily
+    import pprint  # noqa: F401
+    import cctconvert.cctconvert  # noqa: F401
+
+    if os.path.exists(path):
+        if is_listening(path):
+            raise OSError("A cctconvert daemon is already listening on '{p}'".format(p=path))   # noqa
+        # Left over by a daemon that was killed
+        os.remove(path)
+
+    # Only the user may connect, the daemon writes files as the user
+    umask = os.umask(0o177)
+    try:
+        server = Server(path, RequestHandler)
+    finally:
+        os.umask(umask)
+
+    def terminate(signum, frame):
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        if ready is not None:
+            ready()
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.diff
+
+Dry-Run Diffs
+-------------
+'cctconvert --dryrun --diff' shows what a conversion would change as a
+unified diff between the file its output would replace and that output,
+rather than the whole contexts. For a template already converted (its
+version 1 backup is next to it) the backup is converted again, and the
+output compared to the template, so CI can check that the converted
+templates are up to date.
+
+The output is generated in chunks and hashed as it is generated, and its
+digest compared to that of the existing file. Only when they differ are
+the output and the file split into lines and diffed.
+"""
+import io
+import hashlib
+import difflib
+
+from cctconvert.core import INCEPTION_PREFIX
+from cctconvert.stream import SNIFF_SIZE, iter_context_items
+
+CHUNK_SIZE = 64 * 1024
+
+# ----------------------------------------------------------------------------
+
+
+def file_digest(file_name):
+    """
+    Return the SHA-256 digest of the file named file_name, None if there is
+    no such file.
+    """
+    h = hashlib.sha256()
+    try:
+        with open(file_name, 'rb') as fp:
+            for block in iter(lambda: fp.read(CHUNK_SIZE), b''):
+                h.update(block)
+    except FileNotFoundError:
+        return None
+    return h.digest()
+
+
+def text_digest(chunks):
+    """
+    Return the SHA-256 digest of the UTF-8 text made of the chunks
+    iterable, as file_digest would once written.
+    """
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update(chunk.encode('utf8'))
+    return h.digest()
+
+
+def existing_ident(file_name):
+    """
+    Return the ident recorded in the _inception field of the version 2
+    template file named file_name, None if it has none (or is not a
+    readable template). Only the header, at the top of the file, is read.
+    """
+    try:
+        with open(file_name, 'r', encoding='utf8') as fp:
+            head = fp.read(SNIFF_SIZE)
+    except (OSError, ValueError):
+        return None
+    try:
+        for k, v in iter_context_items(io.StringIO(head)):
+            if k == '_inception':
+                if isinstance(v, str) and v.startswith(INCEPTION_PREFIX):
+                    return v[len(INCEPTION_PREFIX):]
+                return None
+    except ValueError:
+        # The header ends in the middle of the variables
+        pass
+    return None
+
+
+def diff_lines(file_name, chunks, label=None):
+    """
+    Return the lines (without line ends) of the unified diff between the
+    text file named file_name (empty if there is no such file) and the text
+    made of the chunks iterable. label names the text, the file name
+    followed by ' (converted)' by default.
+    """
+    try:
+        with open(file_name, 'r', encoding='utf8') as fp:
+            old = fp.read().splitlines()
+    except FileNotFoundError:
+        old = []
+    new = ''.join(chunks).splitlines()
+    if label is None:
+        label = '{f} (converted)'.format(f=file_name)
+    return list(difflib.unified_diff(old, new, file_name, label, lineterm=''))   # noqa
+
+
+def would_change(file_name, make_chunks):
+    """
+    Return None if the text made of the chunks iterable returned by
+    make_chunks() is the content of the file named file_name, or else the
+    lines of their diff, see diff_lines. make_chunks is only called a second
+    time to build the diff.
+    """
+    if text_digest(make_chunks()) == file_digest(file_name):
+        return None
+    return diff_lines(file_name, make_chunks())
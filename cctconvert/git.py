@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.git
+
+Git-Aware Conversions
+---------------------
+'cctconvert --since REV' only converts the templates added or modified since
+the git revision REV, as listed by one 'git diff --name-only', so that a
+conversion (a CI check) costs as much as the change rather than the
+repository. The COOKIECUTTER arguments are then git pathspecs limiting the
+templates listed.
+
+'cctconvert --from-git' reads the templates from the blobs of the HEAD
+commit instead of the working tree, so that a bare clone converts as well:
+one 'git cat-file --batch' process streams every blob. Without --since every
+template in HEAD is converted, that is every template changed since the
+empty tree.
+
+The paths listed, and read, are relative to the current directory, and
+limited to it.
+"""
+import threading
+import posixpath
+import subprocess
+
+# ----------------------------------------------------------------------------
+TEMPLATE_NAME = 'cookiecutter.json'
+
+# ----------------------------------------------------------------------------
+
+
+class GitError(Exception):
+    """
+    A git command failed, the message is its error output.
+    """
+
+
+def git(args, stdin=None):
+    """
+    Run git with the list of args and return its output, as bytes.
+    """
+    try:
+        proc = subprocess.run(['git'] + list(args), input=stdin,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)   # noqa
+    except FileNotFoundError as e:
+        raise GitError('git is not installed') from e
+    if proc.returncode != 0:
+        raise GitError(proc.stderr.decode('utf8', 'replace').strip())
+    return proc.stdout
+
+
+def split_paths(output):
+    """
+    The paths of the NUL separated output of a git command run with -z.
+    """
+    return [p for p in output.decode('utf8', 'surrogateescape').split('\0') if p]   # noqa
+
+
+def is_template(path):
+    return posixpath.basename(path) == TEMPLATE_NAME
+
+
+def empty_tree():
+    """
+    The object name of the empty tree, in the repository's hash algorithm.
+    """
+    return git(['hash-object', '-t', 'tree', '--stdin'], b'').decode().strip()   # noqa
+
+
+def changed_templates(rev=None, pathspecs=(), from_git=False):
+    """
+    Return the paths of the templates matching the pathspecs that were
+    added or modified since the revision rev, in the HEAD commit (from_git)
+    or in the working tree, untracked templates included. Without rev every
+    template in the HEAD commit is returned (with from_git). Deleted
+    templates are not.
+
+    Raises GitError if git fails, e.g. rev is not a revision.
+    """
+    args = ['diff', '--name-only', '-z', '--relative', '--no-renames',
+            '--diff-filter=d', rev or empty_tree()]
+    if from_git:
+        args.append('HEAD')
+    paths = split_paths(git(args + ['--'] + list(pathspecs)))
+    if not from_git:
+        paths += split_paths(git(['ls-files', '--others', '--exclude-standard', '-z', '--'] + list(pathspecs)))   # noqa
+
+    seen = set()
+    return sorted(p for p in paths if is_template(p) and not (p in seen or seen.add(p)))   # noqa
+
+
+def read_blobs(paths, rev='HEAD'):
+    """
+    Yield the (path, data) pair of each path, data being the bytes of the
+    path's blob in the revision rev, or None if there is no such blob.
+
+    The blobs are read by one 'git cat-file --batch' process, which is sent
+    every request at once by a thread while the blobs are read back.
+    """
+    prefix = git(['rev-parse', '--show-prefix']).decode('utf8', 'surrogateescape').strip()   # noqa
+    try:
+        proc = subprocess.Popen(['git', 'cat-file', '--batch'],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)   # noqa
+    except FileNotFoundError as e:
+        raise GitError('git is not installed') from e
+
+    def request():
+        try:
+            for path in paths:
+                proc.stdin.write('{rev}:{p}{path}\n'.format(rev=rev, p=prefix, path=path).encode('utf8', 'surrogateescape'))   # noqa
+            proc.stdin.close()
+        except OSError:
+            # git exited, the reader reports it
+            pass
+
+    writer = threading.Thread(target=request, daemon=True)
+    writer.start()
+    try:
+        for path in paths:
+            header = proc.stdout.readline()
+            if not header:
+                raise GitError("git cat-file exited reading '{p}'".format(p=path))   # noqa
+            fields = header.split()
+            if len(fields) != 3:
+                # '<object> missing'
+                yield path, None
+                continue
+            data = proc.stdout.read(int(fields[2]))
+            proc.stdout.read(1)
+            # Not a file (a directory named cookiecutter.json)
+            yield path, data if fields[1] == b'blob' else None
+    finally:
+        proc.kill()
+        writer.join()
+        proc.stdout.close()
+        proc.wait()
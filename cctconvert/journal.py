@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.journal
+
+Transactional Conversions
+-------------------------
+'cctconvert --journal FILE' records every file a conversion writes in the
+journal FILE, one JSON object per line, as it goes:
+
+    {"op": "plan", "path": "a/cookiecutter.json",
+     "backup": "a/cookiecutter.json.v1.bkup", "pid": 4242}
+    {"op": "claim", "path": "a/cookiecutter.json",
+     "claimed": "a/cookiecutter.json.v1.bkup"}
+    {"op": "commit", "path": "a/cookiecutter.json"}
+
+plan is recorded before anything is written, claim once the backup (or,
+converting to --output, the output file) has been created exclusively by
+this run, and commit once the output has replaced the input. Claiming a
+file name by creating it fails if the file exists, so runs converting the
+same tree at once (--jobs workers, CI shards) can neither overwrite each
+other's backups nor race between checking and renaming, and no file name is
+checked beforehand. See cctconvert.core.atomic_write.
+
+'cctconvert --rollback --journal FILE' reads the journal once and undoes
+every conversion that claimed a file: a backup is renamed back to the input
+(if the input was converted, or the run stopped half way), an output file is
+removed. The journal is then removed. Runs append to the journal, use one
+journal per run to roll back a run on its own.
+"""
+import os
+import json
+import threading
+
+from collections import OrderedDict
+
+# ----------------------------------------------------------------------------
+# The journals this process appends to, by file name
+_files = {}
+
+_lock = threading.Lock()
+
+# ----------------------------------------------------------------------------
+
+
+class Journal(object):
+    """
+    The journal file named path, opened for appending as records are first
+    written in each process, so that a Journal can be passed to worker
+    processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, record):
+        """
+        Append the record and flush it, before the operation it records.
+        """
+        line = json.dumps(record) + '\n'
+        with _lock:
+            fp = _files.get(self.path)
+            if fp is None:
+                fp = _files[self.path] = open(self.path, 'a', encoding='utf8')   # noqa
+            fp.write(line)
+            fp.flush()
+
+    def plan(self, output_file_name, backup=None):
+        self.write(OrderedDict([
+            ('op', 'plan'), ('path', output_file_name), ('backup', backup),
+            ('pid', os.getpid()),
+        ]))
+
+    def claim(self, output_file_name, claimed):
+        self.write(OrderedDict([
+            ('op', 'claim'), ('path', output_file_name), ('claimed', claimed),
+        ]))
+
+    def commit(self, output_file_name):
+        self.write(OrderedDict([('op', 'commit'), ('path', output_file_name)]))   # noqa
+
+    def close(self):
+        with _lock:
+            fp = _files.pop(self.path, None)
+        if fp is not None:
+            fp.close()
+
+
+def read_records(path):
+    """
+    Return the records of the journal named path. A last line cut short by
+    a killed run is skipped.
+    """
+    records = []
+    with open(path, encoding='utf8') as fp:
+        for line in fp:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                pass
+    return records
+
+
+def rollback(path):
+    """
+    Undo the conversions recorded in the journal named path, latest first,
+    then remove the journal. Returns the list of (action, file name, backup
+    file name) done, action being 'restored' (from the backup) or 'removed'
+    (backup being None).
+
+    Raises OSError if a file cannot be restored or removed, the journal is
+    then kept.
+    """
+    claims = []
+    committed = set()
+    for record in read_records(path):
+        if record.get('op') == 'claim':
+            claims.append((record['path'], record['claimed']))
+        elif record.get('op') == 'commit':
+            committed.add(record['path'])
+
+    done = []
+    for output_file_name, claimed in reversed(claims):
+        if claimed == output_file_name:
+            # The output file of a conversion to --output
+            if os.path.exists(output_file_name):
+                os.remove(output_file_name)
+                done.append(('removed', output_file_name, None))
+        elif os.path.exists(claimed):
+            if output_file_name in committed or not os.path.exists(output_file_name):   # noqa
+                os.replace(claimed, output_file_name)
+                done.append(('restored', output_file_name, claimed))
+            else:
+                # Claimed but the input was never renamed to it
+                os.remove(claimed)
+
+    Journal(path).close()
+    os.remove(path)
+    return done
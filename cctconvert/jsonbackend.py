@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.jsonbackend
+
+JSON Backends
+-------------
+cc_read and cc_write use the standard library json module by default. A
+faster JSON library may be used instead when it is installed:
+
+    ujson       fast load and fast dump
+    orjson      fast load (orjson cannot indent by 4, dump uses json)
+    simplejson  load and dump
+
+Whatever the backend, the text written is byte for byte what json.dump(ctx,
+fp, indent=4) writes and key order is preserved: any output a fast library
+would format differently is written by the json module instead. The fast
+libraries load JSON objects as plain dicts (except the top level context),
+which keep their key order on Python 3.7+.
+
+A mapping that is not a dict, such as a version 2 variable (see
+cctconvert.core.Variable), is written as a JSON object, see to_json.
+"""
+import re
+import json
+import importlib
+
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# Preference order of the 'auto' backend
+AUTO_ORDER = ('ujson', 'orjson', 'simplejson', 'json')
+
+BACKEND_NAMES = ('auto',) + AUTO_ORDER
+
+DEFAULT_BACKEND = 'json'
+
+# ujson writes DEL unescaped and negative exponents without json's leading
+# zero (1e-5 rather than 1e-05)
+_UJSON_DIFFERS = re.compile(r'\x7f|e-\d(?!\d)')
+
+# orjson loads integers beyond 64 bits as floats
+_ORJSON_DIFFERS = re.compile(r'\d{19}')
+
+
+def to_json(obj):
+    """
+    The default hook of the JSON libraries: return the JSON serialisable
+    value of obj, an OrderedDict of its items if it is a mapping (its
+    _asdict() if it has one).
+    """
+    if isinstance(obj, Mapping):
+        if hasattr(obj, '_asdict'):
+            return obj._asdict()
+        return OrderedDict(obj.items())
+    raise TypeError('Object of type {t} is not JSON serializable'.format(t=type(obj).__name__))   # noqa
+
+
+class JsonBackend(object):
+    """
+    The standard library json module.
+    """
+    name = 'json'
+
+    def load(self, fp):
+        return json.load(fp, object_pairs_hook=OrderedDict)
+
+    def dump(self, obj, fp):
+        json.dump(obj, fp, indent=4, default=to_json)
+
+    def dumps(self, obj):
+        return json.dumps(obj, indent=4, default=to_json)
+
+
+class UjsonBackend(JsonBackend):
+    name = 'ujson'
+
+    def __init__(self):
+        self.ujson = importlib.import_module('ujson')
+
+    def load(self, fp):
+        text = fp.read()
+        try:
+            ctx = self.ujson.loads(text)
+        except ValueError:
+            # Let json accept (NaN, Infinity...) or report what ujson rejects
+            return json.loads(text, object_pairs_hook=OrderedDict)
+        return OrderedDict(ctx) if isinstance(ctx, dict) else ctx
+
+    def dump(self, obj, fp):
+        fp.write(self.dumps(obj))
+
+    def dumps(self, obj):
+        try:
+            text = self.ujson.dumps(obj, indent=4, ensure_ascii=True,
+                                    escape_forward_slashes=False,
+                                    default=to_json)
+        except (TypeError, ValueError, OverflowError):
+            text = None
+        if text is None or _UJSON_DIFFERS.search(text):
+            text = json.dumps(obj, indent=4, default=to_json)
+        return text
+
+
+class OrjsonBackend(JsonBackend):
+    name = 'orjson'
+
+    def __init__(self):
+        self.orjson = importlib.import_module('orjson')
+
+    def load(self, fp):
+        text = fp.read()
+        try:
+            if _ORJSON_DIFFERS.search(text):
+                raise ValueError('Integer may not fit in 64 bits')
+            ctx = self.orjson.loads(text)
+        except ValueError:
+            return json.loads(text, object_pairs_hook=OrderedDict)
+        return OrderedDict(ctx) if isinstance(ctx, dict) else ctx
+
+
+class SimplejsonBackend(JsonBackend):
+    name = 'simplejson'
+
+    def __init__(self):
+        self.simplejson = importlib.import_module('simplejson')
+
+    def load(self, fp):
+        text = fp.read()
+        try:
+            return self.simplejson.loads(text, object_pairs_hook=OrderedDict)
+        except ValueError:
+            # simplejson 3.19+ rejects NaN and Infinity which json accepts
+            return json.loads(text, object_pairs_hook=OrderedDict)
+
+    def dump(self, obj, fp):
+        self.simplejson.dump(obj, fp, indent=4, allow_nan=True,
+                             default=to_json)
+
+    def dumps(self, obj):
+        return self.simplejson.dumps(obj, indent=4, allow_nan=True,
+                                     default=to_json)
+
+
+_BACKENDS = {
+    'json': JsonBackend,
+    'ujson': UjsonBackend,
+    'orjson': OrjsonBackend,
+    'simplejson': SimplejsonBackend,
+}
+
+_instances = {}
+
+
+def get_backend(name=None):
+    """
+    Return the JSON backend called name, 'auto' picks the first one of
+    AUTO_ORDER that is installed and None the json module.
+
+    Raises ImportError if the library of the backend is not installed.
+    """
+    name = name or DEFAULT_BACKEND
+    if name not in _instances:
+        if name == 'auto':
+            for auto in AUTO_ORDER:
+                try:
+                    backend = get_backend(auto)
+                except ImportError:
+                    continue
+                break
+        else:
+            backend = _BACKENDS[name]()
+        _instances[name] = backend
+    return _instances[name]
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.profiling
+
+Conversion Profiling
+--------------------
+Every phase of a conversion (see cctconvert.core.PHASES) is timed by
+cctconvert.core.timed. Python code converting templates in process can
+watch those timings through hooks:
+
+    from cctconvert import profiling
+
+    def hook(phase, seconds):
+        print(phase, seconds)
+
+    profiling.add_hook(hook)
+    try:
+        ...  # convert templates
+    finally:
+        profiling.remove_hook(hook)
+
+A hook is called in the process and thread running the phase, so it does
+not see the phases run by 'cctconvert --jobs' worker processes. With no hook
+added and nothing else asking for timings, timing a phase costs nothing but
+a check.
+
+'cctconvert --profile' aggregates the timings of every file of a run into a
+Histogram, emitted at the end of the run, and '--profile-dump FILE' runs the
+conversion under cProfile, dumping the pstats to FILE.
+"""
+import bisect
+import contextlib
+
+from collections import OrderedDict
+
+from cctconvert.core import PHASES, PHASE_HOOKS
+
+# ----------------------------------------------------------------------------
+# Upper bounds in seconds of the histogram buckets but the last, open one
+BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0)
+
+BUCKET_LABELS = ('<10us', '<100us', '<1ms', '<10ms', '<100ms', '<1s', '>=1s')
+
+# ----------------------------------------------------------------------------
+
+
+def add_hook(hook):
+    """
+    Call hook(phase, seconds) as each phase of a conversion ends.
+    """
+    PHASE_HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    """
+    Stop calling hook, see add_hook.
+    """
+    PHASE_HOOKS.remove(hook)
+
+
+class Histogram(object):
+    """
+    The distribution of the seconds spent in each phase, aggregated over
+    many conversions.
+
+    Add the timings of every conversion with add, or add the histogram
+    itself as a hook to aggregate every phase as it ends.
+    """
+
+    def __init__(self):
+        # Seconds of each phase, one sample per conversion
+        self.samples = OrderedDict()
+
+    def add(self, timings):
+        """
+        Add the {phase: seconds} timings of one conversion.
+        """
+        for phase, seconds in timings.items():
+            self.samples.setdefault(phase, []).append(seconds)
+
+    def __call__(self, phase, seconds):
+        self.add({phase: seconds})
+
+    def phases(self):
+        """
+        Return the phases sampled, in the order they run.
+        """
+        known = [phase for phase in PHASES if phase in self.samples]
+        return known + [phase for phase in self.samples if phase not in PHASES]   # noqa
+
+    def lines(self):
+        """
+        Return the lines of a table of the count, total, mean, median, 90th
+        percentile and maximum of each phase in milliseconds, followed by a
+        table counting the samples of each phase in each bucket.
+        """
+        lines = ['{p:<10} {n:>6} {t:>10} {m:>9} {p50:>9} {p90:>9} {x:>9}'.format(   # noqa
+            p='phase', n='count', t='total ms', m='mean ms', p50='p50 ms',
+            p90='p90 ms', x='max ms')]
+        for phase in self.phases():
+            samples = sorted(self.samples[phase])
+            n = len(samples)
+            lines.append('{p:<10} {n:>6} {t:>10.3f} {m:>9.3f} {p50:>9.3f} {p90:>9.3f} {x:>9.3f}'.format(   # noqa
+                p=phase, n=n, t=sum(samples) * 1000,
+                m=sum(samples) * 1000 / n,
+                p50=percentile(samples, 0.5) * 1000,
+                p90=percentile(samples, 0.9) * 1000,
+                x=samples[-1] * 1000))
+
+        lines.append('')
+        lines.append('{p:<10}'.format(p='phase') + ''.join(
+            ' {b:>7}'.format(b=label) for label in BUCKET_LABELS))
+        for phase in self.phases():
+            counts = [0] * len(BUCKET_LABELS)
+            for seconds in self.samples[phase]:
+                counts[bisect.bisect_right(BUCKETS, seconds)] += 1
+            lines.append('{p:<10}'.format(p=phase) + ''.join(
+                ' {c:>7}'.format(c=c or '.') for c in counts))
+        return lines
+
+
+def percentile(samples, q):
+    """
+    Return the q (0 to 1) quantile of the sorted samples, nearest rank.
+    """
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+@contextlib.contextmanager
+def profiled(dump_file=None):
+    """
+    Context manager running its block under cProfile and dumping the pstats
+    to the file named dump_file, read them with the pstats module. Does
+    nothing if dump_file is None.
+    """
+    if dump_file is None:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(dump_file)
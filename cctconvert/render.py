@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.render
+
+Verbose Output
+--------------
+--verbose and --dryrun show the input and output contexts. A Renderer
+gathers their lines and writes them out in one go (or every FLUSH_SIZE
+characters while streaming), rather than echoing each line.
+
+Each key, or version 2 variable, is shown on one line. A list is cut to
+its first max_choices items followed by the number left out, so the time
+taken depends on what is shown rather than on the size of the lists. The
+keys and values are only colored when written to a terminal.
+"""
+import sys
+
+from collections import OrderedDict
+
+import click
+
+# ----------------------------------------------------------------------------
+# Items of a list shown before the rest are left out, 0 shows them all
+DEFAULT_MAX_CHOICES = 10
+
+# Characters gathered before a Renderer writes them out
+FLUSH_SIZE = 64 * 1024
+
+# ----------------------------------------------------------------------------
+
+
+class More(object):
+    """
+    Stands for the items left out of a shortened list.
+    """
+    __slots__ = ('count',)
+
+    def __init__(self, count):
+        self.count = count
+
+    def __repr__(self):
+        return '...{n} more'.format(n=self.count)
+
+
+def shorten_list(value, limit):
+    """
+    Return the list value cut to its first limit items followed by a More,
+    or value itself if it is no longer than limit (or limit is 0).
+    """
+    if not limit or len(value) <= limit:
+        return value
+    return value[:limit] + [More(len(value) - limit)]
+
+
+def shorten(value, limit):
+    """
+    Return value with a list, or the lists that are values of a dict (e.g.
+    the choices of a version 2 variable), cut by shorten_list.
+    """
+    if isinstance(value, list):
+        return shorten_list(value, limit)
+    if isinstance(value, dict) and limit:
+        if any(isinstance(v, list) and len(v) > limit for v in value.values()):   # noqa
+            return type(value)(
+                (k, shorten_list(v, limit) if isinstance(v, list) else v)
+                for k, v in value.items())
+    return value
+
+
+def isatty(stream):
+    """
+    Return True if stream is a terminal.
+    """
+    try:
+        return stream.isatty()
+    except Exception:
+        return False
+
+
+class Renderer(object):
+    """
+    Gathers the lines of verbose output, written by flush.
+
+    styled defaults to whether stdout is a terminal.
+    """
+
+    def __init__(self, max_choices=DEFAULT_MAX_CHOICES, styled=None):
+        self.max_choices = max_choices
+        self.styled = isatty(sys.stdout) if styled is None else styled
+        self.lines = []
+        self.size = 0
+
+    def style(self, text, fg):
+        return click.style(text, fg=fg) if self.styled else text
+
+    def line(self, text=''):
+        self.lines.append(text)
+        self.size += len(text) + 1
+        if self.size >= FLUSH_SIZE:
+            self.flush()
+
+    def kvpair(self, key, val):
+        """
+        Add a key/value pair.
+        """
+        k = self.style('{k}'.format(k=key), 'yellow')
+        v = self.style('{v}'.format(v=shorten(val, self.max_choices)), 'green')   # noqa
+        self.line('  ' + k + ' : ' + v)
+
+    def variable(self, variable):
+        """
+        Add a version 2 variable, shown as the OrderedDict it is written as
+        (see cctconvert.core.Variable).
+        """
+        if not isinstance(variable, dict):
+            variable = OrderedDict(variable.items())
+        self.line('    ' + repr(shorten(variable, self.max_choices)))
+
+    def context(self, ctx):
+        """
+        Add a version 1 or version 2 context, each variable of the latter on
+        a line of its own.
+        """
+        if not ctx:
+            self.line('{}')
+        for k, v in ctx.items():
+            if k == 'variables' and isinstance(v, list):
+                self.line('  ' + self.style(k, 'yellow') + ' :')
+                for variable in v:
+                    self.variable(variable)
+            else:
+                self.kvpair(k, v)
+
+    def flush(self):
+        """
+        Write out the lines gathered so far.
+        """
+        if self.lines:
+            # Nothing is styled that should not be, so click need not look
+            # for styles to strip
+            click.echo('\n'.join(self.lines), color=True)
+            self.lines = []
+            self.size = 0
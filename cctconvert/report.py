@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.report
+
+Machine Readable Reports
+------------------------
+'cctconvert --report jsonl' writes one JSON object per line, per converted
+file, for dashboards and scripts to consume rather than scraping the human
+readable output:
+
+    {"path": "a/cookiecutter.json", "rc": 0, "status": "converted",
+     "variables": 11, "input_bytes": 1006, "output_bytes": 2150,
+     "changed": null,
+     "seconds": {"read": 0.0001, "transform": 0.00002, "validate": 0.00001,
+                 "write": 0.0003, "total": 0.0006}}
+
+variables is the number of variables (or version 1 keys with --to v1)
+written, output_bytes is null unless a file was written. With --dryrun
+--diff, changed tells whether the output differs from the file it would
+replace, it is null otherwise.
+
+Each phase sums the finer phases of cctconvert.core.PHASES it stands for,
+see PHASE_GROUPS. A phase that did not run is null in seconds: a cached
+conversion only reads from and writes to the cache, and a streamed
+conversion reads, transforms and writes at once, all timed as write.
+
+The report goes to --report-file, stdout by default; the human readable
+output then goes to stderr.
+"""
+import os
+import sys
+import contextlib
+
+from collections import OrderedDict
+
+from cctconvert.core import RESULT_CODES
+
+# ----------------------------------------------------------------------------
+REPORT_FORMATS = ('text', 'jsonl')
+
+DEFAULT_REPORT = 'text'
+
+# The phases of a record, each the sum of the cctconvert.core.PHASES listed
+PHASE_GROUPS = OrderedDict([
+    ('read', ('cache', 'read')),
+    ('transform', ('transform',)),
+    ('validate', ('detect', 'validate')),
+    ('write', ('resolve', 'diff', 'write')),
+    ('total', ('total',)),
+])
+
+PHASES = tuple(PHASE_GROUPS)
+
+# ----------------------------------------------------------------------------
+
+
+def file_size(file_name):
+    """
+    Return the size in bytes of the file named file_name, None if there is
+    no such file.
+    """
+    try:
+        return os.path.getsize(file_name)
+    except OSError:
+        return None
+
+
+def group_timings(timings):
+    """
+    Return the OrderedDict of the seconds of each PHASES of a record, given
+    the timings of the cctconvert.core.PHASES, None for those that did not
+    run.
+    """
+    grouped = OrderedDict()
+    for phase, phases in PHASE_GROUPS.items():
+        seconds = [timings[p] for p in phases if p in timings]
+        grouped[phase] = sum(seconds) if seconds else None
+    return grouped
+
+
+def make_record(cookiecutter, rc, stats):
+    """
+    Return the report record of the cookiecutter file converted with result
+    code rc, stats being filled in by cctconvert.cctconvert.convert_file.
+    """
+    return OrderedDict([
+        ('path', cookiecutter),
+        ('rc', rc),
+        ('status', RESULT_CODES.get(rc, 'unknown error')),
+        ('variables', stats.get('variables')),
+        ('input_bytes', stats.get('input_bytes')),
+        ('output_bytes', stats.get('output_bytes')),
+        ('changed', stats.get('changed')),
+        ('seconds', group_timings(stats.get('timings', {}))),
+    ])
+
+
+class JsonLinesReport(object):
+    """
+    Write the report records to the text file fp, one JSON object per line.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write(self, cookiecutter, rc, stats):
+        import json
+        self.fp.write(json.dumps(make_record(cookiecutter, rc, stats)) + '\n')   # noqa
+
+
+@contextlib.contextmanager
+def open_report(report, report_file=None):
+    """
+    Context manager yielding the report named by --report, writing to the
+    file named report_file ('-' or None for stdout), or None if the report
+    is text only.
+
+    While the report is written to stdout, whatever else is written to
+    stdout goes to stderr.
+    """
+    if report != 'jsonl':
+        yield None
+    elif report_file in (None, '-'):
+        stdout = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            yield JsonLinesReport(stdout)
+    else:
+        with open(report_file, 'w', encoding='utf8') as fp:
+            yield JsonLinesReport(fp)
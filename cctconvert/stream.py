@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.stream
+
+Streaming Conversion
+--------------------
+Convert a version 1 cookiecutter.json file without loading the whole
+document. The top level keys are parsed one at a time and every version 2
+variable is written out as soon as it is built, so peak memory is bounded by
+the largest single variable rather than by the size of the file.
+
+The output is byte for byte identical to json.dump(ctx_v2, fp, indent=4) of
+the converted context, and cc_write writes a version 2 context this way too.
+A variable written cannot be taken back, so a top level key repeated in the
+file is rejected rather than its last value winning as it does in cc_read.
+"""
+import io
+import json
+from json.decoder import scanstring
+from json.encoder import encode_basestring_ascii
+
+from collections import OrderedDict
+
+from cctconvert.jsonbackend import get_backend
+from cctconvert.core import (
+    SET_OF_REQUIRED_FIELDS,
+    LoadError, InputNotFoundError, InvalidVersion2Error, Variable,
+    make_header, make_variable, atomic_write, v2_error, variable_error,
+    reject_version_2, has_version_2_fields, cc_read,
+)
+
+CHUNK_SIZE = 64 * 1024
+
+# Leading characters of a file looked at by looks_like_version_2
+SNIFF_SIZE = 4 * 1024
+
+WHITESPACE = ' \t\n\r'
+
+# The characters a JSON number may continue with
+NUMBER_CHARS = '0123456789.eE+-'
+
+INDENT = ' ' * 4
+
+# The indent of a variable in the variables list, and of its fields
+VARIABLE_INDENT = INDENT * 2
+FIELD_INDENT = INDENT * 3
+
+_decoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
+
+
+class _Reader(object):
+    """
+    A window onto a text file that grows only as far as the value currently
+    being parsed.
+    """
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        Append the next chunk of the file to the window, dropping what has
+        already been parsed. Returns False at end of file.
+        """
+        if self.eof:
+            return False
+        # Read at least as much as is buffered so that a large value is
+        # completed in a logarithmic number of reads
+        chunk = self.fp.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character, '' at end of file.
+        """
+        while True:
+            while self.pos < len(self.buf):
+                if self.buf[self.pos] not in WHITESPACE:
+                    return self.buf[self.pos]
+                self.pos += 1
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        """
+        Skip whitespace and consume the next character, which must be one of
+        chars. Returns the character consumed.
+        """
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError('Expecting {exp} at offset {pos}'.format(
+                exp=' or '.join(repr(c) for c in chars), pos=self.pos))
+        self.pos += 1
+        return c
+
+    def parse(self, parser):
+        """
+        Run parser(buf, pos) -> (value, end) on the window, reading more of
+        the file until the value is complete.
+        """
+        while True:
+            try:
+                value, end = parser(self.buf, self.pos)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the window may continue in the file,
+            # even one cut after its '.' or 'e' ('1.' parses as 1)
+            if (len(self.buf) - end <= 2 and
+                    all(c in NUMBER_CHARS for c in self.buf[end:]) and
+                    self.fill()):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_context_items(fp, chunk_size=CHUNK_SIZE):
+    """
+    Parse the top level JSON object in the text file fp and yield its
+    (key, value) pairs one at a time, in file order.
+
+    Raises ValueError if fp does not hold a JSON object.
+    """
+    reader = _Reader(fp, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            reader.expect('"')
+            # scanstring starts just after the opening quote
+            key = reader.parse(scanstring)
+            reader.expect(':')
+            reader.peek()
+            yield key, reader.parse(_decoder.raw_decode)
+            if reader.expect(',}') == '}':
+                break
+    if reader.peek():
+        raise ValueError('Extra data at offset {pos}'.format(pos=reader.pos))
+
+
+def scan_keys(cookiecutter_template_file):
+    """
+    Return the set of top level keys of the JSON file named
+    cookiecutter_template_file, parsing but discarding each value.
+
+    Raises the same errors as cc_read.
+    """
+    try:
+        with open(cookiecutter_template_file, 'r', encoding='utf8') as cc:
+            return set(k for k, _ in iter_context_items(cc))
+    except FileNotFoundError as e:
+        raise InputNotFoundError("Input cookiecutter file '{icf}' does not exit!!".format(icf=cookiecutter_template_file)) from e  # noqa
+    except Exception as e:
+        raise LoadError("Exception: Unable to load cookiecutter file '{ccf}'".format(ccf=cookiecutter_template_file), str(e)) from e  # noqa
+
+
+def looks_like_version_2(text):
+    """
+    Return True if the leading SNIFF_SIZE characters of the JSON text hold a
+    top level 'cookiecutter_version' key, as version 2 templates do in their
+    header. Only the top level entries complete within those characters are
+    parsed.
+    """
+    try:
+        for k, _ in iter_context_items(io.StringIO(text[:SNIFF_SIZE])):
+            if k == 'cookiecutter_version':
+                return True
+    except ValueError:
+        # The leading characters end in the middle of an entry
+        pass
+    return False
+
+
+def reject_version_2_file(cookiecutter_template_file, json_backend=None):
+    """
+    Raise AlreadyVersion2Error if the JSON file named
+    cookiecutter_template_file is a version 2 template, InvalidVersion2Error
+    if it has the version 2 fields but is not a valid version 2 template.
+
+    A file whose leading bytes look like a version 2 template is parsed the
+    quickest way (see cc_read's sniff), any other is only scanned for its top
+    level keys. Raises the same errors as cc_read.
+    """
+    try:
+        with open(cookiecutter_template_file, 'r', encoding='utf8') as cc:
+            head = cc.read(SNIFF_SIZE)
+    except FileNotFoundError as e:
+        raise InputNotFoundError("Input cookiecutter file '{icf}' does not exit!!".format(icf=cookiecutter_template_file)) from e  # noqa
+    except Exception as e:
+        raise LoadError("Exception: Unable to load cookiecutter file '{ccf}'".format(ccf=cookiecutter_template_file), str(e)) from e  # noqa
+
+    if (looks_like_version_2(head) or
+            SET_OF_REQUIRED_FIELDS <= scan_keys(cookiecutter_template_file)):
+        ctx = cc_read(cookiecutter_template_file, json_backend, sniff=True)
+        if has_version_2_fields(ctx):
+            reject_version_2(ctx)
+
+
+def iter_v2_json(header, variables, json_backend=None):
+    """
+    Yield the JSON text of the version 2 context made of the header (see
+    make_header) and the variables iterable, in chunks, exactly as
+    json.dump(ctx_v2, fp, indent=4) would write it.
+
+    json_backend names the cctconvert.jsonbackend serialising each variable.
+    """
+    dumps = get_backend(json_backend).dumps
+    yield '{'
+    for k, v in header.items():
+        if k != 'variables':
+            yield '\n' + INDENT + json.dumps(k) + ': ' + json.dumps(v) + ','
+    yield '\n' + INDENT + '"variables": ['
+    sep = None
+    for variable in variables:
+        if isinstance(variable, Variable):
+            yield (sep or '\n') + variable_json(variable, dumps)
+        else:
+            yield (sep or '\n') + VARIABLE_INDENT + dumps(variable).replace('\n', '\n' + VARIABLE_INDENT)   # noqa
+        sep = ',\n'
+    if sep is None:
+        yield ']\n}'
+    else:
+        yield '\n' + INDENT + ']\n}'
+
+
+def variable_json(variable, dumps):
+    """
+    Return the JSON text of the Variable variable as an item of the
+    variables list, indented, exactly as dumps writes it within the context
+    but field by field, see value_json.
+    """
+    text = (VARIABLE_INDENT + '{\n' +
+            FIELD_INDENT + '"name": ' + value_json(variable.name, dumps) + ',\n' +   # noqa
+            FIELD_INDENT + '"default": ' + value_json(variable.default, dumps))   # noqa
+    if variable.choices is not None:
+        text += ',\n' + FIELD_INDENT + '"choices": ' + value_json(variable.choices, dumps)   # noqa
+    if variable.type is not None:
+        text += ',\n' + FIELD_INDENT + '"type": ' + encode_basestring_ascii(variable.type)   # noqa
+    if variable.prompt_user is not None:
+        text += ',\n' + FIELD_INDENT + '"prompt_user": ' + json.dumps(variable.prompt_user)   # noqa
+    return text + '\n' + VARIABLE_INDENT + '}'
+
+
+def value_json(value, dumps):
+    """
+    Return the JSON text of the value of a variable field: a list or an
+    object by dumps, indented as a field, a string by the json module's C
+    string encoder and anything else (a number, boolean or null) by
+    json.dumps.
+    """
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    if isinstance(value, (list, dict)):
+        return dumps(value).replace('\n', '\n' + FIELD_INDENT)
+    return json.dumps(value)
+
+
+def iter_convert(infile, name, incept=True, ident=None, callback=None, json_backend=None, count=None):   # noqa
+    """
+    Return an iterator of the JSON text of the version 2 template converted
+    from the version 1 cookiecutter file named infile, in chunks, as
+    stream_convert writes it. The file is read one variable at a time as the
+    iterator is, and closed once it is exhausted.
+
+    See stream_convert for callback and json_backend. Given a count list,
+    count[0] is kept to the number of variables converted so far. Raises
+    InvalidVersion2Error, at once for an invalid header and as the iterator
+    reaches an invalid variable or a key already converted.
+    """
+    header = make_header(name, incept, ident)
+    error = v2_error(header)
+    if error is not None:
+        raise InvalidVersion2Error(
+            'Converted cookiecutter context is not a valid version 2 context',
+            error)
+    return _iter_convert(infile, header, callback, json_backend, count)
+
+
+def _iter_convert(infile, header, callback, json_backend, count):
+    def variables(cc):
+        # Only the keys are kept, not the variables
+        seen = set()
+        for index, (k, v) in enumerate(iter_context_items(cc)):
+            if k in seen:
+                raise InvalidVersion2Error(
+                    'Converted cookiecutter context is not a valid version 2 context',   # noqa
+                    "Variable {i}: name '{k}' is already used".format(i=index, k=k))   # noqa
+            seen.add(k)
+            variable = make_variable(k, v)
+            error = variable_error(variable)
+            if error is not None:
+                raise InvalidVersion2Error(
+                    'Converted cookiecutter context is not a valid version 2 context',   # noqa
+                    'Variable {i}: {e}'.format(i=index, e=error))
+            if callback is not None:
+                callback(k, v, variable)
+            if count is not None:
+                count[0] = index + 1
+            yield variable
+
+    with open(infile, 'r', encoding='utf8') as cc:
+        for chunk in iter_v2_json(header, variables(cc), json_backend):
+            yield chunk
+
+
+def iter_context_json(ctx, json_backend=None):
+    """
+    Return an iterator of the JSON text of the context ctx, in chunks, as
+    cctconvert.core.cc_write writes it. A version 2 context is serialised
+    one variable at a time, see iter_v2_json.
+    """
+    if 'cookiecutter_version' in ctx and isinstance(ctx.get('variables'), list):   # noqa
+        return iter_v2_json(ctx, ctx['variables'], json_backend)
+    return iter([get_backend(json_backend).dumps(ctx)])
+
+
+def stream_convert(infile, outfile, name, incept=True, ident=None, callback=None, check=True, json_backend=None, fsync=False, backup=None, journal=None):   # noqa
+    """
+    Convert the version 1 cookiecutter file named infile into a version 2
+    file named outfile, one variable at a time. If outfile is None nothing is
+    written (a dry run).
+
+    Unless check is False, the input is first scanned to reject a version 2
+    file (see reject_version_2_file) before anything is written. If given,
+    callback(key, value, variable) is called as each variable is written.
+    json_backend names the cctconvert.jsonbackend serialising each variable.
+    Each variable is validated as it is built, raising InvalidVersion2Error.
+    The output is written atomically, see cctconvert.core.atomic_write for
+    fsync, backup and journal.
+
+    Returns the number of variables converted.
+    """
+    if check:
+        reject_version_2_file(infile, json_backend)
+
+    count = [0]
+    chunks = iter_convert(infile, name, incept, ident, callback, json_backend, count)   # noqa
+
+    if outfile is None:
+        for _ in chunks:
+            pass
+        return count[0]
+
+    with atomic_write(outfile, fsync, backup, journal) as out:
+        # The input is closed before it is renamed to backup
+        for chunk in chunks:
+            out.write(chunk)
+    return count[0]
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+"""
+cctconvert.watch
+
+Watch Mode
+----------
+'cctconvert --watch ROOT' converts every template under ROOT again as soon
+as it changes. Changes are reported by a watcher:
+
+    EventWatcher    file system events (inotify, FSEvents, kqueue or
+                    ReadDirectoryChangesW) through the watchdog package,
+                    used when it is installed
+    PollingWatcher  polls the templates and directories under ROOT
+
+Neither rescans the tree while idle. The polling watcher stats the
+directories and templates it knows about every interval and only lists a
+directory again once its modification time changes (a file or directory was
+added, removed or renamed in it).
+
+watch() debounces the changes: the templates changed in a burst (an editor
+saving through a temporary file, a git checkout) are converted once the
+burst has been quiet for DEBOUNCE seconds.
+"""
+import os
+import time
+import queue
+
+from collections import OrderedDict
+
+# ----------------------------------------------------------------------------
+# Seconds without changes before the templates changed are converted
+DEBOUNCE = 0.25
+
+# Seconds between two polls of the PollingWatcher, and the longest watch()
+# waits before checking whether it is to stop
+DEFAULT_INTERVAL = 1.0
+
+# The watchdog events changing a file: a file only read (as every conversion
+# reads its template) is opened then closed_no_write, and is not converted
+CHANGE_EVENTS = frozenset(('created', 'modified', 'moved', 'closed'))
+
+# ----------------------------------------------------------------------------
+
+
+def is_hidden(name):
+    return name.startswith('.')
+
+
+class PollingWatcher(object):
+    """
+    Reports the files named name under the directory root that are created
+    or modified, by polling.
+    """
+    name = 'polling'
+
+    def __init__(self, root, name):
+        self.template = name
+        # Modification times of the directories, and (modification time,
+        # size) of the templates, as last seen
+        self.dirs = {}
+        self.files = {}
+        self.scan(root, [])
+
+    def scan(self, directory, changed):
+        """
+        List directory, and any directory under it not seen before, adding
+        the templates not seen before to changed.
+        """
+        try:
+            self.dirs[directory] = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            self.dirs.pop(directory, None)
+            return
+        for entry in entries:
+            if is_hidden(entry.name):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in self.dirs:
+                        self.scan(entry.path, changed)
+                elif entry.name == self.template and entry.path not in self.files:   # noqa
+                    self.files[entry.path] = self.signature(entry.path)
+                    changed.append(entry.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def signature(path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def poll(self):
+        """
+        Return the templates created or modified since the last poll.
+        """
+        changed = []
+        for path, signature in list(self.files.items()):
+            try:
+                current = self.signature(path)
+            except OSError:
+                del self.files[path]
+                continue
+            if current != signature:
+                self.files[path] = current
+                changed.append(path)
+
+        for directory, mtime in list(self.dirs.items()):
+            try:
+                if os.stat(directory).st_mtime_ns == mtime:
+                    continue
+            except OSError:
+                self.forget(directory)
+                continue
+            self.scan(directory, changed)
+        return changed
+
+    def forget(self, directory):
+        """
+        Stop polling the removed directory and everything under it.
+        """
+        prefix = os.path.join(directory, '')
+        for known in (self.dirs, self.files):
+            for path in [p for p in known if p == directory or p.startswith(prefix)]:   # noqa
+                del known[path]
+
+    def changes(self, timeout):
+        """
+        Wait timeout seconds and return the templates changed meanwhile.
+        """
+        time.sleep(timeout)
+        return self.poll()
+
+    def close(self):
+        pass
+
+
+class EventWatcher(object):
+    """
+    Reports the files named name under the directory root that are created
+    or modified, as the file system events of the watchdog package.
+
+    Raises ImportError if watchdog is not installed.
+    """
+    name = 'events'
+
+    def __init__(self, root, name):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        self.template = name
+        self.queue = queue.Queue()
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                watcher.event(event)
+
+        self.observer = Observer()
+        self.observer.schedule(Handler(), root, recursive=True)
+        self.observer.start()
+
+    def event(self, event):
+        if event.is_directory or event.event_type not in CHANGE_EVENTS:
+            return
+        # A moved event's destination is where an editor saved the file
+        for path in (getattr(event, 'dest_path', None), event.src_path):
+            if path and os.path.basename(path) == self.template:
+                self.queue.put(path)
+                return
+
+    def changes(self, timeout):
+        """
+        Wait up to timeout seconds for a template to change and return the
+        templates changed.
+        """
+        try:
+            changed = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                changed.append(self.queue.get_nowait())
+            except queue.Empty:
+                return changed
+
+    def close(self):
+        self.observer.stop()
+        self.observer.join()
+
+
+def make_watcher(root, name, polling=False):
+    """
+    Return an EventWatcher of the files named name under root, or a
+    PollingWatcher if polling or if watchdog is not installed.
+    """
+    if not polling:
+        try:
+            return EventWatcher(root, name)
+        except ImportError:
+            pass
+    return PollingWatcher(root, name)
+
+
+def watch(watcher, convert, interval=DEFAULT_INTERVAL, debounce=DEBOUNCE, stop=None):   # noqa
+    """
+    Call convert(path) for each template the watcher reports changed, once
+    a burst of changes has been quiet for debounce seconds, in the order
+    they first changed. Runs until the threading.Event stop is set, or
+    forever.
+    """
+    pending = OrderedDict()
+    while stop is None or not stop.is_set():
+        changed = watcher.changes(debounce if pending else interval)
+        if changed:
+            for path in changed:
+                pending[path] = None
+            continue
+        for path in pending:
+            if os.path.isfile(path):
+                convert(path)
+        pending.clear()
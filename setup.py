@@ -8,24 +8,25 @@ dependencies = ['click']
 
 setup(
     name='cctconvert',
-    version='1.0.1',
+    version='1.1.0',
     url='https://github.com/eruber/cookiecutter-template-convert',
     license='MIT',
     author='E.R. Uber',
     author_email='eruber@gmail.com',
     description='Converts cookiecutter v1 template to v2',
     long_description=__doc__,
-    packages=find_packages(exclude=['tests']),
+    packages=find_packages(exclude=['tests', 'benchmarks']),
     include_package_data=True,
     zip_safe=False,
     platforms='any',
+    python_requires='>=3.5',
     install_requires=dependencies,
     setup_requires=['pytest-runner', ],
     tests_require=['pytest', 'pytest-cov', 'pytest-mock',
                    'pytest-datafiles', 'tox'],
     entry_points={
         'console_scripts': [
-            'cctconvert = cctconvert.cctconvert:main',
+            'cctconvert = cctconvert.__main__:main',
         ],
     },
     classifiers=[
@@ -45,8 +46,6 @@ setup(
         'Operating System :: Unix',
         'Operating System :: Microsoft :: Windows',
         'Programming Language :: Python',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
         'Topic :: Software Development :: Libraries :: Python Modules',
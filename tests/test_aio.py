@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.aio, the overlapped batch conversion.
+"""
+
+import sys
+import time
+import threading
+
+import click
+import pytest
+
+from cctconvert.aio import convert_overlapped
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_convert_overlapped_order_and_limit():
+    """
+    Results and captured output come back in input order whatever order the
+    calls finish in, and at most limit calls run at once.
+    """
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def convert_one(arg):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        click.echo('converting {a}'.format(a=arg))
+        # The first calls finish last
+        time.sleep(0.01 * (10 - arg))
+        with lock:
+            running[0] -= 1
+        return -arg
+
+    results = []
+    stdout = sys.stdout
+    convert_overlapped(convert_one, range(10), 3,
+                       lambda rc, output: results.append((rc, output)))
+
+    assert results == [(-a, 'converting {a}\n'.format(a=a)) for a in range(10)]   # noqa
+    assert running[1] == 3
+    assert sys.stdout is stdout
+
+
+def test_convert_overlapped_cancels_pending_calls():
+    """
+    When a call raises, the calls not yet started are cancelled and the
+    exception is raised.
+    """
+    started = []
+
+    def convert_one(arg):
+        started.append(arg)
+        if arg == 0:
+            raise OSError('failed')
+        time.sleep(0.01)
+        return 0
+
+    with pytest.raises(OSError):
+        convert_overlapped(convert_one, range(100), 2, lambda rc, output: None)   # noqa
+    assert len(started) < 100
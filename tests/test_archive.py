@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.archive, the conversion of zip and tar archives.
+"""
+
+import io
+import os
+import json
+import shutil
+import tarfile
+import subprocess
+import zipfile
+
+import pytest
+
+from cctconvert import cctconvert
+from cctconvert.archive import Unchanged, convert_archive, is_archive
+from cctconvert.core import InputNotFoundError, LoadError
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+V1_COOKIECUTTER = os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json')
+
+README = b'# A template\n' * 100
+
+MEMBERS = ('a/cookiecutter.json', 'a/README.md', 'b/cookiecutter.json')
+
+
+def v1_text():
+    with open(V1_COOKIECUTTER, encoding='utf8') as fp:
+        return fp.read()
+
+
+def member_data(name, v1):
+    if name.endswith('README.md'):
+        return README
+    return v1.encode('utf8')
+
+
+def make_zip(path, v1=None):
+    v1 = v1 or v1_text()
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name in MEMBERS:
+            zf.writestr(name, member_data(name, v1))
+        zf.comment = b'bundle'
+
+
+def make_tar(path, mode='w:gz', v1=None):
+    v1 = v1 or v1_text()
+    with tarfile.open(path, mode) as tf:
+        for name in MEMBERS:
+            data = member_data(name, v1)
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o640
+            tf.addfile(info, io.BytesIO(data))
+
+
+def upper(member, text):
+    return text.upper()
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_is_archive(tmpdir):
+    make_zip(str(tmpdir.join('bundle.zip')))
+    assert is_archive(str(tmpdir.join('bundle.zip')))
+    assert not is_archive(str(tmpdir.join('missing.tar.gz')))
+    assert not is_archive(V1_COOKIECUTTER)
+
+
+def test_convert_zip_copies_members_raw(tmpdir):
+    src, dst = str(tmpdir.join('bundle.zip')), str(tmpdir.join('out.zip'))
+    make_zip(src)
+    seen = []
+
+    def convert(member, text):
+        seen.append(member)
+        return None if member.startswith('b/') else upper(member, text)
+
+    assert convert_archive(src, dst, convert) == 1
+
+    assert seen == ['a/cookiecutter.json', 'b/cookiecutter.json']
+    with zipfile.ZipFile(src) as old, zipfile.ZipFile(dst) as new:
+        assert new.testzip() is None
+        assert new.namelist() == list(MEMBERS)
+        assert new.comment == b'bundle'
+        assert new.read('a/cookiecutter.json') == v1_text().upper().encode('utf8')   # noqa
+        assert new.read('b/cookiecutter.json') == old.read('b/cookiecutter.json')   # noqa
+        assert new.read('a/README.md') == README
+        for name in ('a/README.md', 'b/cookiecutter.json'):
+            o, n = old.getinfo(name), new.getinfo(name)
+            assert (n.compress_type, n.compress_size, n.CRC, n.date_time) == (o.compress_type, o.compress_size, o.CRC, o.date_time)   # noqa
+        assert new.getinfo('a/cookiecutter.json').compress_type == zipfile.ZIP_DEFLATED   # noqa
+
+
+@pytest.mark.skipif(shutil.which('zip') is None, reason='zip is not installed')   # noqa
+def test_convert_zip_copies_encrypted_members(tmpdir):
+    """
+    An encrypted member, written with a data descriptor by zip -e, still
+    decrypts once copied.
+    """
+    os.chdir(str(tmpdir))
+    os.makedirs('a')
+    shutil.copy(V1_COOKIECUTTER, 'a')
+    with open('secret.txt', 'wb') as fp:
+        fp.write(README)
+    subprocess.check_call(['zip', '-q', 'mix.zip', 'a/cookiecutter.json'])
+    subprocess.check_call(['zip', '-q', '-e', '-P', 'pw', 'mix.zip', 'secret.txt'])   # noqa
+    with zipfile.ZipFile('mix.zip') as src:
+        assert src.getinfo('secret.txt').flag_bits & 0x09 == 0x09
+
+    assert convert_archive('mix.zip', 'out.zip', upper) == 1
+
+    with zipfile.ZipFile('out.zip') as new:
+        assert new.read('secret.txt', pwd=b'pw') == README
+        assert new.read('a/cookiecutter.json') == v1_text().upper().encode('utf8')   # noqa
+    if shutil.which('unzip') is not None:
+        subprocess.check_call(['unzip', '-q', '-P', 'pw', '-t', 'out.zip'])
+
+
+@pytest.mark.parametrize('name, mode', [
+    ('bundle.tar', 'w'), ('bundle.tar.gz', 'w:gz'), ('bundle.tbz2', 'w:bz2'),
+])
+def test_convert_tar(tmpdir, name, mode):
+    src, dst = str(tmpdir.join(name)), str(tmpdir.join('out-' + name))
+    make_tar(src, mode)
+
+    assert convert_archive(src, dst, upper) == 2
+
+    with tarfile.open(dst) as tf:
+        assert tf.getnames() == list(MEMBERS)
+        assert tf.extractfile('a/README.md').read() == README
+        member = tf.getmember('b/cookiecutter.json')
+        assert member.mode == 0o640
+        assert tf.extractfile(member).read() == v1_text().upper().encode('utf8')   # noqa
+
+
+def test_convert_archive_dry_run(tmpdir):
+    src = str(tmpdir.join('bundle.tar.gz'))
+    make_tar(src)
+    assert convert_archive(src, None, upper) == 2
+    assert os.listdir(str(tmpdir)) == ['bundle.tar.gz']
+
+
+def test_convert_archive_errors(tmpdir):
+    src, dst = str(tmpdir.join('bundle.zip')), str(tmpdir.join('out.zip'))
+    make_zip(src)
+
+    with pytest.raises(Unchanged):
+        convert_archive(src, dst, lambda member, text: None)
+
+    def fail(member, text):
+        raise LoadError('bad')
+    with pytest.raises(LoadError):
+        convert_archive(src, dst, fail)
+    assert os.listdir(str(tmpdir)) == ['bundle.zip']
+
+    with zipfile.ZipFile(str(tmpdir.join('empty.zip')), 'w') as zf:
+        zf.writestr('README.md', README)
+    with pytest.raises(InputNotFoundError):
+        convert_archive(str(tmpdir.join('empty.zip')), dst, upper)
+
+    tmpdir.join('broken.zip').write('not a zip')
+    with pytest.raises(LoadError):
+        convert_archive(str(tmpdir.join('broken.zip')), dst, upper)
+
+
+@pytest.mark.parametrize('name', ['bundle.zip', 'bundle.tar.gz'])
+def test_archive_option(tmpdir, runner, name):
+    os.chdir(str(tmpdir))
+    (make_zip if name.endswith('.zip') else make_tar)(name)
+
+    result = runner.invoke(cctconvert.main, [name])
+
+    assert result.exit_code == 0
+    for member in ('a/cookiecutter.json', 'b/cookiecutter.json'):
+        assert '[ 0] converted             {a}:{m}'.format(a=name, m=member) in result.output   # noqa
+    assert sorted(os.listdir('.')) == [name, name + '.v1.bkup']
+    opened = zipfile.ZipFile if name.endswith('.zip') else tarfile.open
+    with opened(name) as archive:
+        read = archive.read if name.endswith('.zip') else (lambda m: archive.extractfile(m).read())   # noqa
+        ctx = json.loads(read('a/cookiecutter.json').decode('utf8'))
+    assert ctx['cookiecutter_version'] == '2.0.0'
+
+    # Converting again finds every template converted, and writes nothing
+    result = runner.invoke(cctconvert.main, [name, '--output', 'again' + name])   # noqa
+    assert result.exit_code == -6
+    assert 'already version 2' in result.output
+    assert "Every template in archive '{a}' is already a version 2 template!!".format(a=name) in result.output   # noqa
+    assert sorted(os.listdir('.')) == [name, name + '.v1.bkup']
+
+
+def test_archive_option_load_error(tmpdir, runner):
+    os.chdir(str(tmpdir))
+    make_zip('bundle.zip', v1='{"broken": ')
+
+    result = runner.invoke(cctconvert.main, ['bundle.zip', '--dryrun'])
+
+    assert result.exit_code == -1
+    assert "[-1] unable to load        bundle.zip:a/cookiecutter.json" in result.output   # noqa
+    assert "Unable to load cookiecutter file 'bundle.zip:a/cookiecutter.json'" in result.output   # noqa
+    assert os.listdir('.') == ['bundle.zip']
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.cache, the conversion cache.
+"""
+
+import os
+import json
+import time
+import shutil
+
+import pytest
+
+from cctconvert import core
+from cctconvert import cctconvert
+from cctconvert.cache import Cache
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_key_depends_on_input_and_options(mocker, tmpdir):
+    """
+    The key changes with the input bytes, the options and the VERSION.
+    """
+    cache = Cache(str(tmpdir.join('cache')))
+    cc = tmpdir.join('cookiecutter.json')
+    cc.write('{"a": 1}')
+
+    key = cache.key(str(cc), 'name', False)
+    assert key == cache.key(str(cc), 'name', False)
+    assert key != cache.key(str(cc), 'other', False)
+    assert key != cache.key(str(cc), 'name', True)
+
+    cc.write('{"a": 2}')
+    assert key != cache.key(str(cc), 'name', False)
+
+    key = cache.key(str(cc), 'name', False)
+    mocker.patch('cctconvert.cache.VERSION', '0.0.0')
+    assert key != cache.key(str(cc), 'name', False)
+
+    with pytest.raises(core.InputNotFoundError):
+        cache.key(str(tmpdir.join('missing.json')))
+    with pytest.raises(core.LoadError):
+        cache.key(str(tmpdir))
+
+
+def test_get_put_restore(tmpdir):
+    """
+    A stored output is found again and restored byte for byte.
+    """
+    cache = Cache(str(tmpdir.join('cache')))
+    out = tmpdir.join('out.json')
+    out.write('{"name": "x"}')
+
+    assert cache.entries() == []
+    assert cache.get('k') is None
+    cache.put('k', str(out))
+    assert cache.get('k') is not None
+    assert cache.variables('k') is None
+    cache.put('k', str(out), 1)
+    assert cache.variables('k') == 1
+
+    cache.restore('k', str(tmpdir.join('restored.json')))
+    assert tmpdir.join('restored.json').read() == '{"name": "x"}'
+
+    with pytest.raises(core.WriteError):
+        cache.restore('k', str(tmpdir.join('missing', 'restored.json')))
+
+    cache.clear()
+    assert cache.get('k') is None
+    assert cache.variables('k') is None
+    assert os.listdir(cache.directory) == []
+
+
+def test_least_recently_used_entries_are_evicted(tmpdir):
+    """
+    Beyond max_size the entries used least recently are removed first.
+    """
+    cache = Cache(str(tmpdir.join('cache')), max_size=25)
+    out = tmpdir.join('out.json')
+    out.write('x' * 10)
+
+    cache.put('a', str(out))
+    cache.put('b', str(out))
+    past = time.time() - 60
+    os.utime(cache.path('a'), (past, past))
+    os.utime(cache.path('b'), (past + 1, past + 1))
+    # 'a' is used again, so 'b' is now the least recently used
+    assert cache.get('a') is not None
+
+    cache.put('c', str(out))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+
+
+@pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+def test_cache_dir_option(mocker, datafiles, runner):
+    """
+    A second conversion of the same input is copied from the cache without
+    reading the input.
+    """
+    inpath = str(datafiles)
+    os.chdir(inpath)
+
+    result = runner.invoke(cctconvert.main, ['--output', 'v2-first.json', '--cache-dir', 'cache'])   # noqa
+    assert result.exit_code == 0
+    assert '(cached)' not in result.output
+    assert len(os.listdir('cache')) == 2
+
+    cc_read = mocker.patch('cctconvert.cctconvert.cc_read', autospec=True, side_effect=core.cc_read)   # noqa
+    result = runner.invoke(cctconvert.main, ['--output', 'v2-second.json', '--cache-dir', 'cache'])   # noqa
+    assert result.exit_code == 0
+    assert "Writing out version 2 cookiecutter template to file 'v2-second.json' (cached)" in result.output   # noqa
+    assert not cc_read.called
+
+    with open('v2-first.json') as first, open('v2-second.json') as second:
+        assert first.read() == second.read()
+
+    result = runner.invoke(cctconvert.main, ['--output', 'v2-third.json', '--cache-dir', 'cache', '--no-cache'])   # noqa
+    assert result.exit_code == 0
+    assert cc_read.called
+
+    result = runner.invoke(cctconvert.main, ['--version', '--cache-dir', 'cache', '--clear-cache'])   # noqa
+    assert result.exit_code == 0
+    assert os.listdir('cache') == []
+
+
+@pytest.mark.parametrize('first', [[], ['--report', 'jsonl', '--report-file', 'first.jsonl']])   # noqa
+@pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+def test_cache_hit_reports_variables(datafiles, runner, first):
+    """
+    A conversion restored from the cache reports the number of variables
+    stored with its output, whether or not the run storing it reported.
+    """
+    os.chdir(str(datafiles))
+
+    result = runner.invoke(cctconvert.main, ['--output', 'v2-first.json', '--cache-dir', 'cache'] + first)   # noqa
+    assert result.exit_code == 0
+    result = runner.invoke(cctconvert.main, ['--output', 'v2-second.json', '--cache-dir', 'cache', '--report', 'jsonl', '--report-file', 'report.jsonl'])   # noqa
+    assert result.exit_code == 0
+    assert '(cached)' in result.output
+
+    with open('report.jsonl', encoding='utf8') as fp:
+        record = json.loads(fp.read())
+    assert record['variables'] == 11
+
+
+@pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+def test_clear_cache_only(datafiles, runner):
+    """
+    --clear-cache without COOKIECUTTER files clears the cache and converts
+    nothing, not even ./cookiecutter.json; with them it converts them too.
+    """
+    os.chdir(str(datafiles))
+    result = runner.invoke(cctconvert.main, ['--output', 'v2.json', '--cache-dir', 'cache'])   # noqa
+    assert result.exit_code == 0
+    assert os.listdir('cache')
+
+    result = runner.invoke(cctconvert.main, ['--cache-dir', 'cache', '--clear-cache'])   # noqa
+    assert result.exit_code == 0
+    assert "Cleared the cache 'cache'." in result.output
+    assert os.listdir('cache') == []
+    assert sorted(os.listdir('.')) == ['cache', 'cookiecutter.json', 'v2.json']   # noqa
+
+    result = runner.invoke(cctconvert.main, ['cookiecutter.json', '--cache-dir', 'cache', '--clear-cache'])   # noqa
+    assert result.exit_code == 0
+    assert os.path.exists('cookiecutter.json.v1.bkup')
+
+
+def test_clear_cache_requires_cache_dir(runner):
+    """
+    --clear-cache needs to know which cache to clear.
+    """
+    result = runner.invoke(cctconvert.main, ['--clear-cache'], env={'CCTCONVERT_CACHE_DIR': None})   # noqa
+    assert result.exit_code == 2
+    assert '--clear-cache requires --cache-dir' in result.output
+
+
+@pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+def test_cache_dir_option_async_io_identical_templates(mocker, datafiles, runner):   # noqa
+    """
+    Threads storing the same key at once, identical templates converted with
+    --async-io, each store through their own temporary file.
+    """
+    copyfile = shutil.copyfile
+
+    def slow_copyfile(*args, **kwargs):
+        # Every thread copies before any replaces
+        dst = copyfile(*args, **kwargs)
+        time.sleep(0.05)
+        return dst
+    mocker.patch('shutil.copyfile', side_effect=slow_copyfile)
+
+    os.chdir(str(datafiles))
+    dirs = ['t{i:03}'.format(i=i) for i in range(32)]
+    for d in dirs:
+        os.makedirs(d)
+        shutil.copy('cookiecutter.json', d)
+    os.remove('cookiecutter.json')
+
+    result = runner.invoke(cctconvert.main, ['.', '--async-io', '16', '--cache-dir', 'cache'])   # noqa
+
+    assert result.exit_code == 0
+    assert 'total                 : 32' in result.output
+    assert sorted(os.path.splitext(n)[1] for n in os.listdir('cache')) == ['.json', '.variables']   # noqa
+    for d in dirs:
+        assert os.path.exists(os.path.join(d, 'cookiecutter.json.v1.bkup'))
+
+
+def test_put_failure_is_not_fatal(tmpdir):
+    """
+    An output the cache cannot store leaves the cache without the entry.
+    """
+    tmpdir.join('cache').write('not a directory')
+    out = tmpdir.join('out.json')
+    out.write('{"name": "x"}')
+
+    assert Cache(str(tmpdir.join('cache'))).put('k', str(out)) is False
+    assert Cache(str(tmpdir.join('other'))).put('k', str(tmpdir.join('missing.json'))) is False   # noqa
+    assert Cache(str(tmpdir.join('other'))).put('k', str(out)) is True
@@ -11,11 +11,15 @@ Unit tests for cctconvert
   -4  Output file already exists
   -5  Input file does not exist
   -6  Input file is already a version 2 file
+  -7  Input file is an invalid version 2 file
+  -8  Input file is already a version 1 file (--to v1)
+  -9  Variables refer to each other in a cycle (--order dependencies)
 
 """
 
 import os
 import codecs
+import shutil
 import json
 import collections
 
@@ -70,11 +74,11 @@ def test_unable_to_read_input_error(datafiles, runner):
 )
 def test_unable_to_write_output_error(mocker, datafiles, runner):
     """
-    While writing output json file, the json.dump() function raises
-    an exception
+    While writing output json file, serialising the context raises an
+    exception
     """
     mocker.patch(
-        'json.dump',
+        'cctconvert.stream.iter_context_json',
         side_effect=ValueError,
         autospec=True
     )
@@ -95,6 +99,58 @@ def test_unable_to_write_output_error(mocker, datafiles, runner):
     assert result.exit_code == -2
 
 
+@pytest.mark.parametrize('stream', [[], ['--stream']])
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'),
+)
+def test_unable_to_write_keeps_input(mocker, datafiles, runner, stream):
+    """
+    A write that fails leaves the version 1 input file in place, neither
+    renamed to its backup nor replaced by a truncated version 2 file.
+    """
+    mocker.patch('os.replace', side_effect=OSError('disk full'))
+
+    inpath = str(datafiles)
+    os.chdir(inpath)
+    v1 = open('cookiecutter.json').read()
+
+    result = runner.invoke(cctconvert.main, stream)
+
+    assert "Exception: Unable to write cookiecutter file 'cookiecutter.json'" in result.output   # noqa
+    assert 'disk full' in result.output
+    assert result.exit_code == -2
+    assert os.listdir(inpath) == ['cookiecutter.json']
+    assert open('cookiecutter.json').read() == v1
+
+
+@pytest.mark.parametrize('fsync, fsyncs', [
+    ('always', 4),
+    ('batch', 3),
+    ('never', 0),
+])
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json'),
+)
+def test_fsync_option(mocker, datafiles, runner, fsync, fsyncs):
+    """
+    --fsync always flushes every file and its directory, batch flushes the
+    files written and their directory once at the end of the run, never the
+    whole host.
+    """
+    mock_fsync = mocker.patch('os.fsync')
+    mock_sync = mocker.patch('os.sync', create=True)
+
+    inpath = str(datafiles)
+    os.chdir(inpath)
+
+    result = runner.invoke(cctconvert.main, ['.', 'empty.json', '--fsync', fsync, '--jobs', '1'])   # noqa
+
+    assert result.exit_code == 0
+    assert mock_fsync.call_count == fsyncs
+    assert not mock_sync.called
+
+
 @pytest.mark.datafiles(
     os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json'),
     os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json.v1.bkup')
@@ -235,6 +291,27 @@ def test_input_file_already_v2_error_with_verbose(datafiles, runner):
     assert result.exit_code == -6
 
 
+@pytest.mark.parametrize('stream', [[], ['--stream']])
+def test_input_file_invalid_v2_error(tmpdir, runner, stream):
+    """
+    An input file with the version 2 fields that is not a valid version 2
+    file is neither converted nor reported as version 2.
+    """
+    tmpdir.join('broken-v2.json').write(json.dumps({
+        'name': 'broken',
+        'cookiecutter_version': '2.0.0',
+        'variables': [{'name': 'license', 'default': 'MIT', 'choices': ['BSD']}],   # noqa
+    }))
+
+    with tmpdir.as_cwd():
+        result = runner.invoke(cctconvert.main, ['broken-v2.json'] + stream)
+
+    assert 'Cookiecutter context is an invalid version 2 context' in result.output   # noqa
+    assert 'Variable 0: the default is not one of the choices' in result.output   # noqa
+    assert result.exit_code == -7
+    assert tmpdir.listdir() == [tmpdir.join('broken-v2.json')]
+
+
 @pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json'))
 def test_input_is_empty_json(datafiles, runner):
     """
@@ -449,6 +526,7 @@ def test_full_processing_defaults_no_verbose_option(datafiles, runner):
     ]
 
     assert jfout['variables'][10]['name'] == 'file_types'
+    assert jfout['variables'][10]['type'] == 'json'
     assert jfout['variables'][10]['default'] == {
         "png": {
             "name": "Portable Network Graphic",
@@ -690,3 +768,268 @@ def test_full_processing_with_name_option_and_output_option(datafiles, runner):
                     ]
         }
     }
+
+
+@pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+def test_to_v1_option_round_trip(datafiles, runner):
+    """
+    A converted template converted back with --to v1 holds the original
+    version 1 context, the version 2 file is backed up.
+    """
+    os.chdir(str(datafiles))
+    original = load_json_file('cookiecutter.json')
+
+    result = runner.invoke(cctconvert.main, [])
+    assert result.exit_code == 0
+
+    result = runner.invoke(cctconvert.main, ['--to', 'v1'])
+
+    assert result.exit_code == 0
+    assert "Renaming input file to 'cookiecutter.json.v2.bkup'..." in result.output   # noqa
+    assert "Writing out version 1 cookiecutter template to file 'cookiecutter.json'" in result.output   # noqa
+    assert list(load_json_file('cookiecutter.json').items()) == list(original.items())   # noqa
+    assert cctconvert.context_is_version_2(load_json_file('cookiecutter.json.v2.bkup'))   # noqa
+
+    result = runner.invoke(cctconvert.main, ['--to', 'v1', '--output', 'v1.json'])   # noqa
+    assert "Cookiecutter file 'cookiecutter.json' is already a version 1 template!!" in result.output   # noqa
+    assert result.exit_code == -8
+    assert not os.path.exists('v1.json')
+
+
+def test_order_option(tmpdir, runner):
+    """
+    With --order dependencies a variable is prompted for after the
+    variables its default refers to, a cycle is an error.
+    """
+    tmpdir.join('cookiecutter.json').write(json.dumps(collections.OrderedDict([   # noqa
+        ('project_slug', '{{ cookiecutter.project_name|lower }}'),
+        ('project_name', 'Voigt-Kampff'),
+        ('cycle', '{{ cookiecutter.cycle }}'),
+    ])))
+    os.chdir(str(tmpdir))
+
+    result = runner.invoke(cctconvert.main, ['--order', 'dependencies', '-o', 'v2.json'])   # noqa
+
+    assert result.exit_code == -9
+    assert 'Cycle: cycle -> cycle' in result.output
+    assert not os.path.exists('v2.json')
+
+    ctx = load_json_file('cookiecutter.json')
+    del ctx['cycle']
+    tmpdir.join('cookiecutter.json').write(json.dumps(ctx))
+
+    result = runner.invoke(cctconvert.main, ['--order', 'dependencies', '-o', 'v2.json'])   # noqa
+
+    assert result.exit_code == 0
+    variables = load_json_file('v2.json')['variables']
+    assert [v['name'] for v in variables] == ['project_name', 'project_slug']   # noqa
+
+
+def test_to_v1_and_order_options_reject_stream_option(runner):
+    result = runner.invoke(cctconvert.main, ['--to', 'v1', '--stream'])
+
+    assert result.exit_code == 2
+    assert '--stream cannot be used with --to v1' in result.output
+
+    result = runner.invoke(cctconvert.main, ['--order', 'dependencies', '--stream'])   # noqa
+    assert result.exit_code == 2
+    assert '--order dependencies cannot be used with --stream or --to v1' in result.output   # noqa
+
+
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'minimal-v2.json'),
+)
+def test_batch_directory_is_searched_recursively(datafiles, runner):
+    """
+    Given a directory, every cookiecutter.json below it is converted in one
+    run, the first failing result code is returned, and a summary emitted.
+    """
+    inpath = str(datafiles)
+    os.chdir(inpath)
+
+    for sub in ('a', os.path.join('b', 'c')):
+        os.makedirs(os.path.join('templates', sub))
+    shutil.copy('cookiecutter.json', os.path.join('templates', 'a'))
+    shutil.copy('minimal-v2.json', os.path.join('templates', 'b', 'c', 'cookiecutter.json'))   # noqa
+
+    result = runner.invoke(cctconvert.main, ['templates', 'cookiecutter.json'])   # noqa
+
+    assert result.output.count(IDENT) == 1
+    a = os.path.join('templates', 'a', 'cookiecutter.json')
+    c = os.path.join('templates', 'b', 'c', 'cookiecutter.json')
+    assert "[ 0] converted             " + a in result.output
+    assert "[-6] already version 2     " + c in result.output
+    assert "[ 0] converted             cookiecutter.json" in result.output
+    assert 'Summary:' in result.output
+    assert '-6 already version 2     : 1' in result.output
+    assert 'total                 : 3' in result.output
+
+    assert result.exit_code == -6
+
+    for converted in (a, 'cookiecutter.json'):
+        assert os.path.isfile(converted + cctconvert.V1_BACKUP_EXT)
+        assert len(load_json_file(converted)['variables']) == 11
+
+
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'bad.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json'),
+)
+def test_batch_glob_continues_after_errors(datafiles, runner):
+    """
+    A glob pattern expands to many files, an unloadable file does not stop
+    the remaining conversions.
+    """
+    inpath = str(datafiles)
+    os.chdir(inpath)
+
+    result = runner.invoke(cctconvert.main, ['*.json', '--no-incept'])
+
+    assert "[-1] unable to load        bad.json" in result.output
+    assert "[ 0] converted             empty.json" in result.output
+    assert result.exit_code == -1
+    assert os.path.isfile('empty.json.v1.bkup')
+
+
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json'),
+)
+def test_batch_continues_after_non_object(datafiles, runner):
+    """
+    A JSON file holding an array rather than an object does not stop the
+    remaining conversions, nor the summary.
+    """
+    inpath = str(datafiles)
+    os.chdir(inpath)
+    with open('array.json', 'w') as fp:
+        fp.write('[]')
+
+    result = runner.invoke(cctconvert.main, ['*.json', '--no-incept', '--jobs', '1'])   # noqa
+
+    assert "[-1] unable to load        array.json" in result.output
+    assert "Cookiecutter context is not a JSON object" in result.output
+    assert "[ 0] converted             empty.json" in result.output
+    assert 'total                 : 2' in result.output
+    assert result.exit_code == -1
+
+
+def test_batch_rejects_output_option(runner):
+    """
+    A single --output FILE cannot name the output of several conversions.
+    """
+    result = runner.invoke(cctconvert.main, ['a.json', 'b.json', '--output', 'v2.json'])   # noqa
+
+    assert result.exit_code == 2
+    assert '--output cannot be used with multiple COOKIECUTTER files' in result.output   # noqa
+
+
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json'),
+)
+def test_batch_dryrun_option(mocker, datafiles, runner):
+    """
+    Batch --dryrun converts nothing on disk and every file succeeds.
+    """
+    mock_click_clear = mocker.patch('click.clear', autospec=True)
+
+    inpath = str(datafiles)
+    os.chdir(inpath)
+
+    result = runner.invoke(cctconvert.main, ['.', 'empty.json', '--dryrun', '--clear'])   # noqa
+
+    assert mock_click_clear.call_args == mocker.call()
+    assert result.output.count("Dry-run: No v2 output file produced.") == 2
+    assert result.exit_code == 0
+    assert sorted(os.listdir(inpath)) == ['cookiecutter.json', 'empty.json']
+
+
+def test_batch_version_option(runner):
+    """
+    --version with several COOKIECUTTER files emits IDENT and exits.
+    """
+    result = runner.invoke(cctconvert.main, ['a.json', 'b.json', '--version'])
+    assert result.exit_code == 0
+    assert IDENT in result.output
+    assert 'Summary:' not in result.output
+
+
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'bad.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'minimal-v2.json'),
+)
+def test_batch_jobs_option_is_deterministic(datafiles, runner):
+    """
+    With a worker pool the output and the result codes are emitted in input
+    order, identical to a serial run.
+    """
+    inpath = str(datafiles)
+    os.chdir(inpath)
+
+    files = ['minimal-v2.json', 'cookiecutter.json', 'bad.json', 'empty.json',
+             'missing.json']
+    serial = runner.invoke(cctconvert.main, files + ['--dryrun', '--jobs', '1'])   # noqa
+    pooled = runner.invoke(cctconvert.main, files + ['--dryrun', '--jobs', '3'])   # noqa
+
+    assert serial.exit_code == pooled.exit_code == -6
+    # Drop the IDENT line, its time stamp may differ between the runs
+    assert serial.output.splitlines()[1:] == pooled.output.splitlines()[1:]
+    statuses = [line for line in pooled.output.splitlines()
+                if line.startswith('[')]
+    assert [s.split()[-1] for s in statuses] == files
+    assert [s.split(']')[0] for s in statuses] == ['[-6', '[ 0', '[-1', '[ 0', '[-5']   # noqa
+
+
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'bad.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'empty.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'minimal-v2.json'),
+)
+def test_batch_async_io_option_is_deterministic(datafiles, runner):
+    """
+    With overlapped I/O the output and the result codes are emitted in input
+    order, identical to a serial run, and the files are converted.
+    """
+    inpath = str(datafiles)
+    os.chdir(inpath)
+
+    files = ['minimal-v2.json', 'cookiecutter.json', 'bad.json', 'empty.json',
+             'missing.json']
+    serial = runner.invoke(cctconvert.main, files + ['--dryrun', '--jobs', '1'])   # noqa
+    overlapped = runner.invoke(cctconvert.main, files + ['--dryrun', '--async-io', '3'])   # noqa
+
+    assert serial.exit_code == overlapped.exit_code == -6
+    assert serial.output.splitlines()[1:] == overlapped.output.splitlines()[1:]   # noqa
+
+    result = runner.invoke(cctconvert.main, ['cookiecutter.json', 'empty.json', '--async-io', '2'])   # noqa
+    assert result.exit_code == 0
+    assert os.path.isfile('cookiecutter.json.v1.bkup')
+    assert os.path.isfile('empty.json.v1.bkup')
+
+
+def test_batch_async_io_rejects_jobs_option(runner):
+    result = runner.invoke(cctconvert.main, ['a.json', 'b.json', '--async-io', '2', '--jobs', '2'])   # noqa
+
+    assert result.exit_code == 2
+    assert '--async-io cannot be used with --jobs' in result.output
+
+
+@pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'bad.json'))
+def test_convert_one_captured(datafiles):
+    """
+    The pool worker returns the result code along with the captured output.
+    """
+    os.chdir(str(datafiles))
+
+    options = dict(verbose=False, name=None, dryrun=False, output=None,
+                   no_incept=False, ident=IDENT)
+    (rc, stats), output = cctconvert.convert_one_captured(('bad.json', options, False))   # noqa
+
+    assert rc == -1
+    assert stats is None
+    assert "Converting 'bad.json'..." in output
+    assert "Exception: Unable to load cookiecutter file 'bad.json'" in output
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.core, the transform without the command line
+interface.
+"""
+
+import os
+import sys
+import json
+import subprocess
+import collections
+
+import pytest
+
+import cctconvert
+from cctconvert import core
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+
+def v1_context():
+    return core.cc_read(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_convert_context():
+    """
+    The transform returns the version 2 context, one variable per v1 key.
+    """
+    ctx_v2 = cctconvert.convert_context(v1_context(), 'replicant', ident='me')
+
+    assert isinstance(ctx_v2, collections.OrderedDict)
+    assert list(ctx_v2.keys()) == ['name', 'cookiecutter_version', '_inception', 'variables']   # noqa
+    assert ctx_v2['name'] == 'replicant'
+    assert ctx_v2['_inception'] == 'Transformed by me'
+    assert len(ctx_v2['variables']) == 11
+    assert ctx_v2['variables'][6] == collections.OrderedDict([
+        ('name', '_private_key'), ('default', '7777'), ('prompt_user', False)])   # noqa
+    assert ctx_v2['variables'][9]['default'] == 'MIT license'
+    assert ctx_v2['variables'][9]['choices'][-1] == 'Not open source'
+
+
+def test_convert_context_compact(tmpdir):
+    """
+    The context is plain JSON data, its compact form holds Variable records
+    that cc_write writes exactly the same.
+    """
+    ctx_v2 = cctconvert.convert_context(v1_context(), 'replicant', ident='me')   # noqa
+    compact = cctconvert.convert_context(v1_context(), 'replicant', ident='me', compact=True)   # noqa
+
+    assert all(type(v) is collections.OrderedDict for v in ctx_v2['variables'])   # noqa
+    assert all(isinstance(v, core.Variable) for v in compact['variables'])
+    assert compact == ctx_v2
+
+    for json_backend in (None, 'ujson'):
+        cctconvert.cc_write(compact, str(tmpdir.join('v2.json')), json_backend)   # noqa
+        assert tmpdir.join('v2.json').read() == json.dumps(ctx_v2, indent=4)
+
+
+def test_convert_context_incept():
+    """
+    An _inception field is recorded unless incept is False.
+    """
+    ctx_v2 = cctconvert.convert_context({}, 'empty')
+    assert ctx_v2['_inception'].startswith('Transformed by ' + core.IDENT)
+
+    ctx_v2 = cctconvert.convert_context({}, 'empty', incept=False)
+    assert list(ctx_v2.keys()) == ['name', 'cookiecutter_version', 'variables']   # noqa
+
+
+@pytest.mark.parametrize('to', ['v2', 'v1'])
+@pytest.mark.parametrize('ctx', [[], 5, 'x', None])
+def test_convert_context_not_an_object(ctx, to):
+    """
+    A JSON document that is not an object is rejected as unloadable.
+    """
+    with pytest.raises(cctconvert.LoadError) as excinfo:
+        cctconvert.convert_context(ctx, 'replicant', to=to)
+    assert excinfo.value.exit_code == -1
+
+
+def test_convert_context_already_version_2():
+    """
+    A version 2 context is rejected.
+    """
+    ctx_v2 = cctconvert.convert_context(v1_context(), 'replicant')
+
+    with pytest.raises(cctconvert.AlreadyVersion2Error) as excinfo:
+        cctconvert.convert_context(ctx_v2, 'replicant')
+    assert excinfo.value.exit_code == -6
+
+
+@pytest.mark.parametrize('k, v, variable', [
+    ('a', 'x', [('name', 'a'), ('default', 'x')]),
+    ('a', '{{ cookiecutter.b }}', [('name', 'a'), ('default', '{{ cookiecutter.b }}')]),   # noqa
+    ('a', True, [('name', 'a'), ('default', True), ('type', 'boolean')]),
+    ('a', 7, [('name', 'a'), ('default', 7), ('type', 'int')]),
+    ('a', 0.5, [('name', 'a'), ('default', 0.5), ('type', 'float')]),
+    ('a', None, [('name', 'a'), ('default', None)]),
+    ('a', {'b': 1}, [('name', 'a'), ('default', {'b': 1}), ('type', 'json')]),   # noqa
+    ('a', ['x', 'y'], [('name', 'a'), ('default', 'x'), ('choices', ['x', 'y'])]),   # noqa
+    ('a', [], [('name', 'a'), ('default', []), ('type', 'json')]),
+    ('_a', ['*.png'], [('name', '_a'), ('default', ['*.png']), ('type', 'json'), ('prompt_user', False)]),   # noqa
+])
+def test_make_variable(k, v, variable):
+    """
+    Every kind of version 1 value gets its version 2 type, and converts back
+    to itself.
+    """
+    assert list(core.make_variable(k, v).items()) == variable
+    assert core.make_item(core.make_variable(k, v)) == (k, v)
+
+
+def test_variable():
+    """
+    A Variable is a slotted, read-only mapping sharing its choices list.
+    """
+    choices = ['x', 'y']
+    variable = core.make_variable('a', choices)
+
+    assert not hasattr(variable, '__dict__')
+    assert variable.choices is choices
+    assert variable == collections.OrderedDict([('name', 'a'), ('default', 'x'), ('choices', choices)])   # noqa
+    assert 'choices' in variable and 'type' not in variable
+    assert variable.get('prompt_user', True) is True
+    assert len(variable) == 3
+    assert list(variable._asdict().items()) == list(variable.items())
+    with pytest.raises(KeyError):
+        variable['type']
+
+
+@pytest.mark.parametrize('v, kind', [
+    ('x', 'string'), ('{% if x %}', 'templated'), (False, 'bool'), (1, 'int'),
+    (1.0, 'float'), ([], 'list'), ({}, 'dict'),
+    (collections.OrderedDict(), 'dict'), (None, 'null'),
+])
+def test_classify(v, kind):
+    assert core.classify(v) == kind
+
+
+def test_dependency_graph():
+    """
+    Variables depend on the variables their Jinja expressions refer to,
+    wherever the expressions are in their values.
+    """
+    ctx = collections.OrderedDict([
+        ('name', 'Rick'),
+        ('slug', "{{ cookiecutter.name|lower }}-{{ cookiecutter['year'] }}"),
+        ('year', 2019),
+        ('docs', {'{{ cookiecutter.slug }}': ['{% if cookiecutter.name %}x{% endif %}']}),   # noqa
+        ('other', '{{ cookiecutter._template }} cookiecutter.name'),
+    ])
+
+    assert list(core.dependency_graph(ctx).items()) == [
+        ('name', ()),
+        ('slug', ('name', 'year')),
+        ('year', ()),
+        ('docs', ('slug', 'name')),
+        ('other', ()),
+    ]
+
+    hits = core.template_references.cache_info().hits
+    core.dependency_graph(ctx)
+    assert core.template_references.cache_info().hits == hits + 4
+
+
+def test_dependency_order():
+    """
+    Keys come after the keys they refer to and otherwise keep their order,
+    however long the chain of references.
+    """
+    ctx = collections.OrderedDict([
+        ('a', 'a'),
+        ('slug', '{{ cookiecutter.name }}-{{ cookiecutter.year }}'),
+        ('b', 'b'),
+        ('year', 2019),
+        ('name', '{{ cookiecutter.a }}'),
+    ])
+    assert core.dependency_order(ctx) == ['a', 'name', 'year', 'slug', 'b']
+
+    # Each key refers to the next one
+    n = 10000
+    ctx = collections.OrderedDict(
+        ('v{i}'.format(i=i), '{{{{ cookiecutter.v{j} }}}}'.format(j=i + 1))
+        for i in range(n))
+    ctx['v{i}'.format(i=n)] = 'last'
+    order = core.dependency_order(ctx)
+    assert order == list(reversed(ctx))
+
+    ctx_v2 = cctconvert.convert_context(ctx, 'chain', order='dependencies')
+    assert [v['name'] for v in ctx_v2['variables']] == order
+
+
+@pytest.mark.parametrize('ctx, cycle', [
+    ({'a': '{{ cookiecutter.a }}'}, 'Cycle: a -> a'),
+    (collections.OrderedDict([
+        ('a', '{{ cookiecutter.b }}'), ('x', 1), ('b', ['{{ cookiecutter.c }}']),   # noqa
+        ('c', {'k': '{{ cookiecutter.b }}'})]), 'Cycle: b -> c -> b'),
+])
+def test_dependency_order_cycle(ctx, cycle):
+    """
+    Keys referring to each other in a cycle cannot be ordered.
+    """
+    with pytest.raises(cctconvert.DependencyCycleError) as excinfo:
+        cctconvert.convert_context(ctx, 'cycle', order='dependencies')
+    assert excinfo.value.exit_code == -9
+    assert excinfo.value.detail == cycle
+
+
+def v2_context(*variables):
+    return collections.OrderedDict([
+        ('name', 'replicant'),
+        ('cookiecutter_version', '2.0.0'),
+        ('variables', list(variables)),
+    ])
+
+
+@pytest.mark.parametrize('ctx, error', [
+    (v2_context(), None),
+    (v2_context({'name': 'a', 'default': 1},
+                {'name': 'b', 'default': 'x', 'choices': ['y', 'x'],
+                 'prompt_user': False, 'hide_input': True}), None),
+    ([], 'The context is not a JSON object'),
+    ({'name': 'n', 'variables': []}, "Field 'cookiecutter_version' is missing"),   # noqa
+    ({'name': 'n', 'cookiecutter_version': 2, 'variables': []}, "Field 'cookiecutter_version' is not a string"),   # noqa
+    ({'name': 'n', 'cookiecutter_version': '2', 'variables': {}}, "Field 'variables' is not a list"),   # noqa
+    (v2_context({'name': 'a', 'default': 1}, 'b'), 'Variable 1: not a JSON object'),   # noqa
+    (v2_context({'default': 1}), "Variable 0: field 'name' is missing or not a string"),   # noqa
+    (v2_context({'name': 'a'}), "Variable 0: field 'default' is missing"),
+    (v2_context({'name': 'a', 'default': 1, 'prompt_user': 'no'}), "Variable 0: field 'prompt_user' is not a boolean"),   # noqa
+    (v2_context({'name': 'a', 'default': 1, 'choices': 1}), "Variable 0: field 'choices' is not a list"),   # noqa
+    (v2_context({'name': 'a', 'default': 1, 'choices': [2]}), 'Variable 0: the default is not one of the choices'),   # noqa
+])
+def test_v2_error(ctx, error):
+    """
+    The validator reports the first structural error of a version 2 context.
+    """
+    assert cctconvert.v2_error(ctx) == error
+    assert cctconvert.context_is_version_2(ctx) is (error is None)
+
+
+def test_convert_context_invalid_version_2():
+    """
+    A context with the version 2 fields that is not a valid version 2
+    context is rejected, so is an invalid converted context.
+    """
+    with pytest.raises(cctconvert.InvalidVersion2Error) as excinfo:
+        cctconvert.convert_context(v2_context({'name': 'a'}), 'replicant')
+    assert excinfo.value.exit_code == -7
+    assert excinfo.value.detail == "Variable 0: field 'default' is missing"
+
+    with pytest.raises(cctconvert.InvalidVersion2Error) as excinfo:
+        cctconvert.convert_context({'a': 1}, 7)
+    assert excinfo.value.detail == "Field 'name' is not a string"
+
+
+@pytest.mark.parametrize('file_name', ['cookiecutter.json', 'empty.json'])   # noqa
+def test_revert_context_round_trip(file_name):
+    """
+    Converting a version 1 context to version 2 and back gives the original
+    context.
+    """
+    ctx = core.cc_read(os.path.join(TEST_SUPPORT_DIR, 'input', file_name))
+    ctx_v2 = cctconvert.convert_context(ctx, 'replicant')
+
+    ctx_v1 = cctconvert.convert_context(ctx_v2, 'unused', to='v1')
+
+    assert isinstance(ctx_v1, collections.OrderedDict)
+    assert list(ctx_v1.items()) == list(ctx.items())
+    assert cctconvert.revert_context(core.cc_read(os.path.join(TEST_SUPPORT_DIR, 'input', 'minimal-v2.json'))) == {}   # noqa
+
+
+def test_revert_context():
+    """
+    The default is moved first in the choices, variables not prompted for
+    become private keys and fields version 1 has no place for are dropped.
+    """
+    ctx_v2 = v2_context(
+        {'name': 'license', 'default': 'BSD', 'choices': ['MIT', 'BSD', 'ISC']},   # noqa
+        {'name': 'key', 'default': 7, 'prompt_user': False},
+        {'name': '_secret', 'default': 'x', 'prompt_user': False},
+        {'name': 'password', 'default': '', 'hide_input': True},
+    )
+
+    ctx_v1 = cctconvert.revert_context(ctx_v2)
+
+    assert list(ctx_v1.items()) == [
+        ('license', ['BSD', 'MIT', 'ISC']),
+        ('_key', 7),
+        ('_secret', 'x'),
+        ('password', ''),
+    ]
+
+
+@pytest.mark.parametrize('ctx, exception, detail', [
+    ({'full_name': 'x'}, cctconvert.AlreadyVersion1Error, None),
+    (v2_context({'name': 'a'}), cctconvert.InvalidVersion2Error, "Variable 0: field 'default' is missing"),   # noqa
+    (v2_context({'name': '_a', 'default': 1},
+                {'name': 'a', 'default': 2, 'prompt_user': False}),
+     cctconvert.InvalidVersion2Error, "Variable 1: key '_a' is already used"),   # noqa
+])
+def test_revert_context_errors(ctx, exception, detail):
+    """
+    Only a valid version 2 context that maps to distinct version 1 keys is
+    converted back.
+    """
+    with pytest.raises(exception) as excinfo:
+        cctconvert.revert_context(ctx)
+    assert excinfo.value.detail == detail
+
+
+@pytest.mark.parametrize('file_name, exception, exit_code', [
+    ('bad.json', cctconvert.LoadError, -1),
+    ('missing.json', cctconvert.InputNotFoundError, -5),
+])
+def test_cc_read_errors(file_name, exception, exit_code):
+    """
+    Load failures are raised as typed exceptions rather than exiting.
+    """
+    with pytest.raises(exception) as excinfo:
+        cctconvert.cc_read(os.path.join(TEST_SUPPORT_DIR, 'input', file_name))   # noqa
+
+    assert isinstance(excinfo.value, cctconvert.ConversionError)
+    assert excinfo.value.exit_code == exit_code
+    assert file_name in excinfo.value.message
+
+
+def test_resolve_output_filename_errors(tmpdir):
+    """
+    Existing backup and output files are raised as typed exceptions.
+    """
+    tmpdir.join('in.json').write('{}')
+    tmpdir.join('in.json' + core.V1_BACKUP_EXT).write('{}')
+    infile = str(tmpdir.join('in.json'))
+
+    with pytest.raises(cctconvert.BackupExistsError):
+        core.resolve_output_filename(infile, None)
+
+    with pytest.raises(cctconvert.OutputExistsError) as excinfo:
+        core.resolve_output_filename(infile, infile)
+    assert excinfo.value.exit_code == -4
+    assert '--output-file' in excinfo.value.detail
+
+
+def test_atomic_write(tmpdir):
+    """
+    The output replaces the input only once completely written, and a failed
+    write changes nothing.
+    """
+    infile = tmpdir.join('in.json')
+    infile.write('v1')
+    backup = str(infile) + core.V1_BACKUP_EXT
+
+    with pytest.raises(cctconvert.WriteError) as excinfo:
+        with core.atomic_write(str(infile), backup=backup) as out:
+            out.write('partial')
+            raise ValueError('killed')
+    assert excinfo.value.detail == 'killed'
+    assert tmpdir.listdir() == [infile]
+    assert infile.read() == 'v1'
+
+    with core.atomic_write(str(infile), fsync=True, backup=backup) as out:
+        out.write('v2')
+        assert infile.read() == 'v1'
+    assert infile.read() == 'v2'
+    assert tmpdir.join('in.json' + core.V1_BACKUP_EXT).read() == 'v1'
+    assert len(tmpdir.listdir()) == 2
+
+    with pytest.raises(cctconvert.WriteError):
+        core.cc_write({}, str(tmpdir.join('missing', 'out.json')))
+
+
+def test_core_does_not_import_click():
+    """
+    The transform can be imported without the command line interface.
+    """
+    code = 'import sys, cctconvert; print("click" in sys.modules)'
+    project_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))   # noqa
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=project_dir)
+    assert output.strip() == b'False'
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.daemon, the conversion daemon, and its client in
+cctconvert.__main__.
+"""
+
+import os
+import sys
+import json
+import shutil
+import socket
+import subprocess
+import threading
+
+import pytest
+
+from cctconvert import cctconvert
+from cctconvert.__main__ import forward
+from cctconvert.daemon import run_request
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+V1_COOKIECUTTER = os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json')   # noqa
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'),
+                                reason='Unix domain sockets only')
+
+
+@pytest.fixture
+def daemon(tmpdir):
+    """
+    Start a daemon on a socket in tmpdir, yield the socket path and stop the
+    daemon.
+    """
+    path = str(tmpdir.join('cctconvert.sock'))
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'cctconvert', '--serve', '--socket', path],
+        cwd=PROJECT_DIR, stdout=subprocess.PIPE, universal_newlines=True)
+    # The daemon says when it is listening
+    assert 'listening' in proc.stdout.readline()
+    yield path
+    proc.terminate()
+    proc.wait(10)
+    proc.stdout.close()
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_daemon_converts(daemon, tmpdir):
+    """
+    A forwarded command line runs in the client's directory and returns the
+    command's output and exit code.
+    """
+    shutil.copy(V1_COOKIECUTTER, str(tmpdir))
+
+    with tmpdir.as_cwd():
+        response = forward(daemon, ['--name', 'replicant'])
+
+    assert response['rc'] == 0
+    assert 'Writing out version 2' in response['stdout']
+    assert response['stderr'] == ''
+    ctx = json.loads(tmpdir.join('cookiecutter.json').read())
+    assert ctx['name'] == 'replicant'
+    assert tmpdir.join('cookiecutter.json.v1.bkup').check()
+
+    with tmpdir.as_cwd():
+        response = forward(daemon, ['missing.json'])
+    assert response['rc'] == -5
+
+    with tmpdir.as_cwd():
+        response = forward(daemon, ['--bogus'])
+    assert response['rc'] == 2
+    assert 'no such option' in response['stderr']
+
+
+def test_daemon_serves_concurrent_clients(daemon, tmpdir):
+    """
+    Concurrent clients are served independently.
+    """
+    for i in range(8):
+        tmpdir.mkdir(str(i))
+        shutil.copy(V1_COOKIECUTTER, str(tmpdir.join(str(i))))
+
+    responses = {}
+
+    def client(i):
+        responses[i] = forward(daemon, [
+            str(tmpdir.join(str(i), 'cookiecutter.json')), '--name', str(i)])
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(8):
+        assert responses[i]['rc'] == 0
+        ctx = json.loads(tmpdir.join(str(i), 'cookiecutter.json').read())
+        assert ctx['name'] == str(i)
+
+
+def test_daemon_removes_socket(tmpdir):
+    """
+    A terminated daemon removes its socket, and a second daemon on the same
+    socket is refused.
+    """
+    path = str(tmpdir.join('cctconvert.sock'))
+    args = [sys.executable, '-m', 'cctconvert', '--serve', '--socket', path]
+    proc = subprocess.Popen(args, cwd=PROJECT_DIR, stdout=subprocess.PIPE,
+                            universal_newlines=True)
+    assert 'listening' in proc.stdout.readline()
+
+    second = subprocess.run(args, cwd=PROJECT_DIR, stdout=subprocess.PIPE,
+                            universal_newlines=True)
+    assert second.returncode == 1
+    assert 'already listening' in second.stdout
+
+    proc.terminate()
+    proc.wait(10)
+    proc.stdout.close()
+    assert not os.path.exists(path)
+    assert forward(path, ['--version']) is None
+
+
+def test_client_falls_back_without_daemon(tmpdir):
+    """
+    With no daemon listening on $CCTCONVERT_SOCKET, the conversion runs in
+    the client.
+    """
+    shutil.copy(V1_COOKIECUTTER, str(tmpdir))
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR,
+               CCTCONVERT_SOCKET=str(tmpdir.join('none.sock')))
+
+    proc = subprocess.run([sys.executable, '-m', 'cctconvert'],
+                          cwd=str(tmpdir), env=env, stdout=subprocess.PIPE)
+
+    assert proc.returncode == 0
+    assert tmpdir.join('cookiecutter.json.v1.bkup').check()
+
+
+def test_run_request(mocker, tmpdir):
+    """
+    A request runs with the client's directory and CCTCONVERT_* variables
+    only.
+    """
+    mocker.patch.dict(os.environ, {'CCTCONVERT_JSON_BACKEND': 'bogus'})
+    cwd = os.getcwd()
+    shutil.copy(V1_COOKIECUTTER, str(tmpdir))
+
+    try:
+        response = run_request({
+            'argv': ['--output', 'v2.json'],
+            'cwd': str(tmpdir),
+            'env': {},
+            'color': False,
+        })
+    finally:
+        os.chdir(cwd)
+
+    assert response['rc'] == 0
+    assert response['stdout'].startswith(cctconvert.IDENT)
+    assert tmpdir.join('v2.json').check()
+
+
+def test_serve_requires_socket(runner):
+    result = runner.invoke(cctconvert.main, ['--serve'],
+                           env={'CCTCONVERT_SOCKET': None})
+
+    assert result.exit_code == 2
+    assert '--serve requires --socket' in result.output
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.diff, the --dryrun --diff output.
+"""
+
+import os
+import json
+import shutil
+
+import pytest
+
+from cctconvert import cctconvert, diff
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+
+def copy_input(tmpdir, name='cookiecutter.json'):
+    shutil.copy(os.path.join(TEST_SUPPORT_DIR, 'input', name),
+                str(tmpdir.join('cookiecutter.json')))
+    os.chdir(str(tmpdir))
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_digests(tmpdir):
+    path = tmpdir.join('f.json')
+    path.write_text(u'{"a": "é"}', encoding='utf8')
+
+    assert diff.file_digest(str(path)) == diff.text_digest(['{"a": ', '"é"}'])   # noqa
+    assert diff.file_digest(str(path)) != diff.text_digest(['{}'])
+    assert diff.file_digest(str(tmpdir.join('missing.json'))) is None
+
+
+@pytest.mark.parametrize('text, ident', [
+    ('{"name": "x", "_inception": "Transformed by cctconvert 1.0.1 today", "variables": []}', 'cctconvert 1.0.1 today'),   # noqa
+    ('{"name": "x", "_inception": "by hand", "variables": []}', None),
+    ('{"name": "x", "variables": []}', None),
+    ('{"name": "x", "variables": [', None),
+    ('not json', None),
+])
+def test_existing_ident(tmpdir, text, ident):
+    path = tmpdir.join('cookiecutter.json')
+    path.write(text)
+    assert diff.existing_ident(str(path)) == ident
+
+
+def test_existing_ident_missing_file(tmpdir):
+    assert diff.existing_ident(str(tmpdir.join('missing.json'))) is None
+
+
+def test_would_change(tmpdir):
+    path = tmpdir.join('f.txt')
+    path.write('a\nb\nc')
+    calls = []
+
+    def make_chunks(text):
+        def chunks():
+            calls.append(text)
+            return iter([text[:1], text[1:]])
+        return chunks
+
+    assert diff.would_change(str(path), make_chunks('a\nb\nc')) is None
+    assert len(calls) == 1
+
+    lines = diff.would_change(str(path), make_chunks('a\nB\nc'))
+    assert len(calls) == 3
+    assert lines == [
+        '--- {p}'.format(p=path), '+++ {p} (converted)'.format(p=path),
+        '@@ -1,3 +1,3 @@', ' a', '-b', '+B', ' c']
+
+    lines = diff.diff_lines(str(tmpdir.join('missing.txt')), ['x'], 'new')
+    assert lines[1:] == ['+++ new', '@@ -0,0 +1 @@', '+x']
+
+
+@pytest.mark.parametrize('options', [[], ['--stream']])
+def test_diff_option(tmpdir, runner, options):
+    """
+    An unconverted template shows its whole conversion, a converted template
+    shows nothing until its backup changes.
+    """
+    copy_input(tmpdir)
+
+    result = runner.invoke(cctconvert.main, ['--dryrun', '--diff'] + options)
+    assert result.exit_code == 0
+    assert '-  "full_name": "Rick Deckard",' in result.output
+    assert '+            "name": "full_name",' in result.output
+    assert 'Cookiecutter input' not in result.output
+    assert os.listdir(str(tmpdir)) == ['cookiecutter.json']
+
+    result = runner.invoke(cctconvert.main, ['--no-incept'] + options)
+    assert result.exit_code == 0
+    converted = tmpdir.join('cookiecutter.json').read()
+
+    result = runner.invoke(cctconvert.main, ['--dryrun', '--diff', '--no-incept'] + options)   # noqa
+    assert result.exit_code == 0
+    assert "No changes to 'cookiecutter.json'." in result.output
+    assert '---' not in result.output
+
+    backup = tmpdir.join('cookiecutter.json.v1.bkup')
+    backup.write(backup.read().replace('Rick Deckard', 'Roy Batty'))
+    result = runner.invoke(cctconvert.main, ['--dryrun', '--diff', '--no-incept'] + options)   # noqa
+    assert result.exit_code == 0
+    assert '-            "default": "Rick Deckard"' in result.output
+    assert '+            "default": "Roy Batty"' in result.output
+    assert "Dry-run: No v2 output file produced." in result.output
+    assert tmpdir.join('cookiecutter.json').read() == converted
+
+
+def test_diff_option_keeps_inception(tmpdir, runner, mocker):
+    """
+    The output of a converted template keeps its ident, so that converting
+    it again at another time changes nothing.
+    """
+    copy_input(tmpdir)
+    assert runner.invoke(cctconvert.main, []).exit_code == 0
+
+    mocker.patch('cctconvert.cctconvert.make_ident', return_value='cctconvert 9.9.9 later')   # noqa
+    result = runner.invoke(cctconvert.main, ['--dryrun', '--diff'])
+    assert result.exit_code == 0
+    assert "No changes to 'cookiecutter.json'." in result.output
+
+
+def test_diff_option_output_and_to_v1(tmpdir, runner):
+    copy_input(tmpdir, 'minimal-v2.json')
+
+    result = runner.invoke(cctconvert.main, ['--dryrun', '--diff', '--to', 'v1', '-o', 'v1.json'])   # noqa
+    assert result.exit_code == 0
+    assert result.output.splitlines()[1:] == [
+        '--- v1.json', '+++ v1.json (converted)', '@@ -0,0 +1 @@', '+{}',
+        'Dry-run: No v1 output file produced.']
+
+    result = runner.invoke(cctconvert.main, ['--dryrun', '--diff'])
+    assert result.exit_code == -6
+    assert "is already a version 2 template!!" in result.output
+
+
+def test_diff_option_report(tmpdir, runner):
+    for d, name in (('a', 'cookiecutter.json'), ('b', 'minimal-v2.json')):
+        tmpdir.mkdir(d)
+        shutil.copy(os.path.join(TEST_SUPPORT_DIR, 'input', name),
+                    str(tmpdir.join(d, 'cookiecutter.json')))
+    os.chdir(str(tmpdir))
+    runner.invoke(cctconvert.main, [os.path.join('a', 'cookiecutter.json'), '--no-incept'])   # noqa
+
+    result = runner.invoke(cctconvert.main, [
+        '.', '--dryrun', '--diff', '--no-incept', '--jobs', '1',
+        '--report', 'jsonl', '--report-file', 'report.jsonl'])
+    assert result.exit_code == -6
+    with open('report.jsonl', encoding='utf8') as fp:
+        records = [json.loads(line) for line in fp]
+    assert [(r['rc'], r['changed'], r['variables']) for r in records] == [
+        (0, False, 11), (-6, None, None)]
+
+
+def test_diff_option_requires_dryrun(runner):
+    result = runner.invoke(cctconvert.main, ['--diff'])
+    assert result.exit_code == 2
+    assert '--diff requires --dryrun' in result.output
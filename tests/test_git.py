@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.git, the --since and --from-git options.
+"""
+
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from cctconvert import cctconvert
+from cctconvert.git import GitError, changed_templates, read_blobs
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+V1_COOKIECUTTER = os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json')
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')   # noqa
+
+
+def run_git(*args):
+    subprocess.check_call(
+        ['git', '-c', 'user.name=cctconvert', '-c', 'user.email=cctconvert@example.com'] + list(args),   # noqa
+        stdout=subprocess.DEVNULL)
+
+
+def add_template(directory):
+    os.makedirs(directory)
+    shutil.copy(V1_COOKIECUTTER, directory)
+
+
+@pytest.fixture
+def repo(tmpdir):
+    """
+    A git repository holding the templates a, b and c, committed, as the
+    current directory.
+    """
+    os.chdir(str(tmpdir))
+    run_git('init', '-q')
+    for d in ('a', 'b', 'c'):
+        add_template(d)
+    with open('README.md', 'w') as fp:
+        fp.write('Templates\n')
+    run_git('add', '.')
+    run_git('commit', '-q', '-m', 'Templates')
+    return tmpdir
+
+
+def change_templates():
+    """
+    Modify b, remove c and add d, uncommitted.
+    """
+    with open(os.path.join('b', 'cookiecutter.json'), 'a') as fp:
+        fp.write('\n')
+    shutil.rmtree('c')
+    add_template('d')
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_changed_templates(repo):
+    assert changed_templates('HEAD') == []
+    change_templates()
+
+    assert changed_templates('HEAD') == ['b/cookiecutter.json', 'd/cookiecutter.json']   # noqa
+    assert changed_templates('HEAD', ['d']) == ['d/cookiecutter.json']
+    assert changed_templates('HEAD', from_git=True) == []
+
+    run_git('add', '-A')
+    run_git('commit', '-q', '-m', 'Change')
+    assert changed_templates('HEAD~1', from_git=True) == ['b/cookiecutter.json', 'd/cookiecutter.json']   # noqa
+    assert changed_templates(from_git=True) == ['a/cookiecutter.json', 'b/cookiecutter.json', 'd/cookiecutter.json']   # noqa
+
+    os.chdir('b')
+    assert changed_templates('HEAD~1', from_git=True) == ['cookiecutter.json']   # noqa
+
+    with pytest.raises(GitError) as e:
+        changed_templates('no-such-rev')
+    assert 'no-such-rev' in str(e.value)
+
+
+def test_read_blobs(repo):
+    with open(V1_COOKIECUTTER, 'rb') as fp:
+        v1 = fp.read()
+    os.makedirs(os.path.join('e', 'cookiecutter.json'))
+
+    blobs = list(read_blobs(['a/cookiecutter.json', 'missing.json', 'c', 'b/cookiecutter.json']))   # noqa
+    assert blobs == [('a/cookiecutter.json', v1), ('missing.json', None), ('c', None), ('b/cookiecutter.json', v1)]   # noqa
+
+    os.chdir('a')
+    assert list(read_blobs(['cookiecutter.json'])) == [('cookiecutter.json', v1)]   # noqa
+
+
+def test_since_option(repo, runner):
+    change_templates()
+
+    result = runner.invoke(cctconvert.main, ['--since', 'HEAD', '--jobs', '1'])   # noqa
+
+    assert result.exit_code == 0
+    assert "Converting 'b/cookiecutter.json'" in result.output
+    assert "Converting 'd/cookiecutter.json'" in result.output
+    assert 'a/cookiecutter.json' not in result.output
+    assert 'total                 : 2' in result.output
+    assert os.path.exists(os.path.join('b', 'cookiecutter.json.v1.bkup'))
+    assert not os.path.exists(os.path.join('a', 'cookiecutter.json.v1.bkup'))   # noqa
+
+    result = runner.invoke(cctconvert.main, ['--since', 'HEAD', 'a'])
+    assert result.exit_code == 0
+    assert 'No templates changed since \'HEAD\'.' in result.output
+
+
+def test_from_git_option_bare_clone(repo, runner):
+    with open(os.path.join('b', 'cookiecutter.json'), 'w') as fp:
+        fp.write('{"broken": ')
+    run_git('commit', '-q', '-a', '-m', 'Break b')
+    run_git('clone', '-q', '--bare', '.', 'bare.git')
+    os.chdir('bare.git')
+    before = sorted(os.listdir('.'))
+
+    result = runner.invoke(cctconvert.main, ['--from-git', '--dryrun'])
+
+    assert result.exit_code == -1
+    assert '[ 0] converted             a/cookiecutter.json' in result.output
+    assert '[-1] unable to load        b/cookiecutter.json' in result.output
+    assert 'Dry-run: No v2 output file produced.' in result.output
+    assert sorted(os.listdir('.')) == before
+
+    result = runner.invoke(cctconvert.main, ['--from-git', '--dryrun', '--since', 'HEAD~1', '--report', 'jsonl'])   # noqa
+    assert result.exit_code == -1
+    assert 'a/cookiecutter.json' not in result.output
+    assert '"path": "b/cookiecutter.json"' in result.output
+
+
+@pytest.mark.parametrize('args, exit_code, message', [
+    (['--from-git'], 2, '--from-git requires --dryrun'),
+    (['--since', 'HEAD', '--output', 'v2.json'], 2, '--output cannot be used with --since'),   # noqa
+    (['--since', 'no-such-rev'], 1, 'ERROR: git: '),
+])
+def test_git_option_errors(repo, runner, args, exit_code, message):
+    result = runner.invoke(cctconvert.main, args)
+    assert result.exit_code == exit_code
+    assert message in result.output
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.journal, the --journal and --rollback options.
+"""
+
+import os
+import json
+import shutil
+
+import pytest
+
+from cctconvert import cctconvert
+from cctconvert.core import (
+    BackupExistsError, OutputExistsError, WriteError, atomic_write,
+)
+from cctconvert.journal import Journal, read_records, rollback
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+V1_COOKIECUTTER = os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json')
+
+
+@pytest.fixture
+def journal(tmpdir):
+    journal = Journal(str(tmpdir.join('journal.jsonl')))
+    yield journal
+    journal.close()
+
+
+def ops(journal):
+    return [r['op'] for r in read_records(journal.path)]
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_atomic_write_records_and_claims(tmpdir, journal):
+    path = tmpdir.join('cookiecutter.json')
+    path.write('v1')
+    backup = str(path) + '.v1.bkup'
+
+    with atomic_write(str(path), backup=backup, journal=journal) as fp:
+        fp.write('v2')
+
+    assert path.read() == 'v2'
+    assert tmpdir.join('cookiecutter.json.v1.bkup').read() == 'v1'
+    plan, claim, commit = read_records(journal.path)
+    assert plan['op'] == 'plan'
+    assert (plan['path'], plan['backup'], plan['pid']) == (str(path), backup, os.getpid())   # noqa
+    assert claim == {'op': 'claim', 'path': str(path), 'claimed': backup}
+    assert commit == {'op': 'commit', 'path': str(path)}
+
+
+@pytest.mark.parametrize('backup, error', [
+    (True, BackupExistsError), (False, OutputExistsError),
+])
+def test_atomic_write_claim_fails_if_file_exists(tmpdir, journal, backup, error):   # noqa
+    """
+    A file name taken after it would have been checked is not overwritten.
+    """
+    path = tmpdir.join('cookiecutter.json')
+    path.write('v1')
+    taken = tmpdir.join('cookiecutter.json.v1.bkup' if backup else 'out.json')
+    taken.write('theirs')
+    output = str(path) if backup else str(taken)
+
+    with pytest.raises(error):
+        with atomic_write(output, backup=str(taken) if backup else None, journal=journal) as fp:   # noqa
+            fp.write('v2')
+
+    assert path.read() == 'v1'
+    assert taken.read() == 'theirs'
+    assert sorted(os.listdir(str(tmpdir))) == sorted(['cookiecutter.json', taken.basename, 'journal.jsonl'])   # noqa
+    assert ops(journal) == ['plan']
+
+
+def test_atomic_write_failure_releases_claim(tmpdir, journal, mocker):
+    path = tmpdir.join('cookiecutter.json')
+    path.write('v1')
+    replace = os.replace
+
+    def failing_replace(src, dst):
+        if src.endswith('.tmp'):
+            raise OSError('disk full')
+        replace(src, dst)
+    mocker.patch('os.replace', side_effect=failing_replace)
+
+    with pytest.raises(WriteError):
+        with atomic_write(str(path), backup=str(path) + '.v1.bkup', journal=journal) as fp:   # noqa
+            fp.write('v2')
+
+    assert path.read() == 'v1'
+    assert sorted(os.listdir(str(tmpdir))) == ['cookiecutter.json', 'journal.jsonl']   # noqa
+    assert ops(journal) == ['plan', 'claim']
+
+
+def test_rollback(tmpdir, journal):
+    converted, half, claimed, output = [
+        str(tmpdir.join(name)) for name in ('a.json', 'b.json', 'c.json', 'd.json')]   # noqa
+    tmpdir.join('a.json').write('v2')
+    tmpdir.join('a.json.v1.bkup').write('a v1')
+    # Killed after the input was renamed to its backup
+    tmpdir.join('b.json.v1.bkup').write('b v1')
+    # Killed after the backup was claimed
+    tmpdir.join('c.json').write('c v1')
+    tmpdir.join('c.json.v1.bkup').write('')
+    tmpdir.join('d.json').write('v2')
+    # Not this run's
+    tmpdir.join('e.json.v1.bkup').write('e v1')
+
+    for path in (converted, half, claimed):
+        journal.plan(path, path + '.v1.bkup')
+        journal.claim(path, path + '.v1.bkup')
+    journal.plan(output)
+    journal.claim(output, output)
+    journal.commit(converted)
+    journal.commit(output)
+    journal.close()
+    with open(journal.path, 'a') as fp:
+        fp.write('{"op": "pl')
+
+    done = rollback(journal.path)
+
+    assert done == [
+        ('removed', output, None),
+        ('restored', half, half + '.v1.bkup'),
+        ('restored', converted, converted + '.v1.bkup'),
+    ]
+    assert sorted(os.listdir(str(tmpdir))) == ['a.json', 'b.json', 'c.json', 'e.json.v1.bkup']   # noqa
+    assert [tmpdir.join(n).read() for n in ('a.json', 'b.json', 'c.json')] == ['a v1', 'b v1', 'c v1']   # noqa
+
+
+@pytest.mark.parametrize('options', [['--jobs', '2'], ['--stream'], ['--output', 'v2.json']])   # noqa
+def test_journal_option_and_rollback(tmpdir, runner, options):
+    for d in ('a', 'b'):
+        tmpdir.mkdir(d)
+        shutil.copy(V1_COOKIECUTTER, str(tmpdir.join(d)))
+    os.chdir(str(tmpdir))
+    template = os.path.join('a', 'cookiecutter.json')
+    args = [template] if '--output' in options else ['.']
+
+    result = runner.invoke(cctconvert.main, args + ['--journal', 'run.jsonl'] + options)   # noqa
+    assert result.exit_code == 0
+    records = read_records('run.jsonl')
+    assert [r['op'] for r in records].count('commit') == (1 if '--output' in options else 2)   # noqa
+
+    result = runner.invoke(cctconvert.main, ['--rollback', '--journal', 'run.jsonl'])   # noqa
+    assert result.exit_code == 0
+    assert 'Rolled back' in result.output
+    assert sorted(os.listdir(str(tmpdir))) == ['a', 'b']
+    for d in ('a', 'b'):
+        assert os.listdir(d) == ['cookiecutter.json']
+        with open(os.path.join(d, 'cookiecutter.json')) as fp:
+            assert 'cookiecutter_version' not in json.load(fp)
+
+
+def test_journal_option_claims_backup(tmpdir, runner):
+    shutil.copy(V1_COOKIECUTTER, str(tmpdir))
+    tmpdir.join('cookiecutter.json.v1.bkup').write('theirs')
+    os.chdir(str(tmpdir))
+
+    result = runner.invoke(cctconvert.main, ['--journal', 'run.jsonl'])
+
+    assert result.exit_code == -3
+    assert "cannot be renamed to 'cookiecutter.json.v1.bkup'" in result.output
+    assert tmpdir.join('cookiecutter.json.v1.bkup').read() == 'theirs'
+
+
+def test_rollback_option_errors(tmpdir, runner):
+    os.chdir(str(tmpdir))
+
+    result = runner.invoke(cctconvert.main, ['--rollback'])
+    assert result.exit_code == 2
+    assert '--rollback requires --journal' in result.output
+
+    result = runner.invoke(cctconvert.main, ['--rollback', '--journal', 'missing.jsonl'])   # noqa
+    assert result.exit_code == 1
+    assert "Unable to roll back the journal 'missing.jsonl'" in result.output
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.jsonbackend, the JSON library abstraction.
+"""
+
+import io
+import os
+import json
+import collections
+
+import pytest
+
+from cctconvert import jsonbackend
+from cctconvert import cctconvert
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+CONTEXT_FILE = os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json')
+
+# Values a fast library may format differently from the json module
+AWKWARD = collections.OrderedDict([
+    ('del', 'rub\x7fout'),
+    ('unicode', 'café \U0001F600'),
+    ('control', '\x00\x1f\t\n'),
+    ('slash', 'a/b'),
+    ('small', [1e-05, 1.5e-07, 1e-10, 0.1]),
+    ('large', [1e+16, 1.5e+300, 2 ** 64, -2 ** 63 - 1, 2 ** 200]),
+    ('nested', collections.OrderedDict([('z', {}), ('a', []), ('m', None)])),
+    ('flags', [True, False]),
+])
+
+
+def backends():
+    """
+    The installed backends.
+    """
+    installed = []
+    for name in jsonbackend.AUTO_ORDER:
+        try:
+            installed.append(jsonbackend.get_backend(name))
+        except ImportError:
+            pass
+    return installed
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+@pytest.mark.parametrize('backend', backends(), ids=lambda b: b.name)
+def test_load_matches_json(backend):
+    """
+    Every backend loads the context json loads, in the same key order.
+    """
+    with open(CONTEXT_FILE, encoding='utf8') as cc:
+        expected = json.load(cc, object_pairs_hook=collections.OrderedDict)
+    with open(CONTEXT_FILE, encoding='utf8') as cc:
+        ctx = backend.load(cc)
+
+    assert isinstance(ctx, collections.OrderedDict)
+    assert json.dumps(ctx) == json.dumps(expected)
+
+    text = json.dumps(AWKWARD) + ' '
+    ctx = backend.load(io.StringIO(text.replace('0.1', 'NaN')))
+    expected = json.loads(text.replace('0.1', 'NaN'))
+    assert json.dumps(ctx) == json.dumps(expected)
+
+    with pytest.raises(ValueError):
+        backend.load(io.StringIO('bad json'))
+
+
+@pytest.mark.parametrize('backend', backends(), ids=lambda b: b.name)
+def test_dump_matches_json(backend):
+    """
+    Every backend writes byte for byte what json.dump(indent=4) writes.
+    """
+    for ctx in (cctconvert.cc_read(CONTEXT_FILE), AWKWARD, [float('nan')]):
+        fp = io.StringIO()
+        backend.dump(ctx, fp)
+        assert fp.getvalue() == json.dumps(ctx, indent=4)
+        assert backend.dumps(ctx) == json.dumps(ctx, indent=4)
+
+
+def test_get_backend():
+    """
+    None is the json module and auto is the first installed backend.
+    """
+    assert jsonbackend.get_backend(None).name == 'json'
+    assert jsonbackend.get_backend('auto') is backends()[0]
+
+
+@pytest.mark.parametrize('backend', backends(), ids=lambda b: b.name)
+@pytest.mark.datafiles(CONTEXT_FILE)
+def test_json_backend_option(backend, datafiles, runner):
+    """
+    The version 2 file is identical whatever the --json-backend.
+    """
+    os.chdir(str(datafiles))
+
+    for args in ([], ['--stream']):
+        result = runner.invoke(cctconvert.main, args + ['--no-incept', '--output', 'json.json'])   # noqa
+        assert result.exit_code == 0
+        result = runner.invoke(cctconvert.main, args + ['--no-incept', '--output', 'fast.json', '--json-backend', backend.name])   # noqa
+        assert result.exit_code == 0
+
+        with open('json.json', 'rb') as expected, open('fast.json', 'rb') as fast:   # noqa
+            assert expected.read() == fast.read()
+        os.remove('json.json')
+        os.remove('fast.json')
+
+
+def test_json_backend_option_not_installed(mocker, runner):
+    """
+    Asking for a library that is not installed is a usage error.
+    """
+    mocker.patch.dict(jsonbackend._instances, clear=True)
+    mocker.patch('importlib.import_module', side_effect=ImportError)
+
+    result = runner.invoke(cctconvert.main, ['--json-backend', 'ujson'])
+
+    assert result.exit_code == 2
+    assert 'ujson is not installed' in result.output
+
+    assert jsonbackend.get_backend('auto').name == 'json'
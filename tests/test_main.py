@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the cctconvert entry point, cctconvert.__main__, and of its start up
+cost.
+"""
+
+import os
+import sys
+import subprocess
+
+import pytest
+
+from cctconvert import core
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+# Modules the fast --version path must never import
+HEAVY_MODULES = {
+    'click',
+    'json',
+    'pprint',
+    'hashlib',
+    'concurrent.futures',
+    'cctconvert.cctconvert',
+    'cctconvert.jsonbackend',
+    'cctconvert.cache',
+    'cctconvert.stream',
+    'difflib',
+    'cctconvert.diff',
+    'subprocess',
+    'cctconvert.git',
+}
+
+# Modules of HEAVY_MODULES a plain conversion imports, it imports no other
+CONVERSION_MODULES = {
+    'click',
+    'json',
+    'cctconvert.cctconvert',
+    'cctconvert.jsonbackend',
+    'cctconvert.cache',
+    'cctconvert.stream',
+}
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_version_imports_no_heavy_modules():
+    """
+    A bare --version is answered without importing click or the conversion
+    code.
+    """
+    code = (
+        "import sys\n"
+        "sys.argv = ['cctconvert', '--version']\n"
+        "from cctconvert.__main__ import main\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit as e:\n"
+        "    print(e.code)\n"
+        "print(' '.join(sys.modules))\n"
+    )
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=PROJECT_DIR, universal_newlines=True)
+    ident, rc, modules = output.splitlines()
+
+    assert ident.startswith(core.IDENT)
+    assert rc == '0'
+    assert not HEAVY_MODULES & set(modules.split())
+
+
+@pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+def test_conversion_imports_no_option_modules(datafiles):
+    """
+    A plain conversion does not import the modules only some options use.
+    """
+    code = (
+        "import sys\n"
+        "sys.argv = ['cctconvert', 'cookiecutter.json']\n"
+        "from cctconvert.__main__ import main\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit as e:\n"
+        "    print(e.code)\n"
+        "print(' '.join(sys.modules))\n"
+    )
+    output = subprocess.check_output([sys.executable, '-c', code],
+                                     cwd=str(datafiles), universal_newlines=True,   # noqa
+                                     env=dict(os.environ, PYTHONPATH=PROJECT_DIR))   # noqa
+    rc, modules = output.splitlines()[-2:]
+
+    assert rc == '0'
+    assert os.path.exists(os.path.join(str(datafiles), 'cookiecutter.json.v1.bkup'))   # noqa
+    assert not (HEAVY_MODULES - CONVERSION_MODULES) & set(modules.split())
+
+
+def test_main_module_runs_the_command():
+    """
+    Anything but a bare --version runs the click command.
+    """
+    output = subprocess.check_output(
+        [sys.executable, '-m', 'cctconvert', '--help'],
+        cwd=PROJECT_DIR, universal_newlines=True)
+
+    assert output.startswith('Usage: cctconvert [OPTIONS] [COOKIECUTTER]...')
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7),
+                    reason='-X importtime requires Python 3.7+')
+def test_version_cold_start_time():
+    """
+    The --version cold start takes a fraction of a conversion's, see
+    benchmarks/importtime-baseline.json. The ratio rather than the time is
+    checked so the test does not depend on the speed of the machine.
+    """
+    from benchmarks.importtime import measure
+
+    results = measure(repeat=3, top=0)
+    ratio = results['version']['total'] / results['convert']['total']
+
+    assert ratio < 0.6
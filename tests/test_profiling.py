@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.profiling, the --profile phase timings.
+"""
+
+import os
+import shutil
+import pstats
+
+import pytest
+
+from cctconvert import cctconvert, profiling
+from cctconvert.core import PHASES, PHASE_HOOKS, timed, NOT_TIMED
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+
+def copy_input(tmpdir, name='cookiecutter.json'):
+    shutil.copy(os.path.join(TEST_SUPPORT_DIR, 'input', name),
+                str(tmpdir.join('cookiecutter.json')))
+    os.chdir(str(tmpdir))
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_timed_is_a_no_op_without_timings_or_hooks():
+    assert timed(None, 'read') is NOT_TIMED
+    with timed(None, 'read'):
+        pass
+
+
+def test_hook_sees_phases(tmpdir):
+    """
+    A hook is called once per phase, as it ends, until it is removed.
+    """
+    copy_input(tmpdir)
+    seen = []
+
+    def hook(phase, seconds):
+        seen.append((phase, seconds))
+
+    profiling.add_hook(hook)
+    try:
+        assert timed(None, 'read') is not NOT_TIMED
+        rc = cctconvert.convert_file('cookiecutter.json', False, 'name', True, None, False, None)   # noqa
+    finally:
+        profiling.remove_hook(hook)
+
+    assert rc == 0
+    assert hook not in PHASE_HOOKS
+    phases = [phase for phase, _ in seen]
+    assert phases[-1] == 'total'
+    assert set(phases) <= set(PHASES)
+    assert {'read', 'detect', 'transform', 'validate'} <= set(phases)
+    assert all(seconds >= 0 for _, seconds in seen)
+
+
+def test_histogram_lines():
+    histogram = profiling.Histogram()
+    for seconds in (0.000005, 0.0005, 0.002, 2.0):
+        histogram.add({'total': seconds, 'read': seconds / 2})
+    histogram('custom', 0.05)
+
+    assert histogram.phases() == ['read', 'total', 'custom']
+    lines = histogram.lines()
+    header, read, total, custom = lines[:4]
+    assert header.split()[:3] == ['phase', 'count', 'total']
+    assert total.split() == [
+        'total', '4', '2002.505', '500.626', '2.000', '2000.000', '2000.000']
+    assert custom.split()[:2] == ['custom', '1']
+    assert lines[4] == ''
+    assert lines[5].split() == ['phase'] + list(profiling.BUCKET_LABELS)
+    assert lines[7].split() == ['total', '1', '.', '1', '1', '.', '.', '1']
+
+
+@pytest.mark.parametrize('samples, q, expected', [
+    ([1], 0.9, 1),
+    ([1, 2, 3, 4], 0.5, 3),
+    (list(range(10)), 0.9, 9),
+])
+def test_percentile(samples, q, expected):
+    assert profiling.percentile(samples, q) == expected
+
+
+@pytest.mark.parametrize('options', [[], ['--stream'], ['--jobs', '2']])
+def test_profile_option(tmpdir, runner, options):
+    copy_input(tmpdir)
+
+    result = runner.invoke(cctconvert.main, ['--profile'] + options)
+
+    assert result.exit_code == 0
+    lines = result.output.splitlines()
+    table = lines[lines.index('Profile:') + 1:]
+    assert table[0].split()[:2] == ['phase', 'count']
+    assert 'total' in [line.split()[0] for line in table if line]
+
+
+def test_profile_dump_option(tmpdir, runner):
+    copy_input(tmpdir)
+
+    result = runner.invoke(cctconvert.main, ['--profile-dump', 'cct.prof'])
+
+    assert result.exit_code == 0
+    assert 'Profile:' not in result.output
+    stats = pstats.Stats(str(tmpdir.join('cct.prof')))
+    assert any(name == 'convert_context'
+               for _, _, name in stats.stats)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.render, the --verbose and --dryrun output.
+"""
+
+import json
+from collections import OrderedDict
+
+import pytest
+
+from cctconvert import cctconvert, render
+from cctconvert.render import Renderer, shorten
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+@pytest.mark.parametrize('value, limit, expected', [
+    ([1, 2, 3], 3, '[1, 2, 3]'),
+    ([1, 2, 3, 4], 3, '[1, 2, 3, ...1 more]'),
+    ([1, 2, 3, 4], 0, '[1, 2, 3, 4]'),
+    ('abcd', 1, "'abcd'"),
+    (OrderedDict([('name', 'a'), ('choices', [1, 2, 3])]), 2,
+     "OrderedDict([('name', 'a'), ('choices', [1, 2, ...1 more])])"),
+    ({'choices': [1, 2]}, 2, "{'choices': [1, 2]}"),
+])
+def test_shorten(value, limit, expected):
+    assert repr(shorten(value, limit)) == expected
+
+
+def test_shorten_leaves_value_alone():
+    value = OrderedDict([('choices', [1, 2])])
+    assert shorten(value, 2) is value
+
+
+def test_renderer_buffers_until_flush(capsys):
+    out = Renderer(2, styled=False)
+    out.line('header')
+    out.context(OrderedDict([
+        ('name', 'n'),
+        ('variables', [OrderedDict([('name', 'a'), ('choices', [1, 2, 3])])]),
+    ]))
+    assert capsys.readouterr().out == ''
+
+    out.flush()
+    assert capsys.readouterr().out.splitlines() == [
+        'header',
+        '  name : n',
+        '  variables :',
+        "    OrderedDict([('name', 'a'), ('choices', [1, 2, ...1 more])])",
+    ]
+    out.flush()
+    assert capsys.readouterr().out == ''
+
+
+def test_renderer_flushes_large_output(capsys):
+    out = Renderer(styled=False)
+    for i in range(render.FLUSH_SIZE // 10):
+        out.kvpair('key', i)
+    assert len(capsys.readouterr().out) >= render.FLUSH_SIZE
+    assert out.size < render.FLUSH_SIZE
+
+
+def test_renderer_styles():
+    styled = Renderer(styled=True)
+    styled.kvpair('k', 'v')
+    plain = Renderer(styled=False)
+    plain.kvpair('k', 'v')
+    plain.context({})
+
+    assert '\x1b[' in styled.lines[0]
+    assert plain.lines == ['  k : v', '{}']
+
+
+@pytest.mark.parametrize('options', [[], ['--stream']])
+def test_max_choices_option(tmpdir, runner, options):
+    choices = ['choice {i}'.format(i=i) for i in range(25)]
+    tmpdir.join('cookiecutter.json').write(json.dumps({'pick': choices}))
+    tmpdir.chdir()
+
+    result = runner.invoke(cctconvert.main, ['--dryrun'] + options)
+    assert result.exit_code == 0
+    assert "'choice 9', ...15 more]" in result.output
+    assert 'choice 10' not in result.output
+    assert '\x1b[' not in result.output
+
+    result = runner.invoke(cctconvert.main, ['--dryrun', '--max-choices', '0'] + options)   # noqa
+    assert result.exit_code == 0
+    assert "'choice 24']" in result.output
+    assert 'more]' not in result.output
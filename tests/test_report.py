@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.report, the machine readable --report output.
+"""
+
+import os
+import sys
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from cctconvert import cctconvert
+from cctconvert.report import PHASES
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def make_tree(root):
+    """
+    Make a batch of a version 1 template, a version 2 template and a corrupt
+    template under root.
+    """
+    for d, name in (('a', 'cookiecutter.json'), ('b', 'minimal-v2.json'),
+                    ('c', 'bad.json')):
+        root.mkdir(d)
+        shutil.copy(os.path.join(TEST_SUPPORT_DIR, 'input', name),
+                    str(root.join(d, 'cookiecutter.json')))
+
+
+def read_records(path):
+    with open(path, encoding='utf8') as fp:
+        return [json.loads(line) for line in fp]
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+@pytest.mark.parametrize('options', [
+    ['--jobs', '1'], ['--jobs', '2'], ['--async-io', '2'],
+])
+def test_batch_report_file(tmpdir, runner, options):
+    """
+    One record per file, in input order, whichever way the batch runs.
+    """
+    make_tree(tmpdir)
+    os.chdir(str(tmpdir))
+
+    result = runner.invoke(cctconvert.main, [
+        '.', '--report', 'jsonl', '--report-file', 'report.jsonl'] + options)   # noqa
+
+    assert result.exit_code == -6
+    assert 'Summary:' in result.output
+    records = read_records('report.jsonl')
+    assert [(r['path'], r['rc'], r['status']) for r in records] == [
+        (os.path.join('.', 'a', 'cookiecutter.json'), 0, 'converted'),
+        (os.path.join('.', 'b', 'cookiecutter.json'), -6, 'already version 2'),   # noqa
+        (os.path.join('.', 'c', 'cookiecutter.json'), -1, 'unable to load'),
+    ]
+
+    converted = records[0]
+    assert converted['variables'] == 11
+    assert converted['input_bytes'] == os.path.getsize(os.path.join('a', 'cookiecutter.json.v1.bkup'))   # noqa
+    assert converted['output_bytes'] == os.path.getsize(os.path.join('a', 'cookiecutter.json'))   # noqa
+    assert list(converted['seconds']) == list(PHASES)
+    assert all(t > 0 for t in converted['seconds'].values())
+
+    rejected = records[1]
+    assert rejected['variables'] is None
+    assert rejected['output_bytes'] is None
+    assert rejected['seconds']['write'] is None
+
+
+@pytest.mark.parametrize('options, phases', [
+    ([], PHASES),
+    (['--stream'], ('validate', 'write', 'total')),
+    (['--to', 'v1'], PHASES),
+])
+def test_report_phases(tmpdir, runner, options, phases):
+    """
+    A single conversion is reported too, with the phases it went through.
+    """
+    name = 'minimal-v2.json' if '--to' in options else 'cookiecutter.json'
+    shutil.copy(os.path.join(TEST_SUPPORT_DIR, 'input', name),
+                str(tmpdir.join('cookiecutter.json')))
+    os.chdir(str(tmpdir))
+
+    result = runner.invoke(cctconvert.main, [
+        '--report', 'jsonl', '--report-file', 'report.jsonl'] + options)
+
+    assert result.exit_code == 0
+    record, = read_records('report.jsonl')
+    assert record['variables'] == (0 if '--to' in options else 11)
+    assert [p for p, t in record['seconds'].items() if t is not None] == list(phases)   # noqa
+
+
+def test_report_to_stdout(tmpdir):
+    """
+    With the report on stdout, the rest of the output goes to stderr.
+    """
+    make_tree(tmpdir)
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+
+    proc = subprocess.run(
+        [sys.executable, '-m', 'cctconvert', '.', '--report', 'jsonl'],
+        cwd=str(tmpdir), env=env, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, universal_newlines=True)
+
+    assert proc.returncode == 256 - 6
+    records = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert [r['rc'] for r in records] == [0, -6, -1]
+    assert 'Summary:' in proc.stderr
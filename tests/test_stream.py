@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.stream, the one variable at a time conversion.
+"""
+
+import io
+import os
+import json
+import collections
+
+import pytest
+
+from cctconvert import core, stream
+from cctconvert import cctconvert
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7, 11, stream.CHUNK_SIZE])   # noqa
+@pytest.mark.parametrize('file_name', ['cookiecutter.json', 'empty.json', 'minimal-v2.json', 'numbers.json'])   # noqa
+def test_iter_context_items(file_name, chunk_size):
+    """
+    Items are parsed exactly as cc_read parses them, whatever the chunking.
+    """
+    path = os.path.join(TEST_SUPPORT_DIR, 'input', file_name)
+    with open(path, encoding='utf8') as cc:
+        items = list(stream.iter_context_items(cc, chunk_size))
+
+    assert collections.OrderedDict(items) == core.cc_read(path)
+    assert items == list(core.cc_read(path).items())
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 24))
+def test_iter_context_items_numbers_across_chunks(chunk_size):
+    """
+    A number cut by a read after its '.', 'e' or sign still parses whole.
+    """
+    text = '{"a": 1.5, "b": 2e10, "c": -3.25E-2, "d": 4}'
+
+    items = list(stream.iter_context_items(io.StringIO(text), chunk_size))
+
+    assert items == [('a', 1.5), ('b', 2e10), ('c', -3.25e-2), ('d', 4)]
+
+
+@pytest.mark.parametrize('text', [
+    '', '[]', '{"a": 1,}', '{"a" 1}', '{"a": 1} x', '{"a": tru}', '{"a": 12',
+])
+def test_iter_context_items_invalid(text):
+    """
+    Anything but one JSON object is rejected.
+    """
+    with pytest.raises(ValueError):
+        list(stream.iter_context_items(io.StringIO(text), 1))
+
+
+def test_iter_v2_json_matches_json_dump():
+    """
+    The streamed text is byte for byte what cc_write writes.
+    """
+    ctx = core.cc_read(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+    for ctx in (ctx, collections.OrderedDict()):
+        for incept in (True, False):
+            ctx_v2 = core.convert_context(ctx, 'x', incept, 'me')
+            header = core.make_header('x', incept, 'me')
+            variables = (core.make_variable(k, v) for k, v in ctx.items())
+
+            text = ''.join(stream.iter_v2_json(header, variables))
+
+            assert text == json.dumps(ctx_v2, indent=4)
+
+
+def test_stream_convert_rejects_version_2(tmpdir):
+    """
+    A version 2 file is rejected before the output file is created.
+    """
+    outfile = str(tmpdir.join('out.json'))
+
+    with pytest.raises(core.AlreadyVersion2Error):
+        stream.stream_convert(os.path.join(TEST_SUPPORT_DIR, 'input', 'minimal-v2.json'), outfile, 'x')   # noqa
+    assert not os.path.exists(outfile)
+
+    with pytest.raises(core.LoadError):
+        stream.scan_keys(os.path.join(TEST_SUPPORT_DIR, 'input', 'bad.json'))   # noqa
+    with pytest.raises(core.InputNotFoundError):
+        stream.scan_keys(os.path.join(TEST_SUPPORT_DIR, 'input', 'missing.json'))   # noqa
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{"name": "x", "cookiecutter_version": "2.0.0", "variables": [', True),
+    ('{"cookiecutter_version": "2.0.0"}', True),
+    ('{"name": "x", "variables": [{"cookiecutter_version": 1}]}', False),
+    ('{"full_name": "x", "cookiecutter_version": "2.0', False),
+    ('{"a": [' + '1, ' * stream.SNIFF_SIZE + '1], "cookiecutter_version": "2"}', False),   # noqa
+    ('junk', False),
+])
+def test_looks_like_version_2(text, expected):
+    """
+    Only a top level 'cookiecutter_version' entry within the leading
+    characters counts.
+    """
+    assert stream.looks_like_version_2(text) is expected
+
+
+@pytest.mark.parametrize('text, exception', [
+    ('{"name": "x", "cookiecutter_version": "2.0.0", "variables": []}', core.AlreadyVersion2Error),   # noqa
+    ('{"name": "x", "cookiecutter_version": "2.0.0", "variables": [{}]}', core.InvalidVersion2Error),   # noqa
+    ('{"variables": [], "name": "x", "cookiecutter_version": "2.0.0"}', core.AlreadyVersion2Error),   # noqa
+    ('{"name": "x", "cookiecutter_version": "2.0.0", "variables": [', core.LoadError),   # noqa
+])
+def test_reject_version_2_file(tmpdir, text, exception):
+    """
+    A version 2 file is rejected whether or not its leading bytes give it
+    away, and sniffing does not hide load errors.
+    """
+    path = tmpdir.join('cookiecutter.json')
+    path.write(text)
+
+    with pytest.raises(exception):
+        stream.reject_version_2_file(str(path))
+    with pytest.raises(exception):
+        core.cc_read(str(path), sniff=True)
+
+
+def test_cc_read_sniff_version_1():
+    """
+    A version 1 file is read with sniffing exactly as without.
+    """
+    path = os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json')
+
+    ctx = core.cc_read(path, sniff=True)
+
+    assert isinstance(ctx, collections.OrderedDict)
+    assert list(ctx.items()) == list(core.cc_read(path).items())
+    assert stream.reject_version_2_file(path) is None
+
+
+@pytest.mark.datafiles(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'))   # noqa
+def test_stream_option(datafiles, runner):
+    """
+    --stream writes the same version 2 file as the default conversion.
+    """
+    os.chdir(str(datafiles))
+
+    result = runner.invoke(cctconvert.main, ['--output', 'loaded.json', '--no-incept'])   # noqa
+    assert result.exit_code == 0
+
+    result = runner.invoke(cctconvert.main, ['--stream', '--no-incept'])
+    assert result.exit_code == 0
+    assert "Renaming input file to 'cookiecutter.json.v1.bkup'..." in result.output   # noqa
+    assert "Writing out version 2 cookiecutter template to file 'cookiecutter.json'" in result.output   # noqa
+
+    with open('loaded.json', 'rb') as loaded, open('cookiecutter.json', 'rb') as streamed:   # noqa
+        assert loaded.read() == streamed.read()
+
+
+@pytest.mark.datafiles(
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'),
+    os.path.join(TEST_SUPPORT_DIR, 'input', 'minimal-v2.json'),
+)
+def test_stream_option_dryrun(datafiles, runner):
+    """
+    --stream --dryrun emits each variable as it is converted, and a version 2
+    file is rejected.
+    """
+    inpath = str(datafiles)
+    os.chdir(inpath)
+
+    result = runner.invoke(cctconvert.main, ['--stream', '--dryrun'])
+    assert result.exit_code == 0
+    assert '_private_key : 7777' in result.output
+    assert "('prompt_user', False)" in result.output
+    assert "Dry-run: No v2 output file produced." in result.output
+    assert sorted(os.listdir(inpath)) == ['cookiecutter.json', 'minimal-v2.json']   # noqa
+
+    result = runner.invoke(cctconvert.main, ['--stream', 'minimal-v2.json'])
+    assert result.exit_code == -6
+    assert "Cookiecutter file 'minimal-v2.json' is already a version 2 template!!" in result.output   # noqa
+
+
+def test_stream_convert_write_error(tmpdir):
+    """
+    Failing to write the output is raised as a WriteError.
+    """
+    outfile = str(tmpdir.join('missing', 'out.json'))
+
+    with pytest.raises(core.WriteError) as excinfo:
+        stream.stream_convert(os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json'), outfile, 'x')   # noqa
+    assert excinfo.value.exit_code == -2
+
+
+def test_stream_convert_rejects_duplicate_keys(tmpdir, runner):
+    """
+    A key repeated at the top level is rejected, no output file is written.
+    """
+    infile = tmpdir.join('cookiecutter.json')
+    infile.write('{"a": "1", "b": "x", "a": "2"}')
+    outfile = str(tmpdir.join('out.json'))
+
+    with pytest.raises(core.InvalidVersion2Error) as excinfo:
+        stream.stream_convert(str(infile), outfile, 'x')
+    assert excinfo.value.detail == "Variable 2: name 'a' is already used"
+    assert not os.path.exists(outfile)
+
+    os.chdir(str(tmpdir))
+    result = runner.invoke(cctconvert.main, ['--stream'])
+    assert result.exit_code == -7
+    assert "Variable 2: name 'a' is already used" in result.output
+    assert os.listdir(str(tmpdir)) == ['cookiecutter.json']
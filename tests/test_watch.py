@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Unit tests for cctconvert.watch, the --watch mode.
+"""
+
+import os
+import sys
+import time
+import shutil
+import threading
+
+import pytest
+
+from cctconvert import cctconvert, watch
+from cctconvert import __main__ as entry_point
+
+TEST_SUPPORT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'test_support',)   # noqa
+
+V1_COOKIECUTTER = os.path.join(TEST_SUPPORT_DIR, 'input', 'cookiecutter.json')
+
+
+def touch(path, text='{}'):
+    """
+    Write text to path with a modification time later than any it had.
+    """
+    with open(path, 'w') as fp:
+        fp.write(text)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+class ScriptedWatcher(object):
+    """
+    Reports the changes of a script, one list per call, then sets stop.
+    """
+    name = 'scripted'
+
+    def __init__(self, script, stop):
+        self.script = list(script)
+        self.stop = stop
+        self.timeouts = []
+
+    def changes(self, timeout):
+        self.timeouts.append(timeout)
+        if not self.script:
+            self.stop.set()
+            return []
+        return self.script.pop(0)
+
+
+class Event(object):
+
+    def __init__(self, event_type, src_path, dest_path=None, is_directory=False):   # noqa
+        self.event_type = event_type
+        self.src_path = src_path
+        self.dest_path = dest_path
+        self.is_directory = is_directory
+
+# ---------------------- TESTS BEGIN HERE ------------------------------------
+
+
+def test_polling_watcher(tmpdir):
+    a = tmpdir.mkdir('a')
+    touch(str(a.join('cookiecutter.json')))
+    touch(str(a.join('other.json')))
+    tmpdir.mkdir('.git')
+    watcher = watch.PollingWatcher(str(tmpdir), 'cookiecutter.json')
+    assert watcher.poll() == []
+
+    touch(str(a.join('cookiecutter.json')), '{"a": 1}')
+    touch(str(a.join('other.json')), '{"a": 1}')
+    assert watcher.poll() == [str(a.join('cookiecutter.json'))]
+    assert watcher.poll() == []
+
+    b = tmpdir.mkdir('b')
+    c = b.mkdir('c')
+    touch(str(c.join('cookiecutter.json')))
+    touch(str(tmpdir.join('.git', 'cookiecutter.json')))
+    assert watcher.poll() == [str(c.join('cookiecutter.json'))]
+
+    shutil.rmtree(str(b))
+    assert watcher.poll() == []
+    assert str(c) not in watcher.dirs
+    assert list(watcher.files) == [str(a.join('cookiecutter.json'))]
+
+
+def test_watch_debounces(tmpdir):
+    """
+    A burst of changes is converted once it is quiet, each template once and
+    in the order they first changed. A template removed meanwhile is not.
+    """
+    paths = [str(tmpdir.join(name)) for name in 'abc']
+    for path in paths[:2]:
+        touch(path)
+    a, b, c = paths
+    stop = threading.Event()
+    watcher = ScriptedWatcher([[b], [a, b], [], [c], [], [a]], stop)
+    converted = []
+
+    watch.watch(watcher, converted.append, interval=5, debounce=0.1, stop=stop)   # noqa
+
+    assert converted == [b, a, a]
+    assert watcher.timeouts == [5, 0.1, 0.1, 5, 0.1, 5, 0.1]
+
+
+def test_event_watcher_event():
+    watcher = watch.EventWatcher.__new__(watch.EventWatcher)
+    watcher.template = 'cookiecutter.json'
+    watcher.queue = watch.queue.Queue()
+
+    for event in (
+            Event('modified', os.path.join('a', 'cookiecutter.json')),
+            Event('moved', os.path.join('b', '.cookiecutter.json.swp'),
+                  os.path.join('b', 'cookiecutter.json')),
+            Event('created', os.path.join('c', 'cookiecutter-v2.json')),
+            Event('deleted', os.path.join('d', 'cookiecutter.json')),
+            Event('created', os.path.join('e', 'cookiecutter.json'), is_directory=True)):   # noqa
+        watcher.event(event)
+
+    assert watcher.changes(0.01) == [
+        os.path.join('a', 'cookiecutter.json'),
+        os.path.join('b', 'cookiecutter.json')]
+    assert watcher.changes(0.01) == []
+
+
+def test_event_watcher_ignores_reads():
+    """
+    A template only read, as converting it does, is not converted again.
+    """
+    watcher = watch.EventWatcher.__new__(watch.EventWatcher)
+    watcher.template = 'cookiecutter.json'
+    watcher.queue = watch.queue.Queue()
+    path = os.path.join('a', 'cookiecutter.json')
+
+    for event_type in ('opened', 'closed_no_write', 'accessed'):
+        watcher.event(Event(event_type, path))
+    assert watcher.changes(0.01) == []
+
+    watcher.event(Event('closed', path))
+    assert watcher.changes(0.01) == [path]
+
+
+def test_make_watcher_falls_back_to_polling(mocker, tmpdir):
+    mocker.patch.dict(sys.modules, {'watchdog': None, 'watchdog.observers': None})   # noqa
+    assert watch.make_watcher(str(tmpdir), 'cookiecutter.json').name == 'polling'   # noqa
+    assert watch.make_watcher(str(tmpdir), 'cookiecutter.json', polling=True).name == 'polling'   # noqa
+
+
+def test_watch_templates(tmpdir, capsys):
+    """
+    Every template is converted at once, and again as it changes, replacing
+    its output.
+    """
+    a = tmpdir.mkdir('a')
+    shutil.copy(V1_COOKIECUTTER, str(a))
+    stop = threading.Event()
+    thread = threading.Thread(target=cctconvert.watch_templates, args=(
+        str(tmpdir), False, None, None, False, True, True, 0.05, stop))
+    thread.start()
+    try:
+        output = a.join('cookiecutter-v2.json')
+        deadline = time.time() + 10
+        while not output.check() and time.time() < deadline:
+            time.sleep(0.05)
+        assert 'Rick Deckard' in output.read()
+
+        template = a.join('cookiecutter.json')
+        touch(str(template), template.read().replace('Rick Deckard', 'Roy Batty'))   # noqa
+        while 'Roy Batty' not in output.read() and time.time() < deadline:
+            time.sleep(0.05)
+        assert 'Roy Batty' in output.read()
+    finally:
+        stop.set()
+        thread.join(10)
+
+    assert not thread.is_alive()
+    assert sorted(os.listdir(str(a))) == ['cookiecutter-v2.json', 'cookiecutter.json']   # noqa
+    out = capsys.readouterr().out
+    assert "Watching '{r}' for changes (polling)".format(r=tmpdir) in out
+    assert out.count('[ 0] converted') == 2
+
+
+@pytest.mark.parametrize('args, message', [
+    (['--watch', '.', 'cookiecutter.json'], '--watch cannot be used with COOKIECUTTER files'),   # noqa
+    (['--watch', '.', '--dryrun'], '--watch cannot be used with --dryrun'),
+    (['--watch', '.', '--jobs', '2'], '--watch cannot be used with --dryrun, --jobs'),   # noqa
+    (['--watch', '.', '--output', 'cookiecutter.json'], '--output cannot be cookiecutter.json with --watch'),   # noqa
+    (['--watch', '.', '--poll-interval', '0'], 'Invalid value for --poll-interval'),   # noqa
+    (['--watch', 'missing'], 'Directory "missing" does not exist'),
+])
+def test_watch_option_errors(tmpdir, runner, args, message):
+    os.chdir(str(tmpdir))
+    result = runner.invoke(cctconvert.main, args)
+    assert result.exit_code == 2
+    assert message in result.output
+
+
+def test_watch_is_not_forwarded(mocker):
+    forward = mocker.patch('cctconvert.__main__.forward')
+    command = mocker.patch('cctconvert.cctconvert.main')
+    mocker.patch.object(sys, 'argv', ['cctconvert', '--watch=.'])
+    mocker.patch.dict(os.environ, {'CCTCONVERT_SOCKET': 'cctconvert.sock'})
+
+    entry_point.main()
+
+    assert not forward.called
+    command.assert_called_once_with(prog_name='cctconvert')